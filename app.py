@@ -30,8 +30,11 @@ from wtforms import BooleanField, RadioField, StringField, PasswordField, Submit
 from wtforms.validators import AnyOf, DataRequired, Email, Length, InputRequired
 
 import os
+import atexit
 import datetime
+import hashlib
 import json
+import math
 import mimetypes
 import queue
 import re
@@ -39,13 +42,19 @@ import shutil
 import subprocess
 import sys
 import threading
+import time
 import traceback
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 from html import escape, unescape
 from urllib.parse import quote, urlparse
 
-from stress_highlight import SentenceRecognizer
+from audio_analyzer import AudioAnalyzer
+from caption_formats import FORMATS as CAPTION_FORMATS, parse_vtt, render as render_captions
+from feature_cache import FeatureCache
+from stress_highlight import SentenceRecognizer, format_time
+from transcription_worker import TranscriptionWorker
 
 
 app = Flask(__name__)
@@ -97,8 +106,44 @@ VIDEO_EXTENSIONS = {"mp4", "webm", "mov", "mkv", "avi", "m4v"}
 ALLOWED_EXTENSIONS = AUDIO_EXTENSIONS | VIDEO_EXTENSIONS
 BROWSER_VIDEO_TYPE = "video/mp4"
 
+
+def _env_flag(name, default):
+    """Read a boolean environment variable (``0/false/no/off`` are false)."""
+    return os.environ.get(name, default).strip().lower() not in ("0", "false", "no", "off")
+
+
+# Caption-stage audio is decoded into a memory-mapped float32 file inside the
+# job temp dir rather than process memory, so long uploads do not each hold
+# hundreds of MB of PCM. Set ``AUDIO_ANALYZER_MEMMAP=0`` to decode in memory.
+# ``AUDIO_ANALYZER_STREAMING`` additionally builds every stress feature in a
+# single block-by-block pass so peak memory stays bounded for any duration.
+AUDIO_ANALYZER_MEMMAP = _env_flag("AUDIO_ANALYZER_MEMMAP", "1")
+AUDIO_ANALYZER_STREAMING = _env_flag("AUDIO_ANALYZER_STREAMING", "1")
+# Stress features are computed on audio resampled once to this rate (pitch and
+# loudness live well below 8 kHz). ``0`` keeps each file's native rate.
+AUDIO_ANALYSIS_SR = int(os.environ.get("AUDIO_ANALYSIS_SR", "16000")) or None
+# Amplitude/pitch features are cached on disk by decoded-audio hash so retries
+# and re-captioning skip the DSP. ``AUDIO_FEATURE_CACHE_MB=0`` disables it.
+FEATURE_CACHE_DIR = os.environ.get("AUDIO_FEATURE_CACHE_DIR", os.path.join(STORAGE_DIR, "feature_cache"))
+AUDIO_FEATURE_CACHE_MB = int(os.environ.get("AUDIO_FEATURE_CACHE_MB", "512"))
+# Processes used for the pitch track of long files (0 = one per core). Each
+# analyzer starts its own pool and queued jobs can overlap with inline
+# re-captioning, so the default stays serial; raise it only on a dedicated box.
+AUDIO_PITCH_WORKERS = int(os.environ.get("AUDIO_PITCH_WORKERS", "1")) or os.cpu_count() or 1
+# Transcribe in one long-lived worker process that loads the Whisper model
+# once, instead of a fresh ``sentence_recognition.py`` process per job.
+# ``TRANSCRIPTION_WORKER=0`` restores the process-per-job behaviour.
+TRANSCRIPTION_WORKER = _env_flag("TRANSCRIPTION_WORKER", "1")
+# Rendered caption downloads kept in memory, keyed by (audio_id, format).
+CAPTION_RENDER_CACHE_SIZE = int(os.environ.get("CAPTION_RENDER_CACHE_SIZE", "256"))
+
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(TEMP_DIR, exist_ok=True)
+feature_cache = (
+    FeatureCache(FEATURE_CACHE_DIR, max_bytes=AUDIO_FEATURE_CACHE_MB * 1024 * 1024)
+    if AUDIO_FEATURE_CACHE_MB > 0
+    else None
+)
 
 # ---------------------------------------------------------------------------
 # SQLite shim that mimics the small subset of flask_mysqldb's API used here.
@@ -678,7 +723,20 @@ def update_media_file_for_playback(audio_id, file_path, file_type, stored_file_n
         conn.close()
 
 
-def run_transcription_subprocess(audio_path, sensitivity="off"):
+transcription_worker = TranscriptionWorker(cwd=BASE_DIR)
+atexit.register(transcription_worker.close)
+
+
+def run_transcription_subprocess(audio_path, sensitivity="off", progress=None):
+    """Transcribe ``audio_path`` and return the JSON path.
+
+    ``progress(segment_count, end_time)`` is called as segments are decoded
+    (persistent worker only).
+    """
+    tier = sensitivity if sensitivity in SENSITIVITY_VALUES else "off"
+    if TRANSCRIPTION_WORKER:
+        return transcription_worker.transcribe(audio_path, tier, progress=progress)
+
     script_path = os.path.join(BASE_DIR, "sentence_recognition.py")
     env = os.environ.copy()
     env["PYTHONIOENCODING"] = "utf-8"
@@ -686,7 +744,6 @@ def run_transcription_subprocess(audio_path, sensitivity="off"):
     # otherwise decode subprocess output with the system code page (e.g.
     # ``cp874``) and crash on any non-ASCII byte in stderr.
     cmd = [sys.executable, script_path, audio_path]
-    tier = sensitivity if sensitivity in SENSITIVITY_VALUES else "off"
     if tier != "off":
         cmd.extend(["--sensitivity", tier])
     result = subprocess.run(
@@ -843,9 +900,72 @@ def save_vtt(audio_id):
             cursor.close()
 
 
+# (audio_id, format) -> (digest of the stored VTT, rendered download), LRU order.
+_caption_render_cache = OrderedDict()
+_caption_render_lock = threading.Lock()
+
+
+def _normalize_vtt_download(vtt_content):
+    """Sanitized VTT with the ``WEBVTT`` header moved to the first line."""
+    vtt_content = sanitize_vtt_content(vtt_content)
+    if vtt_content:
+        lines = vtt_content.splitlines()
+        new_lines = []
+        webvtt_line = None
+        
+        # แยก WEBVTT ออกมาก่อน
+        for line in lines:
+            if 'WEBVTT' in line:
+                webvtt_line = 'WEBVTT'
+            else:
+                new_lines.append(line.rstrip())
+        
+        # สร้าง content ใหม่โดยเริ่มด้วย WEBVTT
+        final_content = ['WEBVTT']  # เริ่มด้วย WEBVTT
+        final_content.extend(new_lines)  # เพิ่มเนื้อหาที่เหลือ
+        
+        # รวมกลับเป็น string
+        vtt_content = sanitize_vtt_content('\n'.join(final_content))
+    return vtt_content
+
+
+def render_caption_download(audio_id, vtt_content, caption_format):
+    """Return the stored ``vtt_content`` of ``audio_id`` rendered as ``caption_format``.
+
+    Renders are cached per ``(audio_id, format)`` together with a digest of
+    the VTT they came from, so repeated downloads skip parsing and
+    sanitizing while an edited or re-captioned VTT is re-rendered.
+    """
+    digest = hashlib.blake2b(vtt_content.encode("utf-8"), digest_size=16).digest()
+    key = (audio_id, caption_format)
+    with _caption_render_lock:
+        cached = _caption_render_cache.get(key)
+        if cached is not None and cached[0] == digest:
+            _caption_render_cache.move_to_end(key)
+            return cached[1]
+
+    if caption_format == "vtt":
+        content = _normalize_vtt_download(vtt_content)
+    else:
+        content = render_captions(parse_vtt(sanitize_vtt_content(vtt_content)), caption_format)
+
+    with _caption_render_lock:
+        _caption_render_cache[key] = (digest, content)
+        _caption_render_cache.move_to_end(key)
+        while len(_caption_render_cache) > CAPTION_RENDER_CACHE_SIZE:
+            _caption_render_cache.popitem(last=False)
+    return content
+
+
 @app.route("/download_vtt/<int:audio_id>", methods=["GET"])
 @login_required
 def download_vtt(audio_id):
+    """Download the captions as ``?format=vtt`` (default), ``srt``, ``ttml`` or ``json``."""
+    caption_format = request.args.get("format", "vtt").lower()
+    if caption_format not in CAPTION_FORMATS:
+        flash("Unsupported caption format.", "danger")
+        return redirect(url_for("your_files"))
+
     cursor = mysql.connection.cursor()
     try:
         # ดึงข้อมูล VTT content และชื่อไฟล์ VTT ที่อาจมีการเปลี่ยนแปลงแล้ว
@@ -862,7 +982,6 @@ def download_vtt(audio_id):
             return redirect(url_for("your_files"))
 
         vtt_content, vtt_filename, original_audio_filename = result
-        vtt_content = sanitize_vtt_content(vtt_content)
         
         # ใช้ชื่อไฟล์ VTT ที่อยู่ในฐานข้อมูล (ซึ่งอาจมีการ rename ไปแล้ว)
         # ถ้าไม่มีหรือเป็นชื่อเริ่มต้น ให้ใช้ชื่อเดียวกับไฟล์เสียงแทน
@@ -871,28 +990,12 @@ def download_vtt(audio_id):
             download_filename = f"{base_filename}.vtt"
         else:
             download_filename = vtt_filename
-        
-        # แก้ไข format ของ VTT content
-        if vtt_content:
-            lines = vtt_content.splitlines()
-            new_lines = []
-            webvtt_line = None
-            
-            # แยก WEBVTT ออกมาก่อน
-            for line in lines:
-                if 'WEBVTT' in line:
-                    webvtt_line = 'WEBVTT'
-                else:
-                    new_lines.append(line.rstrip())
-            
-            # สร้าง content ใหม่โดยเริ่มด้วย WEBVTT
-            final_content = ['WEBVTT']  # เริ่มด้วย WEBVTT
-            final_content.extend(new_lines)  # เพิ่มเนื้อหาที่เหลือ
-            
-            # รวมกลับเป็น string
-            vtt_content = sanitize_vtt_content('\n'.join(final_content))
+        if caption_format != "vtt":
+            download_filename = f"{os.path.splitext(download_filename)[0]}.{caption_format}"
+
+        content = render_caption_download(audio_id, vtt_content or "", caption_format)
 
-        response = make_response(vtt_content)
+        response = make_response(content)
         # ``filename=`` only handles ASCII reliably; ``filename*=UTF-8''...``
         # (RFC 6266) covers non-ASCII names. Quoting the ASCII fallback
         # protects names that contain spaces or special characters.
@@ -901,7 +1004,9 @@ def download_vtt(audio_id):
         response.headers["Content-Disposition"] = (
             f'attachment; filename="{ascii_fallback}"; filename*=UTF-8\'\'{encoded_name}'
         )
-        response.headers["Content-Type"] = "text/vtt; charset=utf-8"
+        response.headers["Content-Type"] = (
+            f"{CAPTION_FORMATS[caption_format].mimetype}; charset=utf-8"
+        )
         return response
     
     except Exception as e:
@@ -1049,6 +1154,26 @@ def _delete_existing_caption_rows(audio_id):
         conn.close()
 
 
+def _replace_vtt_content(audio_id, file_name, vtt_content):
+    """Overwrite the stored VTT for ``audio_id`` (inserting it if missing)."""
+    now = datetime.now()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        updated = conn.execute(
+            "UPDATE vttfiles SET vtt_content = ?, created_at = ? WHERE audio_id = ?",
+            (vtt_content, now, audio_id),
+        ).rowcount
+        if not updated:
+            vtt_file_name = f"{os.path.splitext(secure_filename(file_name))[0]}.vtt"
+            conn.execute(
+                "INSERT INTO vttfiles (audio_id, file_name, vtt_content, created_at) VALUES (?, ?, ?, ?)",
+                (audio_id, vtt_file_name, vtt_content, now),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
 def insert_audio_file_to_db(
     user_id,
     file_name,
@@ -1130,6 +1255,62 @@ def insert_vtt_file_to_db(audio_id, vtt_file_name, vtt_content, created_at):
             conn.close()
 
 
+def generate_captions(audio_input_path, transcript, work_dir, progress=None, **options):
+    """Run the stress caption stage and return the sanitized VTT text.
+
+    ``transcript`` is the parsed Whisper JSON (or a path to it); the VTT is
+    built in memory. ``work_dir`` holds the analyzer's memmap spill file;
+    ``options`` are passed to ``SentenceRecognizer`` (stress thresholds,
+    ``max_cue_duration``).
+    """
+    analyzer = AudioAnalyzer(
+        audio_input_path,
+        memmap=AUDIO_ANALYZER_MEMMAP,
+        streaming=AUDIO_ANALYZER_STREAMING,
+        analysis_sr=AUDIO_ANALYSIS_SR,
+        feature_cache=feature_cache,
+        pitch_workers=AUDIO_PITCH_WORKERS,
+        cache_dir=work_dir,
+    )
+    try:
+        recognizer = SentenceRecognizer(audio_input_path, transcript, analyzer=analyzer, **options)
+        vtt_content = recognizer.to_vtt(progress=progress)
+    finally:
+        # Unmap before ``work_dir`` is removed (Windows refuses to delete a
+        # mapped file).
+        analyzer.close()
+
+    return sanitize_vtt_content(vtt_content.lstrip())
+
+
+# Caption-stage settings a recaption request may override.
+RECAPTION_OPTIONS = ("max_cue_duration", "amplitude_ratio", "amplitude_peak_ratio", "pitch_ratio")
+
+
+def recaption_media(audio_id, media_path, media_kind, file_name, json_content, options=None):
+    """Regenerate the VTT for ``audio_id`` from its stored transcript.
+
+    Only the caption stage runs: no video conversion and no Whisper. The
+    audio features come from the feature cache when the file has been
+    captioned before. The new VTT replaces the stored one (keeping a renamed
+    file name) and is returned.
+    """
+    work_dir = os.path.join(TEMP_DIR, f"recaption_{uuid.uuid4().hex}")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        if media_kind == "video":
+            audio_input_path = os.path.join(work_dir, "extracted_audio.wav")
+            extract_audio_from_video(media_path, audio_input_path)
+        else:
+            audio_input_path = media_path
+
+        vtt_content = generate_captions(audio_input_path, json_content, work_dir, **(options or {}))
+        _replace_vtt_content(audio_id, file_name, vtt_content)
+        return vtt_content
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
 def process_media_job(job_id, user_id, audio_id, media_path, media_kind, original_file_name, *, skip_video_conversion=False, sensitivity="off"):
     job_temp_dir = os.path.join(TEMP_DIR, job_id)
     os.makedirs(job_temp_dir, exist_ok=True)
@@ -1182,8 +1363,26 @@ def process_media_job(job_id, user_id, audio_id, media_path, media_kind, origina
             mode_label = " (sensitive)"
         else:
             mode_label = ""
-        update_job(job_id, "processing", 45, f"Transcribing speech with Faster Whisper {model_name}{mode_label}", audio_id=audio_id)
-        json_path = run_transcription_subprocess(audio_input_path, sensitivity=tier)
+        transcribe_message = f"Transcribing speech with Faster Whisper {model_name}{mode_label}"
+        update_job(job_id, "processing", 45, transcribe_message, audio_id=audio_id)
+        last_transcribe_update = [0.0]
+
+        def transcribe_progress(segment_count, end_time):
+            # Segments stream in as they are decoded; show how far the model
+            # has got, at most once a second to keep job-row writes cheap.
+            now = time.monotonic()
+            if now - last_transcribe_update[0] < 1.0:
+                return
+            last_transcribe_update[0] = now
+            update_job(
+                job_id,
+                "processing",
+                45,
+                f"{transcribe_message} ({segment_count} segments, up to {format_time(end_time)[:8]})",
+                audio_id=audio_id,
+            )
+
+        json_path = run_transcription_subprocess(audio_input_path, sensitivity=tier, progress=transcribe_progress)
         if not json_path or not os.path.isfile(json_path):
             raise RuntimeError("Transcription failed before a JSON file was generated.")
 
@@ -1193,15 +1392,30 @@ def process_media_job(job_id, user_id, audio_id, media_path, media_kind, origina
         update_job(job_id, "processing", 80, "Generating closed captions", audio_id=audio_id)
         base_filename = os.path.splitext(secure_filename(original_file_name))[0]
         vtt_file_name = f"{base_filename}.vtt"
-        vtt_path = os.path.join(job_temp_dir, vtt_file_name)
-        recognizer = SentenceRecognizer(audio_input_path, json_path)
-        recognizer.generate_vtt(vtt_path)
 
-        if not os.path.isfile(vtt_path):
-            raise RuntimeError("Caption generation failed before a VTT file was generated.")
+        last_caption_update = [0.0]
+
+        def caption_progress(cue_count, end_time):
+            # Cues are written as each batch of segments is analyzed; surface
+            # how far captioning has got so long files show visible progress,
+            # throttled like ``transcribe_progress``.
+            now = time.monotonic()
+            if now - last_caption_update[0] < 1.0:
+                return
+            last_caption_update[0] = now
+            update_job(
+                job_id,
+                "processing",
+                80,
+                f"Generating closed captions ({cue_count} cues, up to {format_time(end_time)[:8]})",
+                audio_id=audio_id,
+            )
 
-        with open(vtt_path, "r", encoding="utf-8") as vtt_file:
-            vtt_content = sanitize_vtt_content(vtt_file.read().lstrip())
+        # Hand the parsed transcript straight to the caption stage instead of
+        # having the recognizer parse the JSON file a second time.
+        vtt_content = generate_captions(
+            audio_input_path, json_content, job_temp_dir, progress=caption_progress
+        )
 
         created_at = datetime.now()
         # Replace any previous JSON/VTT rows for this audio so retries do not
@@ -1235,12 +1449,23 @@ def process_media_job(job_id, user_id, audio_id, media_path, media_kind, origina
 # ---------------------------------------------------------------------------
 _job_queue = queue.Queue()
 
+# One lock per upload, held while its captions are written: by the worker for
+# a whole job and by ``recaption_job``, which refuses to wait for it.
+_audio_locks = {}
+_audio_locks_guard = threading.Lock()
+
+
+def _audio_lock(audio_id):
+    with _audio_locks_guard:
+        return _audio_locks.setdefault(audio_id, threading.Lock())
+
 
 def _job_worker():
     while True:
         task = _job_queue.get()
         try:
-            process_media_job(*task["args"], **task["kwargs"])
+            with _audio_lock(task["args"][2]):
+                process_media_job(*task["args"], **task["kwargs"])
         except Exception as err:  # never let one bad job kill the worker
             print("Job worker error:", err)
             traceback.print_exc()
@@ -1379,6 +1604,92 @@ def retry_job(audio_id):
     return jsonify({"job_id": job_id, "audio_id": audio_id}), 202
 
 
+@app.route("/recaption_job/<int:audio_id>", methods=["POST"])
+@login_required
+def recaption_job(audio_id):
+    """Regenerate captions from the stored transcript without re-transcribing.
+
+    An optional JSON body may override any of ``RECAPTION_OPTIONS`` for this
+    run. Runs inline (no job queue): with cached audio features it is a
+    short CPU-only step, not a GPU job. Answers 409 while another recaption
+    or a processing job for the same upload is active.
+    """
+    body = request.get_json(silent=True) or {}
+    options = {}
+    for name in RECAPTION_OPTIONS:
+        if body.get(name) is None:
+            continue
+        try:
+            value = float(body[name])
+        except (TypeError, ValueError):
+            return jsonify({"error": f"{name} must be a number"}), 400
+        if not math.isfinite(value) or value <= 0:
+            return jsonify({"error": f"{name} must be a positive number"}), 400
+        options[name] = value
+
+    lock = _audio_lock(audio_id)
+    if not lock.acquire(blocking=False):
+        return jsonify({"error": "Captions for this media are already being generated"}), 409
+    try:
+        if _has_active_job(audio_id):
+            return jsonify({"error": "This media is still being processed"}), 409
+        return _recaption(audio_id, options)
+    finally:
+        lock.release()
+
+
+def _has_active_job(audio_id):
+    """Whether a queued or running processing job targets ``audio_id``."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute(
+            "SELECT 1 FROM processing_jobs WHERE audio_id = ? "
+            "AND status IN ('uploaded', 'queued', 'processing') LIMIT 1",
+            (audio_id,),
+        ).fetchone()
+        return row is not None
+    finally:
+        conn.close()
+
+
+def _recaption(audio_id, options):
+    cursor = mysql.connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT file_path, file_name, COALESCE(media_kind, 'audio') FROM audiofiles WHERE audio_id = %s AND user_id = %s",
+            (audio_id, current_user.id),
+        )
+        row = cursor.fetchone()
+        transcript_row = None
+        if row:
+            cursor.execute(
+                "SELECT json_content FROM jsonfiles WHERE audio_id = %s ORDER BY json_id DESC LIMIT 1",
+                (audio_id,),
+            )
+            transcript_row = cursor.fetchone()
+    finally:
+        cursor.close()
+
+    if not row:
+        return jsonify({"error": "Media not found"}), 404
+    if not transcript_row:
+        return jsonify({"error": "No stored transcript; use retry instead"}), 404
+    file_path, file_name, media_kind = row
+    media_path = resolve_media_path(file_path)
+    if not media_path or not is_path_inside(media_path, UPLOAD_DIR) or not os.path.isfile(media_path):
+        return jsonify({"error": "Media file is missing on disk"}), 404
+
+    try:
+        vtt_content = recaption_media(
+            audio_id, media_path, media_kind, file_name, json.loads(transcript_row[0]), options
+        )
+    except Exception as err:
+        print("Recaption error:", err)
+        traceback.print_exc()
+        return jsonify({"error": "Caption regeneration failed"}), 500
+    return jsonify({"audio_id": audio_id, "cues": vtt_content.count(" --> ")}), 200
+
+
 @app.route("/job_status/<job_id>", methods=["GET"])
 @login_required
 def job_status(job_id):
@@ -1,58 +1,859 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import audioread
 import numpy as np
 import librosa
 import soundfile as sf
+import soxr
+
+
+def _piptrack_pitches(block, sr, n_fft, hop_length):
+    """Per-frame peak pitch from ``librosa.core.piptrack`` (``center=False``)."""
+    pitches, magnitudes = librosa.core.piptrack(
+        y=block,
+        sr=sr,
+        n_fft=n_fft,
+        hop_length=hop_length,
+        center=False,
+    )
+    return AudioAnalyzer._frame_peak_pitches(pitches, magnitudes)
+
+
+def _autocorr_pitches(block, sr, n_fft, hop_length, fmin=75.0, fmax=500.0,
+                      target_sr=4000, threshold=0.45, periods=3.0):
+    """Per-frame F0 from a normalized autocorrelation, vectorized over frames.
+
+    Each frame keeps only a centred window of ``periods`` cycles of ``fmin``
+    and is decimated by an integer factor towards ``target_sr`` (a
+    frame-local boxcar, so results do not depend on block boundaries); all
+    autocorrelations are then taken with one batched FFT. The pitch is the
+    first local maximum within 90% of the strongest one in the
+    ``fmin``-``fmax`` lag range, refined by parabolic interpolation; frames
+    whose normalized peak is below ``threshold`` are unvoiced (0.0).
+    """
+    frames = np.lib.stride_tricks.sliding_window_view(block, n_fft)[::hop_length]
+    if len(frames) == 0:
+        return np.zeros(0, dtype=np.float32)
+    factor = max(1, int(sr // target_sr))
+    width = min(n_fft // factor, int(np.ceil(periods * sr / fmin / factor)))
+    offset = (n_fft - width * factor) // 2
+    frames = frames[:, offset:offset + width * factor]
+    if factor > 1:
+        frames = frames.reshape(len(frames), width, factor).mean(axis=2)
+    analysis_sr = sr / factor
+    frames = frames - frames.mean(axis=1, keepdims=True)
+
+    fft_size = 1 << int(2 * width - 1).bit_length()
+    spectrum = np.fft.rfft(frames, fft_size, axis=1)
+    acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, fft_size, axis=1)[:, :width]
+
+    min_lag = max(2, int(np.floor(analysis_sr / fmax)))
+    max_lag = min(width - 2, int(np.ceil(analysis_sr / fmin)))
+    if max_lag <= min_lag:
+        return np.zeros(len(frames), dtype=np.float32)
+    lags = np.arange(min_lag - 1, max_lag + 2)
+    energy = acf[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        norm = np.nan_to_num(acf[:, lags] * (width / (width - lags)) / energy[:, np.newaxis])
+
+    inner = norm[:, 1:-1]
+    peaks = (inner >= norm[:, :-2]) & (inner >= norm[:, 2:])
+    best = np.where(peaks, inner, -np.inf).max(axis=1)
+    choice = np.argmax(peaks & (inner >= 0.9 * best[:, np.newaxis]), axis=1) + 1
+
+    rows = np.arange(len(choice))
+    peak = norm[rows, choice]
+    before = norm[rows, choice - 1]
+    after = norm[rows, choice + 1]
+    curvature = before - 2 * peak + after
+    safe = np.where(curvature < 0, curvature, -1.0)
+    shift = np.where(curvature < 0, 0.5 * (before - after) / safe, 0.0)
+    f0 = analysis_sr / (lags[choice] + shift)
+
+    voiced = (peak >= threshold) & (energy > 1e-10)
+    return np.where(voiced, f0, 0.0).astype(np.float32)
+
+
+# Selectable framewise pitch estimators. ``piptrack`` is librosa's peak
+# picker (the historical behaviour); ``autocorr`` is a much cheaper NumPy F0
+# estimator. See ``benchmarks/bench_pitch_backends.py`` for speed/agreement.
+PITCH_BACKENDS = {
+    "piptrack": _piptrack_pitches,
+    "autocorr": _autocorr_pitches,
+}
+
+DEFAULT_PITCH_BACKEND = os.environ.get("AUDIO_PITCH_BACKEND", "piptrack").strip().lower()
+DEFAULT_PITCH_WORKERS = int(os.environ.get("AUDIO_PITCH_WORKERS", "1"))
+
+
+class _PitchTracker:
+    """Incremental framewise pitch estimator.
+
+    Produces exactly the frames ``backend`` would for the whole signal with
+    ``center=True`` (constant padding), but computes them in blocks of
+    ``block_frames`` so the spectrogram never has to exist for the full file
+    at once. Only the per-frame pitch (0.0 when unvoiced) is kept.
+
+    Frames are independent of each other, so with ``workers > 1`` every full
+    block (which overlaps its neighbours by ``n_fft - hop_length`` samples)
+    is handed to a process pool and the per-block tracks are stitched back
+    in submission order, giving exactly the serial result. The pool is only
+    started once a second full block arrives, so short files never pay for
+    it, and at most ``2 * workers`` blocks are in flight to bound memory.
+    """
+
+    def __init__(self, sr, n_fft, hop_length, block_frames=512,
+                 backend=_piptrack_pitches, workers=1):
+        self.sr = sr
+        self.backend = backend
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.block_frames = block_frames
+        self.workers = workers
+        self._pad = n_fft // 2
+        self._buffer = np.zeros(self._pad, dtype=np.float32)
+        self._tracks = []           # per-block tracks, or futures while pending
+        self._done = 0              # leading entries of ``_tracks`` resolved
+        self._pool = None
+
+    def _available_frames(self):
+        if len(self._buffer) < self.n_fft:
+            return 0
+        return 1 + (len(self._buffer) - self.n_fft) // self.hop_length
+
+    def _emit(self, num_frames):
+        span = (num_frames - 1) * self.hop_length + self.n_fft
+        block = self._buffer[:span]
+        args = (block, self.sr, self.n_fft, self.hop_length)
+        if self.workers > 1 and self._pool is None and self._tracks:
+            self._pool = ProcessPoolExecutor(self.workers)
+        if self._pool is None:
+            self._tracks.append(self.backend(*args))
+            self._done += 1
+        else:
+            self._tracks.append(self._pool.submit(self.backend, *args))
+            self._collect(2 * self.workers)
+        self._buffer = self._buffer[num_frames * self.hop_length:]
+
+    def _collect(self, max_pending):
+        """Resolve the oldest pending blocks until at most ``max_pending`` remain."""
+        while len(self._tracks) - self._done > max_pending:
+            self._tracks[self._done] = self._tracks[self._done].result()
+            self._done += 1
+
+    def feed(self, samples):
+        self._buffer = np.concatenate(
+            (self._buffer, np.asarray(samples, dtype=np.float32))
+        )
+        while self._available_frames() >= self.block_frames:
+            self._emit(self.block_frames)
+
+    def finish(self):
+        try:
+            self._buffer = np.concatenate(
+                (self._buffer, np.zeros(self._pad, dtype=np.float32))
+            )
+            while self._available_frames() > 0:
+                self._emit(min(self.block_frames, self._available_frames()))
+            self._collect(0)
+        finally:
+            self.close()
+        if not self._tracks:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(self._tracks).astype(np.float32, copy=False)
+
+    def close(self):
+        """Shut down the worker pool, if one was started."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _sparse_table(values, op):
+    """Build a sparse table of ``op`` over power-of-two ranges of ``values``."""
+    table = [np.asarray(values)]
+    width = 1
+    while 2 * width <= len(values):
+        prev = table[-1]
+        table.append(op(prev[:-width], prev[width:]))
+        width *= 2
+    return table
+
+
+def _sparse_query_many(table, first, last, op, empty):
+    """Vectorized :func:`_sparse_query`; empty ranges yield ``empty``."""
+    out = np.full(len(first), empty, dtype=np.result_type(table[0].dtype, type(empty)))
+    lengths = last - first
+    nonempty = lengths > 0
+    levels = np.zeros(len(first), dtype=np.int64)
+    levels[nonempty] = np.floor(np.log2(lengths[nonempty])).astype(np.int64)
+    for level in np.unique(levels[nonempty]):
+        rows = np.flatnonzero(nonempty & (levels == level))
+        values = table[level]
+        out[rows] = op(values[first[rows]], values[last[rows] - (1 << int(level))])
+    return out
+
+
+def _gather_windows(data, lo, hi, width):
+    """Copy ``data[lo:lo + width]`` rows plus a mask of samples in ``[lo, hi)``.
+
+    Rows are sliced from a zero-copy sliding-window view, so each one is
+    a contiguous copy rather than an element-wise fancy index.
+    """
+    if len(data) < width:
+        data = np.concatenate((data, np.zeros((width - len(data),) + data.shape[1:], dtype=data.dtype)))
+    windows = np.lib.stride_tricks.sliding_window_view(data, width, axis=0)
+    base = np.minimum(lo, len(data) - width)
+    offsets = np.arange(width) - (lo - base)[:, np.newaxis]
+    mask = (offsets >= 0) & (offsets < (hi - lo)[:, np.newaxis])
+    values = windows[base]
+    if values.ndim == 3:
+        # ``(rows, channels, width)`` -> ``(rows, width, channels)``
+        values = values.transpose(0, 2, 1)
+        mask = mask[:, :, np.newaxis]
+    return values, mask
+
+
+class _RangeExtrema:
+    """Range minimum or maximum (``op``) over a 1-D array in O(n) memory.
+
+    Values are grouped ``fanout`` at a time and a sparse table is built over
+    the group reductions only, which adds at most one entry per value
+    (``log2(n / fanout) <= fanout``). A query reduces the whole groups it
+    spans with two table lookups and scans the fewer than ``2 * fanout``
+    values left over at its ends.
+    """
+
+    # Queries per edge scan; bounds the temporary ``(rows, 2 * fanout)`` matrix.
+    _BATCH_ROWS = 4096
+
+    def __init__(self, values, op, empty, fanout=64):
+        self.values = np.asarray(values)
+        self.op = op
+        self.empty = empty
+        self.fanout = fanout
+        full = len(self.values) // fanout * fanout
+        groups = op.reduce(self.values[:full].reshape(-1, fanout), axis=1)
+        self._groups = _sparse_table(groups, op)
+
+    def query_many(self, first, last):
+        """``op`` over ``values[first[i]:last[i]]``; empty ranges yield ``empty``."""
+        last = np.minimum(np.asarray(last, dtype=np.int64), len(self.values))
+        first = np.minimum(np.asarray(first, dtype=np.int64), last)
+        group_first = -(-first // self.fanout)
+        group_last = np.maximum(last // self.fanout, group_first)
+        out = _sparse_query_many(self._groups, group_first, group_last, self.op, self.empty)
+
+        # Ranges without a whole group are scanned in full (the left piece).
+        spans = group_last > group_first
+        left_end = np.where(spans, group_first * self.fanout, last)
+        right_start = np.where(spans, group_last * self.fanout, last)
+        for lo, hi, width in ((first, left_end, 2 * self.fanout), (right_start, last, self.fanout)):
+            for begin in range(0, len(lo), self._BATCH_ROWS):
+                batch = slice(begin, begin + self._BATCH_ROWS)
+                values, mask = _gather_windows(self.values, lo[batch], hi[batch], width)
+                out[batch] = self.op(out[batch], self.op.reduce(np.where(mask, values, self.empty), axis=1))
+        return out
+
+    def query(self, first, last):
+        return self.query_many([first], [last])[0]
+
+
+class _AmplitudeIndex:
+    """Block-level index over the absolute amplitude of a signal.
+
+    Stores, per block of ``block_size`` samples, the sum of ``|x|`` (as a
+    prefix sum) and the signed min/max, the latter behind
+    :class:`_RangeExtrema`, so the index stays linear in the number of
+    blocks. A window query then costs two prefix lookups, a bounded scan of
+    block extrema and a scan of at most ``2 * block_size`` edge samples.
+    Multichannel data is reduced across channels.
+    """
+
+    def __init__(self, block_size=256):
+        self.block_size = block_size
+        self.num_samples = 0
+        self._carry = None
+        self._sums = []
+        self._mins = []
+        self._maxs = []
+        self.prefix = None
+        self.minimum = None
+        self.maximum = None
+
+    def _reduce(self, blocks):
+        axes = tuple(range(1, blocks.ndim))
+        self._sums.append(np.abs(blocks).sum(axis=axes, dtype=np.float64))
+        self._mins.append(blocks.min(axis=axes))
+        self._maxs.append(blocks.max(axis=axes))
+
+    def feed(self, samples):
+        self.num_samples += len(samples)
+        if self._carry is not None and len(self._carry):
+            samples = np.concatenate((self._carry, samples))
+        full = len(samples) // self.block_size * self.block_size
+        if full:
+            blocks = samples[:full].reshape((-1, self.block_size) + samples.shape[1:])
+            self._reduce(blocks)
+        self._carry = samples[full:]
+
+    def finish(self):
+        if self._carry is not None and len(self._carry):
+            self._reduce(self._carry[np.newaxis])
+        self._carry = None
+        sums = np.concatenate(self._sums) if self._sums else np.zeros(0)
+        mins = np.concatenate(self._mins) if self._mins else np.zeros(0)
+        maxs = np.concatenate(self._maxs) if self._maxs else np.zeros(0)
+        self._sums = self._mins = self._maxs = None
+        self.prefix = np.concatenate(([0.0], np.cumsum(sums)))
+        self.minimum = _RangeExtrema(mins, np.minimum, np.inf)
+        self.maximum = _RangeExtrema(maxs, np.maximum, -np.inf)
+        return self
+
+    def to_arrays(self):
+        """Return the index as plain arrays (see :meth:`from_arrays`)."""
+        return {
+            "amp_block_size": np.int64(self.block_size),
+            "amp_num_samples": np.int64(self.num_samples),
+            "amp_prefix": self.prefix,
+            "amp_block_min": self.minimum.values,
+            "amp_block_max": self.maximum.values,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild an index saved with :meth:`to_arrays`."""
+        index = cls(int(arrays["amp_block_size"]))
+        index._load(arrays)
+        return index
+
+    def _load(self, arrays):
+        self.num_samples = int(arrays["amp_num_samples"])
+        self.prefix = arrays["amp_prefix"]
+        self.minimum = _RangeExtrema(arrays["amp_block_min"], np.minimum, np.inf)
+        self.maximum = _RangeExtrema(arrays["amp_block_max"], np.maximum, -np.inf)
+
+    # Pickle only the per-block arrays; the group tables are cheap to
+    # rebuild on the receiving side.
+    def __getstate__(self):
+        return self.to_arrays()
+
+    def __setstate__(self, arrays):
+        self.__init__(int(arrays["amp_block_size"]))
+        self._load(arrays)
+
+    @classmethod
+    def build(cls, data, block_size=256):
+        index = cls(block_size)
+        step = block_size * 4096
+        for offset in range(0, len(data), step):
+            index.feed(data[offset:offset + step])
+        return index.finish()
+
+    def _full_blocks(self, start_sample, end_sample):
+        first = -(-start_sample // self.block_size)
+        last = end_sample // self.block_size
+        return first, last
+
+    def mean_abs(self, data, start_sample, end_sample):
+        """Mean of ``|x|`` over ``data[start_sample:end_sample]``."""
+        if end_sample <= start_sample:
+            return 0.0
+        channels = data.shape[1] if data.ndim > 1 else 1
+        first, last = self._full_blocks(start_sample, end_sample)
+        if last <= first:
+            total = np.abs(data[start_sample:end_sample]).sum(dtype=np.float64)
+        else:
+            total = (
+                self.prefix[last] - self.prefix[first]
+                + np.abs(data[start_sample:first * self.block_size]).sum(dtype=np.float64)
+                + np.abs(data[last * self.block_size:end_sample]).sum(dtype=np.float64)
+            )
+        return float(total / ((end_sample - start_sample) * channels))
+
+    def min_max(self, data, start_sample, end_sample):
+        """Signed ``(min, max)`` over ``data[start_sample:end_sample]``."""
+        if end_sample <= start_sample:
+            return 0.0, 0.0
+        first, last = self._full_blocks(start_sample, end_sample)
+        if last <= first:
+            segment = data[start_sample:end_sample]
+            return float(np.min(segment)), float(np.max(segment))
+
+        lo = self.minimum.query(first, last)
+        hi = self.maximum.query(first, last)
+        for edge in (
+            data[start_sample:first * self.block_size],
+            data[last * self.block_size:end_sample],
+        ):
+            if edge.size:
+                lo = min(lo, edge.min())
+                hi = max(hi, edge.max())
+        return float(lo), float(hi)
+
+    # Windows per gather when scanning edge samples in :meth:`summarize_many`;
+    # bounds the temporary ``(rows, width)`` edge matrix.
+    _BATCH_ROWS = 4096
+
+    def _edge_pieces(self, starts, ends):
+        """Split windows into the sample runs not covered by full blocks.
+
+        Returns ``(rows, lo, hi, width)`` tuples: windows spanning at least
+        one full block contribute a left and a right edge (each shorter than
+        ``block_size``); the rest are scanned whole (shorter than
+        ``2 * block_size``).
+        """
+        first = -(-starts // self.block_size)
+        last = ends // self.block_size
+        spans = np.flatnonzero(last > first)
+        short = np.flatnonzero(last <= first)
+        return (
+            (spans, starts[spans], first[spans] * self.block_size, self.block_size),
+            (spans, last[spans] * self.block_size, ends[spans], self.block_size),
+            (short, starts[short], ends[short], 2 * self.block_size),
+        )
+
+    def summarize_many(self, data, starts, ends, extrema=True):
+        """Vectorized :meth:`mean_abs` and :meth:`min_max` for many windows.
+
+        ``starts``/``ends`` are sample-index arrays. Returns
+        ``(mean_abs, minimum, maximum)`` float64 arrays; empty windows yield
+        zeros, matching the scalar methods. With ``extrema=False`` only the
+        mean is computed and ``minimum``/``maximum`` are ``None``.
+        """
+        ends = np.asarray(ends, dtype=np.int64)
+        starts = np.minimum(np.asarray(starts, dtype=np.int64), ends)
+        channels = data.shape[1] if data.ndim > 1 else 1
+        first = -(-starts // self.block_size)
+        last = np.maximum(ends // self.block_size, first)
+
+        totals = self.prefix[last] - self.prefix[first]
+        if extrema:
+            lows = self.minimum.query_many(first, last).astype(np.float64)
+            highs = self.maximum.query_many(first, last).astype(np.float64)
+
+        for rows_all, lo_all, hi_all, width in self._edge_pieces(starts, ends):
+            for begin in range(0, len(rows_all), self._BATCH_ROWS):
+                batch = slice(begin, begin + self._BATCH_ROWS)
+                rows = rows_all[batch]
+                values, mask = _gather_windows(data, lo_all[batch], hi_all[batch], width)
+                flat = (len(rows), -1)
+                totals[rows] += (np.abs(values) * mask).reshape(flat).sum(axis=1, dtype=np.float64)
+                if extrema:
+                    lows[rows] = np.minimum(lows[rows], np.where(mask, values, np.inf).reshape(flat).min(axis=1))
+                    highs[rows] = np.maximum(highs[rows], np.where(mask, values, -np.inf).reshape(flat).max(axis=1))
+
+        counts = (ends - starts) * channels
+        empty = counts <= 0
+        means = np.divide(totals, counts, out=np.zeros(len(starts)), where=~empty)
+        if not extrema:
+            return means, None, None
+        lows[empty] = 0.0
+        highs[empty] = 0.0
+        return means, lows, highs
+
+# Canonical sample layouts for the decoded audio. ``mono`` keeps a single
+# downmixed channel (what the pitch track needs anyway); ``multichannel``
+# keeps every channel so amplitude queries see the original signal, at the
+# cost of one array column per channel.
+CHANNEL_LAYOUTS = ("mono", "multichannel")
 
 
 class AudioAnalyzer:
     """Cached audio analyzer.
 
-    The audio file is read at most once per backend (librosa, soundfile) per
-    instance. Reusing a single :class:`AudioAnalyzer` across the whole stress
-    pipeline avoids reloading the entire file for every word/segment.
+    The audio file is decoded exactly once per instance, to float32 in the
+    ``channel_layout`` chosen at construction, and that single copy backs both
+    the amplitude and the pitch APIs. Reusing a single :class:`AudioAnalyzer`
+    across the whole stress pipeline avoids reloading the entire file for
+    every word/segment.
+
+    With ``memmap=True`` the decoded PCM is written once to a raw float32
+    file in ``cache_dir`` and read back through :class:`numpy.memmap`, so
+    segments are zero-copy views and the OS page cache decides what stays
+    resident. Call :meth:`close` (or use the analyzer as a context manager)
+    before removing ``cache_dir``.
+
+    With ``streaming=True`` the file is read once in fixed blocks and the
+    amplitude index and pitch track are built incrementally from those
+    blocks; the canonical PCM is spilled to the same raw float32 file as
+    memmap mode so window edges can still be read exactly. Peak memory is
+    then the block size plus the per-block/per-frame features, which grow
+    linearly with the duration (a few bytes per 256 samples and per pitch
+    frame) rather than with the decoded PCM.
+
+    Pitch queries are answered from one framewise pitch track computed
+    lazily for the whole file (``pitch_n_fft`` / ``pitch_hop_length``), so a
+    query for any ``[start, end]`` window is a slice of that track instead of
+    a fresh STFT. ``pitch_backend`` picks the estimator from
+    :data:`PITCH_BACKENDS` (default: ``AUDIO_PITCH_BACKEND`` or
+    ``piptrack``). ``pitch_workers`` spreads the pitch track over that many
+    processes (default: ``AUDIO_PITCH_WORKERS`` or 1); the result is
+    identical to the serial one.
+
+    ``analysis_sr`` downsamples the canonical signal once, right after
+    decoding, so every amplitude and pitch feature is computed on the lower
+    rate (pitch tracking only needs the band below a few kHz). Files already
+    at or below that rate are left untouched; ``None`` keeps the native rate.
+
+    ``feature_cache`` (a :class:`feature_cache.FeatureCache`) persists the
+    amplitude index and pitch track across instances, keyed by a hash of the
+    decoded samples and the analysis parameters. On a hit no DSP runs at
+    all; on a miss both features are computed right after decoding and
+    stored. In streaming mode the single pass then only spills and the
+    features are built block-wise from the spill file, so memory stays
+    bounded either way.
     """
 
     # Minimum samples needed before piptrack can run with a sane n_fft.
     _MIN_PITCH_SAMPLES = 32
 
-    def __init__(self, audio_file):
+    # Frames per soundfile block when decoding straight to the memmap file.
+    _DECODE_BLOCK_FRAMES = 1 << 16
+
+    def __init__(self, audio_file, pitch_n_fft=2048, pitch_hop_length=512,
+                 channel_layout="mono", memmap=False, cache_dir=None,
+                 streaming=False, pitch_backend=None, analysis_sr=None,
+                 feature_cache=None, pitch_workers=None):
+        if channel_layout not in CHANNEL_LAYOUTS:
+            raise ValueError(
+                f"Unknown channel_layout={channel_layout!r}. "
+                f"Expected one of {CHANNEL_LAYOUTS}."
+            )
+        pitch_backend = pitch_backend or DEFAULT_PITCH_BACKEND
+        if pitch_backend not in PITCH_BACKENDS:
+            raise ValueError(
+                f"Unknown pitch_backend={pitch_backend!r}. "
+                f"Expected one of {tuple(PITCH_BACKENDS)}."
+            )
         self.audio_file = audio_file
-        self._librosa_audio = None  # tuple (y, sr) loaded lazily
-        self._sf_audio = None       # tuple (data, sample_rate) loaded lazily
+        self.pitch_n_fft = pitch_n_fft
+        self.pitch_hop_length = pitch_hop_length
+        self.channel_layout = channel_layout
+        self.pitch_backend = pitch_backend
+        self.pitch_workers = max(1, int(pitch_workers or DEFAULT_PITCH_WORKERS))
+        self.analysis_sr = int(analysis_sr) if analysis_sr else None
+        self.memmap = memmap or streaming
+        self.streaming = streaming
+        self.cache_dir = cache_dir
+        self.feature_cache = feature_cache
+        self._audio = None          # tuple (data, sr) decoded lazily
+        self._memmap_path = None
+        self._owns_memmap_dir = False
+        self._pitch_track = None    # per-frame peak pitch (Hz), 0.0 = unvoiced
+        self._pitch_hop = pitch_hop_length
+        self._amplitude_index = None
+        self._pitch_summary = None
+        self._pitch_maximum = None
 
     # ------------------------------------------------------------------ helpers
-    def _librosa_data(self):
-        if self._librosa_audio is None:
-            y, sr = librosa.load(self.audio_file, sr=None)
-            self._librosa_audio = (y, sr)
-        return self._librosa_audio
-
-    def _soundfile_data(self):
-        if self._sf_audio is None:
-            data, sample_rate = sf.read(self.audio_file)
-            self._sf_audio = (data, sample_rate)
-        return self._sf_audio
+    def _decode(self):
+        """Decode the whole file to float32, shaped ``(samples, channels)``.
+
+        soundfile handles WAV/FLAC/OGG/MP3 directly; anything it cannot open
+        (e.g. AAC/M4A) goes through librosa's audioread fallback.
+        """
+        try:
+            data, sr = sf.read(self.audio_file, dtype="float32", always_2d=True)
+        except RuntimeError:
+            y, sr = librosa.load(self.audio_file, sr=None, mono=False)
+            data = y.T
+        data = np.asarray(data, dtype=np.float32)
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        return data, sr
+
+    @staticmethod
+    def _to_mono(data):
+        """Downmix canonical samples to one channel (a view when already mono)."""
+        if data.ndim == 1:
+            return data
+        if data.shape[1] == 1:
+            return data[:, 0]
+        return data.mean(axis=1, dtype=np.float32)
+
+    def _to_layout(self, data):
+        if self.channel_layout == "mono":
+            return np.ascontiguousarray(self._to_mono(data))
+        return np.ascontiguousarray(data)
+
+    def _open_blocks(self):
+        """Open the file for block reads; return ``(sr, channels, blocks)``.
+
+        ``blocks`` yields float32 ``(frames, channels)`` arrays. soundfile is
+        used where it can open the file, audioread (librosa's own fallback)
+        otherwise, so neither path needs the whole signal in memory.
+        """
+        try:
+            source = sf.SoundFile(self.audio_file)
+        except RuntimeError:
+            source = audioread.audio_open(self.audio_file)
+
+            def blocks():
+                with source:
+                    for buf in source:
+                        samples = librosa.util.buf_to_float(buf, dtype=np.float32)
+                        yield samples.reshape(-1, source.channels)
+
+            return source.samplerate, source.channels, blocks()
+
+        def blocks():
+            with source:
+                yield from source.blocks(
+                    blocksize=self._DECODE_BLOCK_FRAMES,
+                    dtype="float32",
+                    always_2d=True,
+                )
+
+        return source.samplerate, source.channels, blocks()
+
+    def _target_sr(self, sr):
+        """Return the rate features are computed at (never upsampled)."""
+        if self.analysis_sr and self.analysis_sr < sr:
+            return self.analysis_sr
+        return sr
+
+    def _resample(self, data, sr):
+        """Downsample canonical ``data`` to the analysis rate in one shot."""
+        target = self._target_sr(sr)
+        if target == sr:
+            return data, sr
+        return soxr.resample(data, sr, target, quality="HQ"), target
+
+    def _canonical_blocks(self):
+        """Return ``(sr, channels, blocks)`` of canonical-layout blocks.
+
+        Blocks are already downmixed (for ``mono``) and resampled to the
+        analysis rate with a streaming soxr resampler, whose output matches
+        :meth:`_resample` on the whole signal sample for sample.
+        """
+        sr, channels, blocks = self._open_blocks()
+        layout_blocks = (self._to_layout(block) for block in blocks)
+        target = self._target_sr(sr)
+        if target == sr:
+            return sr, channels, layout_blocks
+
+        num_channels = 1 if self.channel_layout == "mono" else channels
+        stream = soxr.ResampleStream(sr, target, num_channels, dtype="float32", quality="HQ")
+
+        def resampled():
+            for block in layout_blocks:
+                out = stream.resample_chunk(block)
+                if len(out):
+                    yield out
+            shape = (0,) if self.channel_layout == "mono" else (0, num_channels)
+            out = stream.resample_chunk(np.zeros(shape, dtype=np.float32), last=True)
+            if len(out):
+                yield out
+
+        return target, channels, resampled()
+
+    def _spill_path(self):
+        """Return the raw float32 file path used by memmap/streaming modes."""
+        directory = self.cache_dir
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="audio-analyzer-")
+            self._owns_memmap_dir = True
+        base = os.path.splitext(os.path.basename(self.audio_file))[0]
+        self._memmap_path = os.path.join(directory, f"{base}.{self.channel_layout}.f32")
+        return self._memmap_path
+
+    def _map_spill(self, path, num_samples, channels):
+        shape = (num_samples,) if self.channel_layout == "mono" else (num_samples, channels)
+        if num_samples == 0:
+            # ``np.memmap`` refuses to map an empty file.
+            return np.zeros(shape, dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode="r", shape=shape)
+
+    def _memmap_data(self):
+        sr, channels, blocks = self._canonical_blocks()
+        path = self._spill_path()
+        num_samples = 0
+        with open(path, "wb") as out:
+            for block in blocks:
+                block.tofile(out)
+                num_samples += len(block)
+        return self._map_spill(path, num_samples, channels), sr
+
+    def _pitch_params(self, num_samples):
+        """Return ``(n_fft, hop_length)`` for a signal; ``n_fft`` 0 = no pitch."""
+        n_fft = min(self.pitch_n_fft, self._safe_n_fft(num_samples))
+        return n_fft, min(self.pitch_hop_length, max(n_fft, 1))
+
+    def _new_tracker(self, sr, num_samples):
+        """Return a :class:`_PitchTracker` for the signal, or ``None`` if too short."""
+        n_fft, hop_length = self._pitch_params(num_samples)
+        if n_fft == 0:
+            return None
+        return _PitchTracker(
+            sr, n_fft, hop_length,
+            backend=PITCH_BACKENDS[self.pitch_backend],
+            workers=self.pitch_workers,
+        )
+
+    def _stream_data(self):
+        """Single streaming pass: spill PCM and build every feature.
+
+        The pitch tracker is created once ``pitch_n_fft`` samples have been
+        seen (or at the end for shorter files) so its parameters match the
+        in-memory path exactly.
+        """
+        sr, channels, blocks = self._canonical_blocks()
+        path = self._spill_path()
+        index = _AmplitudeIndex()
+        tracker = None
+        pending = []
+        num_samples = 0
+        try:
+            with open(path, "wb") as out:
+                for data in blocks:
+                    data.tofile(out)
+                    index.feed(data)
+                    num_samples += len(data)
+                    mono = self._to_mono(data)
+                    if tracker is None:
+                        pending.append(mono)
+                        if num_samples < self.pitch_n_fft:
+                            continue
+                        tracker = self._new_tracker(sr, num_samples)
+                        mono = np.concatenate(pending)
+                        pending = None
+                    tracker.feed(mono)
+        except BaseException:
+            if tracker is not None:
+                tracker.close()
+            raise
+
+        if tracker is None:
+            tracker = self._new_tracker(sr, num_samples)
+            if tracker is not None:
+                tracker.feed(np.concatenate(pending))
+        if tracker is None:
+            self._pitch_track = np.zeros(0, dtype=np.float32)
+        else:
+            self._pitch_track = tracker.finish()
+            self._pitch_hop = tracker.hop_length
+        self._amplitude_index = index.finish()
+        return self._map_spill(path, num_samples, channels), sr
+
+    def _audio_data(self):
+        """Return ``(data, sr)`` in the canonical layout, decoding on first use.
+
+        ``data`` is 1-D for ``mono`` and ``(samples, channels)`` for
+        ``multichannel``; it is a read-only :class:`numpy.memmap` in memmap
+        mode.
+        """
+        if self._audio is None:
+            if self.streaming and self.feature_cache is None:
+                self._audio = self._stream_data()
+            elif self.memmap:
+                self._audio = self._memmap_data()
+            else:
+                data, sr = self._decode()
+                self._audio = self._resample(self._to_layout(data), sr)
+            if self.feature_cache is not None:
+                self._cached_features()
+        return self._audio
+
+    def _cached_features(self):
+        """Restore the amplitude index and pitch track from the feature cache.
+
+        On a miss both are computed from the decoded audio and stored.
+        """
+        data, sr = self._audio
+        key = self.feature_cache.key(
+            data, sr,
+            layout=self.channel_layout,
+            n_fft=self.pitch_n_fft,
+            hop_length=self.pitch_hop_length,
+            backend=self.pitch_backend,
+        )
+        arrays = self.feature_cache.load(key)
+        if arrays is not None:
+            self._amplitude_index = _AmplitudeIndex.from_arrays(arrays)
+            self._pitch_track = arrays["pitch_track"]
+            self._pitch_hop = int(arrays["pitch_hop"])
+            return
+        track, hop_length, _ = self._pitch_data()
+        _, _, index = self._amplitude_data()
+        arrays = index.to_arrays()
+        arrays["pitch_track"] = track
+        arrays["pitch_hop"] = np.int64(hop_length)
+        self.feature_cache.store(key, arrays)
+
+    def close(self):
+        """Release the decoded audio and remove any memmap file we created."""
+        self._audio = None
+        path, self._memmap_path = self._memmap_path, None
+        if path is None:
+            return
+        try:
+            os.remove(path)
+            if self._owns_memmap_dir:
+                os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+
+    def __getstate__(self):
+        """Pickle state for worker processes.
+
+        A memmap-backed signal is sent as its file path and re-opened
+        read-only on the other side instead of being copied; the receiving
+        analyzer never owns (or deletes) that file. Derived pitch indexes are
+        rebuilt lazily.
+        """
+        state = self.__dict__.copy()
+        state["_memmap_path"] = None
+        state["_owns_memmap_dir"] = False
+        state["_pitch_summary"] = None
+        state["_pitch_maximum"] = None
+        if self._audio is not None and isinstance(self._audio[0], np.memmap):
+            data, sr = self._audio
+            state["_audio"] = None
+            state["_mapped_audio"] = (data.filename, data.shape, sr)
+        return state
+
+    def __setstate__(self, state):
+        mapped = state.pop("_mapped_audio", None)
+        self.__dict__.update(state)
+        if mapped is not None:
+            path, shape, sr = mapped
+            self._audio = (np.memmap(path, dtype=np.float32, mode="r", shape=shape), sr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
     def _segment_samples(self, start_time, end_time):
-        """Return the librosa segment for ``[start_time, end_time]``.
+        """Return the canonical samples for ``[start_time, end_time]``.
 
         Returns ``(y_segment, sr)``. ``y_segment`` may be shorter than
         requested if the times exceed the file length; it may also be empty.
         """
-        y, sr = self._librosa_data()
+        y, sr = self._audio_data()
         start_sample = max(0, int(start_time * sr))
         end_sample = min(len(y), int(end_time * sr))
         if end_sample <= start_sample:
-            return np.empty(0, dtype=y.dtype), sr
+            return y[:0], sr
         return y[start_sample:end_sample], sr
 
     @staticmethod
-    def _peak_pitches(pitches, magnitudes):
-        """Return the per-frame peak pitch (Hz) where pitch > 0."""
+    def _frame_peak_pitches(pitches, magnitudes):
+        """Return the peak pitch (Hz) of every frame, 0.0 where unvoiced."""
         if pitches.size == 0 or magnitudes.size == 0:
-            return []
+            return np.zeros(0, dtype=np.float32)
         peak_bins = magnitudes.argmax(axis=0)
         frames = np.arange(pitches.shape[1])
-        peak_pitches = pitches[peak_bins, frames]
+        return pitches[peak_bins, frames]
+
+    @staticmethod
+    def _peak_pitches(pitches, magnitudes):
+        """Return the per-frame peak pitch (Hz) where pitch > 0."""
+        peak_pitches = AudioAnalyzer._frame_peak_pitches(pitches, magnitudes)
         return peak_pitches[peak_pitches > 0].tolist()
 
     @staticmethod
@@ -65,68 +866,147 @@ class AudioAnalyzer:
             return 0
         return 2 ** int(np.floor(np.log2(num_samples)))
 
+    # ------------------------------------------------------------- pitch track
+    def _pitch_data(self):
+        """Return ``(track, hop_length, sr)`` for the whole file.
+
+        The track is computed on first use and cached; frame ``i`` is centred
+        on sample ``i * hop_length``.
+        """
+        y, sr = self._audio_data()
+        if self._pitch_track is None:
+            tracker = self._new_tracker(sr, len(y))
+            if tracker is None:
+                self._pitch_track = np.zeros(0, dtype=np.float32)
+            else:
+                step = tracker.block_frames * tracker.hop_length
+                try:
+                    for offset in range(0, len(y), step):
+                        tracker.feed(self._to_mono(y[offset:offset + step]))
+                    self._pitch_track = tracker.finish()
+                finally:
+                    tracker.close()
+                self._pitch_hop = tracker.hop_length
+        return self._pitch_track, self._pitch_hop, sr
+
+    def _frame_bounds(self, start_samples, end_samples):
+        """Map sample windows to pitch-track frame ranges ``[first, last)``.
+
+        Frames whose centre falls inside the window are used; windows shorter
+        than one hop fall back to the frame nearest their midpoint. Windows
+        too short to carry any pitch get an empty range. Works on scalars and
+        arrays alike.
+        """
+        track, hop_length, _ = self._pitch_data()
+        start_samples = np.asarray(start_samples, dtype=np.int64)
+        end_samples = np.asarray(end_samples, dtype=np.int64)
+        first = -(-start_samples // hop_length)
+        last = -(-end_samples // hop_length)
+        nearest = np.rint((start_samples + end_samples) / 2 / hop_length).astype(np.int64)
+        short = last <= first
+        first = np.where(short, nearest, first)
+        last = np.where(short, nearest + 1, last)
+        too_short = (end_samples - start_samples) < self._MIN_PITCH_SAMPLES
+        first = np.minimum(first, track.size)
+        last = np.where(too_short, first, np.minimum(last, track.size))
+        return first, last
+
+    def _sample_bounds(self, start_times, end_times):
+        """Clamp times to sample indices ``[start, end)`` within the file."""
+        y, sr = self._audio_data()
+        start_samples = np.maximum(0, (np.asarray(start_times, dtype=np.float64) * sr).astype(np.int64))
+        end_samples = np.minimum(len(y), (np.asarray(end_times, dtype=np.float64) * sr).astype(np.int64))
+        return start_samples, end_samples
+
+    def _frame_slice(self, start_time, end_time):
+        """Return the pitch-track frames covering ``[start_time, end_time]``."""
+        track, _, _ = self._pitch_data()
+        start_sample, end_sample = self._sample_bounds(start_time, end_time)
+        first, last = self._frame_bounds(start_sample, end_sample)
+        return track[int(first):int(last)]
+
+    def _pitch_index(self):
+        """Return ``(voiced_sum_prefix, voiced_count_prefix)``."""
+        if self._pitch_summary is None:
+            track, _, _ = self._pitch_data()
+            voiced = track > 0
+            self._pitch_summary = (
+                np.concatenate(([0.0], np.cumsum(np.where(voiced, track, 0.0), dtype=np.float64))),
+                np.concatenate(([0], np.cumsum(voiced, dtype=np.int64))),
+            )
+        return self._pitch_summary
+
+    def _pitch_max_index(self):
+        """Return the :class:`_RangeExtrema` over the pitch track (built on demand)."""
+        if self._pitch_maximum is None:
+            track, _, _ = self._pitch_data()
+            self._pitch_maximum = _RangeExtrema(track, np.maximum, 0.0)
+        return self._pitch_maximum
+
+    def _mean_pitch_many(self, start_samples, end_samples):
+        """Voiced mean pitch of many sample windows (0.0 when unvoiced)."""
+        voiced_sum, voiced_count = self._pitch_index()
+        first, last = self._frame_bounds(start_samples, end_samples)
+        counts = voiced_count[last] - voiced_count[first]
+        sums = voiced_sum[last] - voiced_sum[first]
+        return np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+
+    @staticmethod
+    def _voiced(frames):
+        return frames[frames > 0]
+
     # --------------------------------------------------------------- pitch APIs
     def _get_pitch_avg(self, start_time, end_time, n_fft=512):
-        y_segment, sr = self._segment_samples(start_time, end_time)
-        n_fft = self._safe_n_fft(len(y_segment))
-        if n_fft == 0:
-            return 0.0
-
-        pitches, magnitudes = librosa.core.piptrack(y=y_segment, sr=sr, n_fft=n_fft)
-        pitch_values = self._peak_pitches(pitches, magnitudes)
-        return float(np.mean(pitch_values)) if pitch_values else 0.0
+        # ``n_fft`` is kept for backwards compatibility; the resolution of the
+        # shared track is governed by ``pitch_n_fft``.
+        pitch_values = self._voiced(self._frame_slice(start_time, end_time))
+        return float(np.mean(pitch_values, dtype=np.float64)) if pitch_values.size else 0.0
 
     def _get_pitch_max(self, start_time, end_time):
-        y_segment, sr = self._segment_samples(start_time, end_time)
-        n_fft = self._safe_n_fft(len(y_segment))
-        if n_fft == 0:
-            return 0.0
+        pitch_values = self._voiced(self._frame_slice(start_time, end_time))
+        return float(np.max(pitch_values)) if pitch_values.size else 0.0
 
-        pitches, magnitudes = librosa.core.piptrack(y=y_segment, sr=sr, n_fft=n_fft)
-        pitch_values = self._peak_pitches(pitches, magnitudes)
-        return float(np.max(pitch_values)) if pitch_values else 0.0
-
-    def _get_pitch_top10_avg(self, start_time, end_time, chunk_size=0.1):
-        y_segment, sr = self._segment_samples(start_time, end_time)
-        if y_segment.size == 0:
-            return 0.0
+    def _get_pitch_top10_avg(self, start_time, end_time, chunk_size=0.1, k=10):
+        """Mean of the ``k`` highest per-chunk mean pitches in the window.
 
+        The window is cut into whole ``chunk_size`` chunks (a trailing partial
+        chunk is dropped); each chunk's voiced mean comes from the prefix sums
+        of the shared track, so the whole query is a few array operations.
+        """
+        _, sr = self._audio_data()
+        start_sample, end_sample = self._sample_bounds(start_time, end_time)
         chunk_length = int(chunk_size * sr)
-        if chunk_length <= 0:
+        if chunk_length <= 0 or k <= 0:
             return 0.0
-        num_chunks = len(y_segment) // chunk_length
+        num_chunks = max(0, int(end_sample - start_sample)) // chunk_length
         if num_chunks == 0:
             return 0.0
 
-        avg_pitches = []
-        for i in range(num_chunks):
-            chunk_start = i * chunk_length
-            chunk_end = chunk_start + chunk_length
-            y_chunk = y_segment[chunk_start:chunk_end]
-
-            n_fft = self._safe_n_fft(len(y_chunk))
-            if n_fft == 0:
-                avg_pitches.append(0.0)
-                continue
+        chunk_starts = start_time + np.arange(num_chunks) * chunk_size
+        avg_pitches = self._mean_pitch_many(
+            *self._sample_bounds(chunk_starts, chunk_starts + chunk_size)
+        )
+        if k < num_chunks:
+            avg_pitches = np.partition(avg_pitches, num_chunks - k)[num_chunks - k:]
+        return float(np.mean(avg_pitches))
 
-            pitches, magnitudes = librosa.core.piptrack(y=y_chunk, sr=sr, n_fft=n_fft)
-            pitch_values = self._peak_pitches(pitches, magnitudes)
-            avg_pitches.append(float(np.mean(pitch_values)) if pitch_values else 0.0)
+    # ----------------------------------------------------------- amplitude APIs
+    def _amplitude_data(self):
+        """Return ``(data, sample_rate, index)`` for amplitude queries.
 
-        top_10 = sorted(avg_pitches, reverse=True)[:10]
-        return float(np.mean(top_10)) if top_10 else 0.0
+        The :class:`_AmplitudeIndex` is built once per file on first use.
+        """
+        audio_data, sample_rate = self._audio_data()
+        if self._amplitude_index is None:
+            self._amplitude_index = _AmplitudeIndex.build(audio_data)
+        return audio_data, sample_rate, self._amplitude_index
 
-    # ----------------------------------------------------------- amplitude APIs
     def _calculate_average_amplitude(self, start_time, end_time):
         try:
-            audio_data, sample_rate = self._soundfile_data()
+            audio_data, sample_rate, index = self._amplitude_data()
             start_sample = max(0, int(start_time * sample_rate))
             end_sample = min(len(audio_data), int(end_time * sample_rate))
-            if end_sample <= start_sample:
-                return 0.0
-            audio_segment = audio_data[start_sample:end_sample]
-            amplitude = np.abs(audio_segment)
-            return float(np.mean(amplitude))
+            return index.mean_abs(audio_data, start_sample, end_sample)
         except Exception as e:
             print(f"An error occurred: {e}")
             return None
@@ -137,15 +1017,18 @@ class AudioAnalyzer:
             # the cached audio data when it points to the same file we already
             # loaded. Otherwise fall back to a fresh read.
             if audio_file_path == self.audio_file:
-                audio_data, sample_rate = self._soundfile_data()
+                audio_data, sample_rate, index = self._amplitude_data()
             else:
                 audio_data, sample_rate = sf.read(audio_file_path)
+                index = None
 
             start_sample = max(0, int(start_time * sample_rate))
             end_sample = min(len(audio_data), int(end_time * sample_rate))
             if end_sample <= start_sample:
                 return 0.0, 0.0
 
+            if index is not None:
+                return index.min_max(audio_data, start_sample, end_sample)
             audio_segment = audio_data[start_sample:end_sample]
             min_amplitude = float(np.min(audio_segment))
             max_amplitude = float(np.max(audio_segment))
@@ -154,3 +1037,32 @@ class AudioAnalyzer:
         except Exception as e:
             print(f"An error occurred: {e}")
             return None, None
+
+    # --------------------------------------------------------------- batch API
+    def analyze_windows(self, start_times, end_times, extrema=False):
+        """Analyze many ``[start, end]`` windows in one vectorized call.
+
+        Returns a dict of float64 arrays aligned with the inputs:
+        ``mean_amplitude`` and ``mean_pitch``, plus ``min_amplitude``,
+        ``max_amplitude`` and ``max_pitch`` when ``extrema`` is true. Each
+        entry matches what the scalar ``_calculate_average_amplitude`` /
+        ``_get_min_max_amplitudes`` / ``_get_pitch_avg`` / ``_get_pitch_max``
+        would return for that window.
+        """
+        audio_data, _, index = self._amplitude_data()
+        start_samples, end_samples = self._sample_bounds(
+            np.atleast_1d(start_times), np.atleast_1d(end_times)
+        )
+        mean_amplitude, min_amplitude, max_amplitude = index.summarize_many(
+            audio_data, start_samples, end_samples, extrema=extrema
+        )
+        result = {
+            "mean_amplitude": mean_amplitude,
+            "mean_pitch": self._mean_pitch_many(start_samples, end_samples),
+        }
+        if extrema:
+            first, last = self._frame_bounds(start_samples, end_samples)
+            result["min_amplitude"] = min_amplitude
+            result["max_amplitude"] = max_amplitude
+            result["max_pitch"] = self._pitch_max_index().query_many(first, last).astype(np.float64)
+        return result
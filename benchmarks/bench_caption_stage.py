@@ -0,0 +1,193 @@
+"""Benchmark the caption stage on synthetic long-form speech.
+
+For every requested duration this writes a speech-like WAV (a harmonic
+"voice" with a gliding F0, syllable-rate amplitude modulation and pauses)
+plus a matching Whisper-shaped transcript (~0.3 s words grouped into
+segments), then runs the same pipeline as ``app.generate_captions`` in a
+fresh process and reports:
+
+    * per-stage wall time -- ``decode`` (decode/resample, plus every feature
+      in streaming mode), ``amplitude`` (block amplitude index), ``pitch``
+      (framewise pitch track) and ``captions`` (``SentenceRecognizer``
+      extract -> stress -> format -> VTT);
+    * ``total`` wall time and the child's peak RSS.
+
+Each scale runs in its own spawned process so peak RSS is per scale. In
+memmap/streaming mode RSS also counts the touched pages of the spilled PCM
+file, which are file-backed and reclaimable by the kernel.
+Synthesizing the input is not timed. The analyzer settings follow the
+app's environment defaults (memmap + streaming, 16 kHz analysis rate);
+``--no-streaming`` / ``--no-memmap`` compare the other modes.
+
+Usage::
+
+    python benchmarks/bench_caption_stage.py --scales 60,600,7200 --json results.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from audio_analyzer import AudioAnalyzer  # noqa: E402
+from bench_pitch_backends import voice_blocks  # noqa: E402
+from stress_highlight import SentenceRecognizer  # noqa: E402
+
+VOCABULARY = (
+    "the quick brown fox jumps over a lazy dog while we talk about "
+    "captions stress pitch loudness and timing in long recordings"
+).split()
+
+STAGES = ("decode", "amplitude", "pitch", "captions")
+
+
+def write_voice(path, seconds, sr, seed=0):
+    """Write ``seconds`` of synthetic speech to ``path`` block by block."""
+    with sf.SoundFile(path, "w", sr, 1, subtype="PCM_16") as out:
+        for samples, _, _ in voice_blocks(seconds, sr, seed):
+            out.write(samples)
+
+
+def make_transcript(seconds, seed=0, word_seconds=0.3, gap=0.05):
+    """Return a Whisper-shaped transcript dict covering ``seconds``."""
+    rng = np.random.default_rng(seed)
+    segments = []
+    position = 0.0
+    while position + word_seconds <= seconds:
+        words = []
+        for _ in range(int(rng.integers(8, 17))):
+            if position + word_seconds > seconds:
+                break
+            token = VOCABULARY[int(rng.integers(len(VOCABULARY)))]
+            words.append({
+                "word": f" {token}",
+                "start": round(position, 3),
+                "end": round(position + word_seconds, 3),
+                "probability": 0.9,
+            })
+            position += word_seconds + gap
+        segments.append({
+            "id": len(segments),
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+            "text": "".join(word["word"] for word in words) + ".",
+            "words": words,
+        })
+        position += 0.4
+    return {"language": "en", "segments": segments}
+
+
+def run_scale(seconds, sr, memmap, streaming, analysis_sr, pitch_workers, caption_workers):
+    """Synthesize one scale and time the caption pipeline (runs in a child)."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        wav_path = os.path.join(work_dir, "voice.wav")
+        write_voice(wav_path, seconds, sr)
+        transcript = make_transcript(seconds)
+        vtt_path = os.path.join(work_dir, "captions.vtt")
+
+        # Warm up (numba JIT inside librosa, FFT plan caches) off the clock.
+        warmup = AudioAnalyzer(wav_path)
+        data, _ = sf.read(wav_path, frames=sr, dtype="float32")
+        warmup._audio = (data, sr)
+        warmup._pitch_data()
+
+        timings = {}
+        started = time.perf_counter()
+        analyzer = AudioAnalyzer(
+            wav_path,
+            memmap=memmap,
+            streaming=streaming,
+            cache_dir=work_dir,
+            analysis_sr=analysis_sr,
+            pitch_workers=pitch_workers,
+        )
+        try:
+            for stage, step in (
+                ("decode", analyzer._audio_data),
+                ("amplitude", analyzer._amplitude_data),
+                ("pitch", analyzer._pitch_data),
+            ):
+                stage_started = time.perf_counter()
+                step()
+                timings[stage] = time.perf_counter() - stage_started
+
+            stage_started = time.perf_counter()
+            cues = []
+            SentenceRecognizer(wav_path, transcript, analyzer=analyzer).generate_vtt(
+                vtt_path, progress=lambda count, _: cues.append(count), workers=caption_workers
+            )
+            timings["captions"] = time.perf_counter() - stage_started
+        finally:
+            analyzer.close()
+        timings["total"] = time.perf_counter() - started
+
+    return {
+        "seconds": seconds,
+        "sr": sr,
+        "words": sum(len(segment["words"]) for segment in transcript["segments"]),
+        "cues": cues[-1] if cues else 0,
+        "timings": timings,
+        # ru_maxrss is reported in kilobytes on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run(scales, sr, memmap, streaming, analysis_sr, pitch_workers, caption_workers):
+    results = []
+    context = multiprocessing.get_context("spawn")
+    print(f"{'audio':>8} {'words':>7} {'cues':>6} "
+          + " ".join(f"{stage:>9}" for stage in STAGES)
+          + f" {'total':>8} {'x rt':>6} {'rss(MB)':>8}")
+    for seconds in scales:
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            result = pool.submit(
+                run_scale, seconds, sr, memmap, streaming, analysis_sr,
+                pitch_workers, caption_workers,
+            ).result()
+        timings = result["timings"]
+        print(
+            f"{seconds / 60:>7.1f}m {result['words']:>7} {result['cues']:>6} "
+            + " ".join(f"{timings[stage]:>9.2f}" for stage in STAGES)
+            + f" {timings['total']:>8.2f} {seconds / timings['total']:>6.0f}"
+            f" {result['peak_rss_mb']:>8.0f}"
+        )
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="60,600,7200",
+                        help="comma-separated audio durations in seconds")
+    parser.add_argument("--sr", type=int, default=44100,
+                        help="sample rate of the synthetic upload (video extracts are 16000)")
+    parser.add_argument("--analysis-sr", type=int, default=16000, help="0 keeps the native rate")
+    parser.add_argument("--no-memmap", action="store_true")
+    parser.add_argument("--no-streaming", action="store_true")
+    parser.add_argument("--pitch-workers", type=int, default=1)
+    parser.add_argument("--caption-workers", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(
+        [float(value) for value in args.scales.split(",")],
+        args.sr,
+        memmap=not args.no_memmap,
+        streaming=not args.no_streaming,
+        analysis_sr=args.analysis_sr or None,
+        pitch_workers=args.pitch_workers,
+        caption_workers=args.caption_workers,
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
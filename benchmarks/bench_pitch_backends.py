@@ -0,0 +1,129 @@
+"""Compare the AudioAnalyzer pitch backends on synthetic speech-like audio.
+
+Synthesizes a harmonic "voice" whose F0 glides between ~90 and ~260 Hz,
+with syllable-rate amplitude modulation and short pauses, then computes the
+whole-file pitch track with every backend in ``audio_analyzer.PITCH_BACKENDS``
+and reports wall time plus agreement with the known synthetic F0:
+
+    * ``voicing``  -- fraction of frames whose voiced/unvoiced decision
+                      matches the synthesis (pauses are unvoiced);
+    * ``median``   -- median ratio of voiced pitches (``backend / true F0``);
+    * ``within``   -- fraction of truly voiced frames the backend reports
+                      within 10% of the true F0;
+    * ``octave``   -- the same after folding octave errors (piptrack reports
+                      the strongest spectral peak, which can be a harmonic);
+    * ``word_corr``-- correlation of per-word mean pitch over 300 ms windows
+                      with the true per-word mean F0, which is what the
+                      stress heuristic actually consumes.
+
+Usage::
+
+    python benchmarks/bench_pitch_backends.py --seconds 120 --sr 16000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from audio_analyzer import PITCH_BACKENDS, AudioAnalyzer  # noqa: E402
+
+
+def voice_blocks(seconds, sr, seed=0, block_seconds=60):
+    """Yield ``(samples, f0, voiced)`` blocks of the synthetic voice.
+
+    Blocks of ``block_seconds`` keep memory flat for hours of audio; the
+    phase carries over, so the concatenation is one continuous signal.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sr)
+    block = int(block_seconds * sr)
+    phase = 0.0
+    for offset in range(0, total, block):
+        t = (offset + np.arange(min(block, total - offset))) / sr
+        f0 = 175 + 85 * np.sin(2 * np.pi * 0.23 * t) * np.sin(2 * np.pi * 0.07 * t + 1.0)
+        phases = phase + 2 * np.pi * np.cumsum(f0) / sr
+        phase = float(phases[-1])
+        voice = sum(a * np.sin(h * phases) for h, a in ((1, 1.0), (2, 0.5), (3, 0.25), (4, 0.12)))
+        syllables = 0.55 + 0.45 * np.sin(2 * np.pi * 4.0 * t) ** 2
+        pauses = (np.sin(2 * np.pi * 0.31 * t) > -0.85).astype(np.float64)
+        noise = 0.01 * rng.standard_normal(len(t))
+        yield (0.3 * voice * syllables * pauses + noise).astype(np.float32), f0, pauses > 0
+
+
+def synthesize_voice(seconds, sr, seed=0):
+    """Return ``(samples, f0, voiced)`` per sample for the synthetic voice."""
+    blocks = list(voice_blocks(seconds, sr, seed))
+    return tuple(np.concatenate(parts) for parts in zip(*blocks))
+
+
+def fold_octaves(ratio):
+    return ratio / 2.0 ** np.round(np.log2(ratio))
+
+
+def window_means(values, voiced, starts, ends):
+    """Mean of ``values`` over the voiced samples of each window (0.0 if none)."""
+    total = np.concatenate(([0.0], np.cumsum(np.where(voiced, values, 0.0))))
+    count = np.concatenate(([0], np.cumsum(voiced)))
+    sums, counts = total[ends] - total[starts], count[ends] - count[starts]
+    return np.divide(sums, counts, out=np.zeros(len(starts)), where=counts > 0)
+
+
+def run(seconds, sr):
+    y, f0, voiced = synthesize_voice(seconds, sr)
+    starts = np.arange(0.0, seconds - 0.3, 0.3)
+    true_words = window_means(
+        f0, voiced, (starts * sr).astype(np.int64), ((starts + 0.3) * sr).astype(np.int64)
+    )
+    tracks = {}
+    timings = {}
+    for name in PITCH_BACKENDS:
+        # Warm up (numba JIT inside librosa, FFT plan caches) off the clock.
+        warmup = AudioAnalyzer("warmup.wav", pitch_backend=name)
+        warmup._audio = (y[:sr], sr)
+        warmup._pitch_data()
+
+        analyzer = AudioAnalyzer("synthetic.wav", pitch_backend=name)
+        analyzer._audio = (y, sr)
+        started = time.perf_counter()
+        tracks[name] = analyzer._pitch_data()[0]
+        timings[name] = time.perf_counter() - started
+
+        tracks[name + ":words"] = analyzer.analyze_windows(starts, starts + 0.3)["mean_pitch"]
+        hop_length = analyzer._pitch_data()[1]
+
+    # Ground truth at each frame centre (frame ``i`` is centred on ``i * hop``).
+    centres = np.minimum(np.arange(len(tracks["piptrack"])) * hop_length, len(y) - 1)
+    true_track = np.where(voiced[centres], f0[centres], 0.0)
+    print(f"{seconds:.0f}s @ {sr} Hz, {len(true_track)} frames")
+    print(f"{'backend':<10} {'time(s)':>8} {'speedup':>8} {'voicing':>8} {'median':>8} "
+          f"{'within':>8} {'octave':>8} {'word_corr':>9}")
+    for name in PITCH_BACKENDS:
+        track = tracks[name]
+        truly_voiced = true_track > 0
+        both = (track > 0) & truly_voiced
+        ratio = track[both] / true_track[both] if both.any() else np.array([np.nan])
+        # Frames the backend calls unvoiced count as misses.
+        errors = np.abs(np.where(both, track, 0.0)[truly_voiced] / true_track[truly_voiced] - 1)
+        folded = np.ones(truly_voiced.sum())
+        folded[both[truly_voiced]] = np.abs(fold_octaves(ratio) - 1)
+        words = tracks[name + ":words"]
+        valid = (words > 0) & (true_words > 0)
+        corr = np.corrcoef(words[valid], true_words[valid])[0, 1] if valid.sum() > 2 else np.nan
+        print(
+            f"{name:<10} {timings[name]:>8.2f} {timings['piptrack'] / timings[name]:>8.1f} "
+            f"{np.mean((track > 0) == truly_voiced):>8.3f} {np.median(ratio):>8.3f} "
+            f"{np.mean(errors < 0.1):>8.3f} {np.mean(folded < 0.1):>8.3f} {corr:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=120.0)
+    parser.add_argument("--sr", type=int, default=16000)
+    args = parser.parse_args()
+    run(args.seconds, args.sr)
@@ -0,0 +1,225 @@
+"""
+Caption cue model and serializers for WebVTT, SRT, TTML and JSON.
+
+A :class:`Cue` is ``(start, end, spans)`` where ``spans`` is a tuple of
+``(text, stressed)`` runs of plain (unescaped) text. ``stress_highlight``
+produces cues directly; stored VTT is turned back into cues with
+:func:`parse_vtt`, so every output format is rendered from the same model
+instead of converting one text format into another.
+
+Stress is mapped to each format's own styling:
+
+    * VTT  -- every stressed letter wrapped in ``<u>`` (what the editor and
+              player expect);
+    * SRT  -- stressed runs wrapped in ``<u>``;
+    * TTML -- stressed runs in ``<span tts:textDecoration="underline">``;
+    * JSON -- an explicit ``stress`` flag per span.
+
+The markup formats escape the text itself (``&``, ``<`` and ``>`` become
+entities) so it cannot be read as a tag. Before this module the VTT
+generator wrote those characters raw; the app's ``sanitize_vtt_content``
+already escaped them before storing, so only the standalone
+``stress_highlight`` output changed.
+"""
+
+import functools
+import html
+import json
+import re
+from collections import namedtuple
+from xml.sax.saxutils import escape as xml_escape
+
+Cue = namedtuple("Cue", "start end spans")
+
+# extension / mimetype of a format, plus the text before, per cue and after.
+CaptionFormat = namedtuple("CaptionFormat", "extension mimetype header cue footer")
+
+# The inline tags the VTT sanitizer lets through (see ``app._ALLOWED_VTT_TAG_RE``).
+_VTT_TAG_RE = re.compile(r"<(/?)(u|b|i|c(?:\.[A-Za-z0-9_\-]+)*)\s*>")
+_VTT_TIME_RE = re.compile(r"(?:(\d+):)?(\d{2}):(\d{2})[.,](\d{3})")
+
+
+def format_time(seconds, decimal_marker="."):
+    """Helper function to format time for VTT files"""
+    whole_seconds = int(seconds)
+    milliseconds = int((seconds - whole_seconds) * 1000)
+    minutes, seconds = divmod(whole_seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def _seconds(milliseconds):
+    """Seconds for a whole ``milliseconds`` value that re-format exactly.
+
+    :func:`format_time` truncates, so the value is placed half a millisecond
+    in; ``milliseconds / 1000`` can land just below and lose a millisecond.
+    """
+    return (milliseconds + 0.5) / 1000
+
+
+def _milliseconds(seconds):
+    whole_seconds = int(seconds)
+    return whole_seconds * 1000 + int((seconds - whole_seconds) * 1000)
+
+
+def append_span(spans, text, stressed):
+    """Append a run to the ``spans`` list, merging it into an equal-flag tail."""
+    if not text:
+        return
+    if spans and spans[-1][1] == stressed:
+        spans[-1] = (spans[-1][0] + text, stressed)
+    else:
+        spans.append((text, stressed))
+
+
+def plain_text(spans):
+    """The cue text without any styling."""
+    return "".join(text for text, _ in spans)
+
+
+@functools.lru_cache(maxsize=4096)
+def _underline(text):
+    """Escape a stressed run, wrapping every letter in ``<u>`` tags."""
+    return "".join(
+        f"<u>{char}</u>" if char.isalpha() else html.escape(char, quote=False) for char in text
+    )
+
+
+def vtt_text(spans):
+    """WebVTT cue text: escaped, with every stressed letter underlined."""
+    return "".join(
+        _underline(text) if stressed else html.escape(text, quote=False) for text, stressed in spans
+    )
+
+
+def _vtt_cue(index, cue):
+    return f"{index}\n{format_time(cue.start)} --> {format_time(cue.end)}\n{vtt_text(cue.spans)}\n\n"
+
+
+def srt_text(spans):
+    """SRT cue text: escaped, with every stressed run underlined."""
+    return "".join(
+        f"<u>{html.escape(text, quote=False)}</u>" if stressed else html.escape(text, quote=False)
+        for text, stressed in spans
+    )
+
+
+def _srt_cue(index, cue):
+    return (
+        f"{index}\n{format_time(cue.start, ',')} --> {format_time(cue.end, ',')}\n"
+        f"{srt_text(cue.spans)}\n\n"
+    )
+
+
+def _ttml_cue(index, cue):
+    parts = []
+    for text, stressed in cue.spans:
+        text = xml_escape(text).replace("\n", "<br/>")
+        if stressed:
+            text = f'<span tts:textDecoration="underline">{text}</span>'
+        parts.append(text)
+    return (
+        f'      <p xml:id="c{index}" begin="{format_time(cue.start)}" '
+        f'end="{format_time(cue.end)}">{"".join(parts)}</p>\n'
+    )
+
+
+def _json_cue(index, cue):
+    entry = {
+        "id": index,
+        "start": _milliseconds(cue.start) / 1000,
+        "end": _milliseconds(cue.end) / 1000,
+        "text": plain_text(cue.spans),
+        "spans": [{"text": text, "stress": bool(stressed)} for text, stressed in cue.spans],
+    }
+    return ("  " if index == 1 else ",\n  ") + json.dumps(entry, ensure_ascii=False)
+
+
+FORMATS = {
+    "vtt": CaptionFormat("vtt", "text/vtt", "WEBVTT\n\n", _vtt_cue, ""),
+    "srt": CaptionFormat("srt", "application/x-subrip", "", _srt_cue, ""),
+    "ttml": CaptionFormat(
+        "ttml",
+        "application/ttml+xml",
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<tt xmlns="http://www.w3.org/ns/ttml" '
+        'xmlns:tts="http://www.w3.org/ns/ttml#styling">\n'
+        "  <body>\n    <div>\n",
+        _ttml_cue,
+        "    </div>\n  </body>\n</tt>\n",
+    ),
+    "json": CaptionFormat("json", "application/json", "[\n", _json_cue, "\n]\n"),
+}
+
+
+def write_cues(stream, cues, fmt="vtt", start_index=1):
+    """Write the body of ``cues`` in ``fmt`` to ``stream``; return the next index.
+
+    Only the per-cue text is written so callers can stream cues in batches
+    between ``FORMATS[fmt].header`` and ``FORMATS[fmt].footer``.
+    """
+    serialize = FORMATS[fmt].cue
+    index = start_index
+    for cue in cues:
+        stream.write(serialize(index, cue))
+        index += 1
+    return index
+
+
+def render(cues, fmt="vtt"):
+    """Return ``cues`` serialized as a complete ``fmt`` document."""
+    caption_format = FORMATS[fmt]
+    serialize = caption_format.cue
+    body = "".join(serialize(index, cue) for index, cue in enumerate(cues, 1))
+    return caption_format.header + body + caption_format.footer
+
+
+def _parse_time(value):
+    match = _VTT_TIME_RE.fullmatch(value.strip().split(" ")[0])
+    if not match:
+        raise ValueError(f"Invalid cue timestamp: {value!r}")
+    hours, minutes, seconds, millis = (int(part or 0) for part in match.groups())
+    return _seconds(((hours * 60 + minutes) * 60 + seconds) * 1000 + millis)
+
+
+def _parse_spans(text):
+    """Split VTT cue text into ``(text, stressed)`` runs.
+
+    Text inside ``<u>`` is stressed; ``<b>``, ``<i>`` and ``<c.*>`` tags are
+    dropped (other formats have no equivalent for the class styling), and
+    entities are decoded. Adjacent runs with the same flag are merged.
+    """
+    spans = []
+    depth = 0
+    position = 0
+    for match in _VTT_TAG_RE.finditer(text):
+        append_span(spans, html.unescape(text[position:match.start()]), depth > 0)
+        if match.group(2) == "u":
+            depth = max(0, depth - 1) if match.group(1) else depth + 1
+        position = match.end()
+    append_span(spans, html.unescape(text[position:]), depth > 0)
+    return tuple(spans)
+
+
+def parse_vtt(content):
+    """Return the :class:`Cue` list of a WebVTT document.
+
+    Blocks without a ``-->`` timing line (the header, NOTE and STYLE blocks)
+    are skipped, as are cues whose timing cannot be parsed.
+    """
+    cues = []
+    for block in re.split(r"\n\s*\n", content.replace("\r\n", "\n")):
+        lines = block.strip("\n").split("\n")
+        for i, line in enumerate(lines):
+            if "-->" in line:
+                break
+        else:
+            continue
+        start, _, end = line.partition("-->")
+        try:
+            start, end = _parse_time(start), _parse_time(end)
+        except ValueError as e:
+            print(f"Skipping VTT cue: {e}")
+            continue
+        cues.append(Cue(start, end, _parse_spans("\n".join(lines[i + 1:]))))
+    return cues
@@ -0,0 +1,135 @@
+"""
+Split long media at silences so its chunks can be transcribed in parallel.
+
+Whisper decodes a file as one sequential stream, so a multi-hour lecture
+takes as long as its slowest single pass. :func:`split_media` runs a cheap
+energy-based voice-activity pass over the decoded 16 kHz mono signal, picks
+cut points in the middle of pauses close to every ``target_seconds`` and
+writes each chunk to its own WAV file. The chunks are independent, so the
+caller can transcribe them concurrently (several model workers locally, or
+several in-flight requests to the remote service) and put the results back
+together with :func:`stitch`, which shifts every segment and word timestamp
+by its chunk offset and renumbers segment ``id``s contiguously.
+
+Cutting inside a pause keeps words whole; when a stretch has no pause near
+the target length the chunk is cut at ``target_seconds * max_factor`` so
+chunks stay bounded.
+"""
+
+import os
+
+import numpy as np
+import soundfile as sf
+
+from audio_analyzer import AudioAnalyzer
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+# Samples per block when computing frame energies (bounded memory on memmaps).
+_ENERGY_BLOCK_SECONDS = 60
+
+
+def frame_energies(data, sr, frame_seconds=FRAME_SECONDS):
+    """Return the RMS level (dBFS) of consecutive ``frame_seconds`` frames."""
+    frame = max(1, int(sr * frame_seconds))
+    num_frames = len(data) // frame
+    energies = np.empty(num_frames, dtype=np.float32)
+    block = max(1, int(_ENERGY_BLOCK_SECONDS / frame_seconds))
+    for first in range(0, num_frames, block):
+        last = min(num_frames, first + block)
+        frames = np.asarray(data[first * frame:last * frame], dtype=np.float32).reshape(-1, frame)
+        rms = np.sqrt(np.mean(np.square(frames), axis=1))
+        energies[first:last] = 20 * np.log10(np.maximum(rms, 1e-10))
+    return energies
+
+
+def find_pauses(energies, frame_seconds=FRAME_SECONDS, min_pause=0.3, margin_db=10.0):
+    """Return the midpoints (seconds) of pauses of at least ``min_pause`` s.
+
+    A frame is silent when it is within ``margin_db`` of the recording's
+    noise floor (its 5th-percentile frame level).
+    """
+    if not len(energies):
+        return np.zeros(0)
+    silent = energies < np.percentile(energies, 5) + margin_db
+    # Starts/ends of silent runs from the edges of the padded mask.
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.view(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    long_enough = (ends - starts) * frame_seconds >= min_pause
+    return (starts[long_enough] + ends[long_enough]) / 2 * frame_seconds
+
+
+def plan_chunks(duration, pauses, target_seconds, max_factor=1.5):
+    """Return ``(start, end)`` chunk bounds (seconds) covering ``duration``.
+
+    Each cut is the pause closest to ``target_seconds`` after the chunk
+    start, looking between half and ``max_factor`` times the target; with
+    no pause in that window the chunk is cut at ``target * max_factor``.
+    """
+    chunks = []
+    start = 0.0
+    while duration - start > target_seconds * max_factor:
+        lo, hi = start + target_seconds / 2, start + target_seconds * max_factor
+        candidates = pauses[(pauses > lo) & (pauses <= hi)]
+        if len(candidates):
+            cut = float(candidates[np.argmin(np.abs(candidates - (start + target_seconds)))])
+        else:
+            cut = hi
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, float(duration)))
+    return chunks
+
+
+def split_media(file_path, work_dir, target_seconds):
+    """Write ``file_path`` as silence-aligned WAV chunks under ``work_dir``.
+
+    Returns a list of ``(offset_seconds, chunk_path)``; a single entry means
+    the media is too short to be worth splitting and ``chunk_path`` is
+    ``file_path`` itself.
+    """
+    analyzer = AudioAnalyzer(file_path, memmap=True, cache_dir=work_dir, analysis_sr=SAMPLE_RATE)
+    try:
+        data, sr = analyzer._audio_data()
+        duration = len(data) / sr
+        if duration <= target_seconds * 1.5:
+            return [(0.0, file_path)]
+        pauses = find_pauses(frame_energies(data, sr))
+        chunks = []
+        for index, (start, end) in enumerate(plan_chunks(duration, pauses, target_seconds)):
+            chunk_path = os.path.join(work_dir, f"chunk_{index:04d}.wav")
+            sf.write(chunk_path, data[int(start * sr):int(end * sr)], sr, subtype="PCM_16")
+            chunks.append((start, chunk_path))
+        return chunks
+    finally:
+        analyzer.close()
+
+
+def shift_segment(segment, offset, segment_id):
+    """Copy of a transcript ``segment`` moved ``offset`` seconds later."""
+    shifted = dict(segment, id=segment_id)
+    shifted["start"] = float(segment.get("start", 0.0)) + offset
+    shifted["end"] = float(segment.get("end", 0.0)) + offset
+    shifted["words"] = [
+        dict(word, start=float(word.get("start", 0.0)) + offset, end=float(word.get("end", 0.0)) + offset)
+        for word in segment.get("words") or []
+    ]
+    return shifted
+
+
+def stitch(chunk_outputs, language=None):
+    """Merge ``(offset_seconds, output)`` chunk transcripts into one output.
+
+    ``output`` dicts have the ``{"text", "language", "segments"}`` shape
+    written by ``sentence_recognition``; the first chunk's language wins.
+    """
+    segments = []
+    for offset, output in chunk_outputs:
+        language = language or output.get("language")
+        for segment in output.get("segments", []):
+            segments.append(shift_segment(segment, offset, len(segments)))
+    return {
+        "text": "".join(segment.get("text", "") for segment in segments),
+        "language": language,
+        "segments": segments,
+    }
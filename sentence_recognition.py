@@ -1,5 +1,9 @@
 import os
 import json
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 """
 Sentence recognition.
@@ -30,6 +34,24 @@ The two backends produce identical JSON shapes so downstream consumers
 _model = None
 
 
+def _chunk_settings():
+    """Return ``(chunk_seconds, workers)`` for chunked transcription.
+
+    ``WHISPER_CHUNK_SECONDS`` > 0 splits long media at silences into chunks
+    of about that length, transcribed ``WHISPER_CHUNK_WORKERS`` at a time
+    (model workers locally, in-flight requests remotely). 0 disables it.
+    """
+    try:
+        chunk_seconds = float(os.environ.get("WHISPER_CHUNK_SECONDS", "0"))
+    except ValueError:
+        chunk_seconds = 0.0
+    try:
+        workers = int(os.environ.get("WHISPER_CHUNK_WORKERS", "2"))
+    except ValueError:
+        workers = 2
+    return max(chunk_seconds, 0.0), max(workers, 1)
+
+
 def _available_memory_gb():
     try:
         import psutil
@@ -90,7 +112,13 @@ def _get_model():
             f"[sentence_recognition] Loading faster-whisper model "
             f"'{model_size}' (device={device}, compute_type={compute_type})..."
         )
-        _model = WhisperModel(model_size, device=device, compute_type=compute_type)
+        # Chunked mode calls ``transcribe`` from several threads; each needs
+        # its own model worker to actually run in parallel.
+        chunk_seconds, chunk_workers = _chunk_settings()
+        num_workers = chunk_workers if chunk_seconds > 0 else 1
+        _model = WhisperModel(
+            model_size, device=device, compute_type=compute_type, num_workers=num_workers
+        )
     return _model
 
 
@@ -176,8 +204,49 @@ def _write_json(file_path, output, segment_count, language):
     return json_path
 
 
+def _retry_after(response, default=10.0, maximum=120.0):
+    """Seconds to wait before retrying a 429/503 response."""
+    try:
+        return min(max(float(response.headers.get("Retry-After", default)), 0.0), maximum)
+    except ValueError:
+        return default
+
+
+def _read_segment_stream(response, language, on_segment=None):
+    """Collect an NDJSON ``/transcribe/stream`` response into the JSON output.
+
+    ``on_segment`` is called with each segment as soon as its line arrives.
+    """
+    segments = []
+    done = None
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError as exc:
+            raise RuntimeError(f"Whisper API sent a malformed stream line: {line[:200]!r}") from exc
+        if event.get("type") == "segment":
+            segments.append(event["segment"])
+            if on_segment is not None:
+                on_segment(event["segment"])
+        elif event.get("type") == "error":
+            raise RuntimeError(f"Whisper API stream failed: {event.get('detail')}")
+        elif event.get("type") == "done":
+            done = event
+    if done is None:
+        raise RuntimeError(
+            f"Whisper API stream ended after {len(segments)} segments without completing."
+        )
+    return {
+        "text": done.get("text", "".join(segment.get("text", "") for segment in segments)),
+        "language": done.get("language", language),
+        "segments": segments,
+    }
+
+
 class SentenceRecognition:
-    def recognize(self, audio_file, sensitivity="off"):
+    def recognize(self, audio_file, sensitivity="off", on_segment=None):
         """Transcribe ``audio_file`` and write a JSON file next to it.
 
         Backend selection is driven by ``WHISPER_BACKEND``
@@ -191,6 +260,9 @@ class SentenceRecognition:
         sensitivity : {"off", "sensitive", "ultra"} or bool, default ``"off"``
             Tier of relaxed thresholds. Accepts a boolean for backwards
             compatibility (``True`` == ``"sensitive"``).
+        on_segment : callable, optional
+            Called with each segment dict as soon as it is available, for
+            progress reporting while the rest is still being decoded.
         """
         file_path = _resolve_audio_path(audio_file)
         if not os.path.isfile(file_path):
@@ -203,17 +275,69 @@ class SentenceRecognition:
 
         backend = os.environ.get("WHISPER_BACKEND", "local").strip().lower()
         if backend == "local":
-            return self._recognize_local(file_path, sensitivity)
-        if backend == "remote":
-            return self._recognize_remote(file_path, sensitivity)
-        raise RuntimeError(
-            f"Unknown WHISPER_BACKEND={backend!r}. Expected 'remote' or 'local'."
-        )
+            transcribe = self._transcribe_local
+        elif backend == "remote":
+            transcribe = self._transcribe_remote
+        else:
+            raise RuntimeError(
+                f"Unknown WHISPER_BACKEND={backend!r}. Expected 'remote' or 'local'."
+            )
+
+        chunk_seconds, workers = _chunk_settings()
+        if chunk_seconds > 0:
+            output = self._transcribe_chunked(
+                file_path, sensitivity, transcribe, chunk_seconds, workers, on_segment
+            )
+        else:
+            output = transcribe(file_path, sensitivity, on_segment)
+        return _write_json(file_path, output, len(output["segments"]), output["language"])
+
+    # ------------------------------------------------------------------
+    # Chunked mode (split at silences, transcribe chunks concurrently)
+    # ------------------------------------------------------------------
+    def _transcribe_chunked(self, file_path, sensitivity, transcribe, chunk_seconds,
+                            workers, on_segment=None):
+        from chunked_transcription import shift_segment, split_media, stitch
+
+        work_dir = tempfile.mkdtemp(prefix="chunks-", dir=os.path.dirname(file_path))
+        try:
+            chunks = split_media(file_path, work_dir, chunk_seconds)
+            if len(chunks) == 1:
+                return transcribe(file_path, sensitivity, on_segment)
+
+            print(
+                f"[sentence_recognition] Transcribing {len(chunks)} chunks "
+                f"({workers} at a time)"
+            )
+            outputs = []
+            segment_count = 0
+            pool = ThreadPoolExecutor(workers)
+            try:
+                futures = [
+                    (offset, pool.submit(transcribe, chunk_path, sensitivity))
+                    for offset, chunk_path in chunks
+                ]
+                # Collect in order so progress is reported in timeline order.
+                for offset, future in futures:
+                    output = future.result()
+                    outputs.append((offset, output))
+                    if on_segment is not None:
+                        for segment in output["segments"]:
+                            on_segment(shift_segment(segment, offset, segment_count))
+                            segment_count += 1
+            except BaseException:
+                # One failed chunk fails the file: skip the chunks not started yet.
+                pool.shutdown(cancel_futures=True)
+                raise
+            pool.shutdown()
+            return stitch(outputs)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
     # ------------------------------------------------------------------
     # Local backend (faster-whisper in-process)
     # ------------------------------------------------------------------
-    def _recognize_local(self, file_path, sensitivity):
+    def _transcribe_local(self, file_path, sensitivity, on_segment=None):
         model = _get_model()
         transcribe_kwargs = _build_transcribe_kwargs(sensitivity)
         segments, info = model.transcribe(file_path, **transcribe_kwargs)
@@ -242,18 +366,19 @@ class SentenceRecognition:
             }
             json_segments.append(seg_dict)
             full_text_parts.append(segment.text)
+            if on_segment is not None:
+                on_segment(seg_dict)
 
-        output = {
+        return {
             "text": "".join(full_text_parts),
             "language": info.language,
             "segments": json_segments,
         }
-        return _write_json(file_path, output, len(json_segments), info.language)
 
     # ------------------------------------------------------------------
     # Remote backend (FastAPI service in server/)
     # ------------------------------------------------------------------
-    def _recognize_remote(self, file_path, sensitivity):
+    def _transcribe_remote(self, file_path, sensitivity, on_segment=None):
         import requests  # imported lazily so local-only setups don't need it
 
         api_url = os.environ.get("WHISPER_API_URL", "").strip().rstrip("/")
@@ -269,35 +394,67 @@ class SentenceRecognition:
         except ValueError:
             timeout = 600.0
         language = os.environ.get("WHISPER_LANGUAGE", "en").strip() or "en"
+        # The service answers 429 (queue full) / 503 (loading) with a
+        # Retry-After header; wait and retry that many times before failing.
+        try:
+            retries = int(os.environ.get("WHISPER_API_RETRIES", "5"))
+        except ValueError:
+            retries = 5
+        # Read segments from ``/transcribe/stream`` as they are decoded
+        # (falls back to ``/transcribe`` on servers without it).
+        stream = os.environ.get("WHISPER_API_STREAM", "1").strip().lower() not in (
+            "0", "false", "no", "off"
+        )
 
-        endpoint = f"{api_url}/transcribe"
         headers = {}
         if api_key:
             headers["Authorization"] = f"Bearer {api_key}"
-
-        print(f"[sentence_recognition] POST {endpoint} (timeout={timeout:.0f}s)")
-
-        try:
-            with open(file_path, "rb") as fh:
-                files = {"file": (os.path.basename(file_path), fh, "application/octet-stream")}
-                data = {"sensitivity": sensitivity, "language": language}
-                response = requests.post(
-                    endpoint,
-                    headers=headers,
-                    files=files,
-                    data=data,
-                    timeout=timeout,
+        data = {"sensitivity": sensitivity, "language": language}
+
+        def post(endpoint):
+            print(f"[sentence_recognition] POST {endpoint} (timeout={timeout:.0f}s)")
+            for attempt in range(retries + 1):
+                try:
+                    with open(file_path, "rb") as fh:
+                        files = {"file": (os.path.basename(file_path), fh, "application/octet-stream")}
+                        response = requests.post(
+                            endpoint,
+                            headers=headers,
+                            files=files,
+                            data=data,
+                            timeout=timeout,
+                            stream=stream,
+                        )
+                except requests.exceptions.Timeout as exc:
+                    raise RuntimeError(
+                        f"Whisper API timed out after {timeout:.0f}s ({endpoint})"
+                    ) from exc
+                except requests.exceptions.ConnectionError as exc:
+                    raise RuntimeError(
+                        f"Whisper API unreachable ({endpoint}): {exc}"
+                    ) from exc
+                except requests.exceptions.RequestException as exc:
+                    raise RuntimeError(f"Whisper API request failed: {exc}") from exc
+
+                if response.status_code not in (429, 503) or attempt == retries:
+                    return response
+                delay = _retry_after(response)
+                print(
+                    f"[sentence_recognition] Whisper API busy (HTTP {response.status_code}); "
+                    f"retrying in {delay:.0f}s"
                 )
-        except requests.exceptions.Timeout as exc:
-            raise RuntimeError(
-                f"Whisper API timed out after {timeout:.0f}s ({endpoint})"
-            ) from exc
-        except requests.exceptions.ConnectionError as exc:
-            raise RuntimeError(
-                f"Whisper API unreachable ({endpoint}): {exc}"
-            ) from exc
-        except requests.exceptions.RequestException as exc:
-            raise RuntimeError(f"Whisper API request failed: {exc}") from exc
+                response.close()
+                time.sleep(delay)
+
+        response = None
+        if stream:
+            response = post(f"{api_url}/transcribe/stream")
+            if response.status_code == 404:
+                print("[sentence_recognition] No streaming endpoint; using /transcribe")
+                response.close()
+                response = None
+        if response is None:
+            response = post(f"{api_url}/transcribe")
 
         if response.status_code != 200:
             body = response.text or ""
@@ -307,6 +464,13 @@ class SentenceRecognition:
                 f"Whisper API returned HTTP {response.status_code}: {body.strip()}"
             )
 
+        if response.headers.get("Content-Type", "").startswith("application/x-ndjson"):
+            try:
+                return _read_segment_stream(response, language, on_segment)
+            except requests.exceptions.RequestException as exc:
+                # A read timeout mid-stream surfaces here, not from post().
+                raise RuntimeError(f"Whisper API stream was interrupted: {exc}") from exc
+
         try:
             payload = response.json()
         except ValueError as exc:
@@ -320,15 +484,17 @@ class SentenceRecognition:
                 "Whisper API response is missing a 'segments' list. "
                 f"Got keys: {sorted(payload.keys()) if isinstance(payload, dict) else type(payload)}"
             )
+        if on_segment is not None:
+            for segment in segments:
+                on_segment(segment)
 
         # Re-emit the same JSON shape the local backend would produce so
         # downstream consumers stay identical.
-        output = {
+        return {
             "text": payload.get("text", ""),
             "language": payload.get("language", language),
             "segments": segments,
         }
-        return _write_json(file_path, output, len(segments), output["language"])
 
 
 if __name__ == "__main__":
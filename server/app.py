@@ -13,17 +13,24 @@ remote and local outputs interchangeably.
 
 from __future__ import annotations
 
+import asyncio
+import bisect
+import json
 import logging
 import os
+import queue
 import shutil
 import tempfile
+import threading
 import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from typing import Optional
 
 from fastapi import FastAPI, File, Form, Header, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
 
 # ---------------------------------------------------------------------------
@@ -38,6 +45,18 @@ COMPUTE_TYPE = os.environ.get(
 API_KEY = os.environ.get("WHISPER_API_KEY", "").strip()
 MAX_UPLOAD_MB = int(os.environ.get("WHISPER_MAX_UPLOAD_MB", "1024"))
 DEFAULT_LANGUAGE = os.environ.get("WHISPER_DEFAULT_LANGUAGE", "en")
+# Dynamic batching: requests that arrive within MAX_WAIT_MS of the first one
+# (up to MAX_BATCH_SIZE of them) are decoded together, and their speech
+# chunks share GPU batches of MAX_BATCH_SIZE. Set MAX_BATCH_SIZE=1 to
+# transcribe one file at a time with the plain model.
+MAX_BATCH_SIZE = int(os.environ.get("WHISPER_MAX_BATCH_SIZE", "16"))
+MAX_WAIT_MS = float(os.environ.get("WHISPER_BATCH_MAX_WAIT_MS", "50"))
+# Admission control: at most MAX_QUEUE transcriptions may be queued or
+# running; further uploads get 429 + Retry-After instead of piling up.
+MAX_QUEUE = int(os.environ.get("WHISPER_MAX_QUEUE", "32"))
+RETRY_AFTER_S = int(os.environ.get("WHISPER_RETRY_AFTER_S", "30"))
+# Threads that decode and VAD-split batched files while the GPU is busy.
+PREP_WORKERS = int(os.environ.get("WHISPER_PREP_WORKERS", "4"))
 
 SENSITIVITY_LEVELS = ("off", "sensitive", "ultra")
 
@@ -94,7 +113,7 @@ def normalise_sensitivity(value: Optional[str]) -> str:
 # Model lifecycle
 # ---------------------------------------------------------------------------
 
-_state: dict = {"model": None}
+_state: dict = {"model": None, "scheduler": None}
 
 
 def _load_model():
@@ -113,7 +132,11 @@ def _load_model():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     _state["model"] = _load_model()
+    _state["scheduler"] = BatchScheduler(_state["model"])
+    _state["scheduler"].start()
     yield
+    _state["scheduler"].stop()
+    _state["scheduler"] = None
     _state["model"] = None
 
 
@@ -154,37 +177,337 @@ def _safe_suffix(filename: Optional[str]) -> str:
     return ext
 
 
-def _segments_to_payload(segments_iter, info) -> dict:
+def _segment_to_dict(segment, segment_id: int, offset: float = 0.0) -> dict:
+    """JSON shape of one faster-whisper segment, shifted back by ``offset`` s."""
+    words = []
+    if segment.words:
+        for w in segment.words:
+            words.append(
+                {
+                    "word": w.word,
+                    "start": float(w.start) - offset if w.start is not None else 0.0,
+                    "end": float(w.end) - offset if w.end is not None else 0.0,
+                    "probability": float(getattr(w, "probability", 0.0) or 0.0),
+                }
+            )
+    return {
+        "id": segment_id,
+        "start": float(segment.start) - offset if segment.start is not None else 0.0,
+        "end": float(segment.end) - offset if segment.end is not None else 0.0,
+        "text": segment.text,
+        "words": words,
+    }
+
+
+def _build_payload(json_segments: list, language: str) -> dict:
+    return {
+        "text": "".join(segment["text"] for segment in json_segments),
+        "language": language,
+        "segments": json_segments,
+    }
+
+
+def _segments_to_payload(segments_iter, info, on_segment=None) -> dict:
     json_segments = []
-    full_text_parts = []
     for segment in segments_iter:
-        words = []
-        if segment.words:
-            for w in segment.words:
-                words.append(
-                    {
-                        "word": w.word,
-                        "start": float(w.start) if w.start is not None else 0.0,
-                        "end": float(w.end) if w.end is not None else 0.0,
-                        "probability": float(getattr(w, "probability", 0.0) or 0.0),
-                    }
-                )
-        json_segments.append(
-            {
-                "id": len(json_segments),
-                "start": float(segment.start) if segment.start is not None else 0.0,
-                "end": float(segment.end) if segment.end is not None else 0.0,
-                "text": segment.text,
-                "words": words,
+        json_segments.append(_segment_to_dict(segment, len(json_segments)))
+        if on_segment is not None:
+            on_segment(json_segments[-1])
+    return _build_payload(json_segments, info.language)
+
+
+# ---------------------------------------------------------------------------
+# Batch scheduler
+# ---------------------------------------------------------------------------
+
+SAMPLE_RATE = 16000
+
+
+def _load_batched_pipeline(model):
+    """Wrap ``model`` in faster-whisper's batched pipeline (>= 1.1), if present."""
+    if MAX_BATCH_SIZE <= 1:
+        return None
+    try:
+        from faster_whisper import BatchedInferencePipeline
+    except ImportError:
+        log.warning("faster-whisper has no BatchedInferencePipeline; batching disabled")
+        return None
+    return BatchedInferencePipeline(model=model)
+
+
+def _clip_timestamps(clips: list) -> list:
+    """``clip_timestamps`` for the batched pipeline from sample-based clips.
+
+    faster-whisper 1.1.0 takes them in samples; later releases take seconds.
+    """
+    import faster_whisper
+
+    if faster_whisper.__version__ == "1.1.0":
+        return clips
+    return [
+        {"start": clip["start"] / SAMPLE_RATE, "end": clip["end"] / SAMPLE_RATE}
+        for clip in clips
+    ]
+
+
+class QueueFullError(RuntimeError):
+    """Raised by :meth:`BatchScheduler.submit` when the queue is at capacity."""
+
+
+class SchedulerClosedError(RuntimeError):
+    """Raised by :meth:`BatchScheduler.submit` once the service is stopping."""
+
+
+class _Job:
+    __slots__ = ("audio_path", "kwargs", "request_id", "batchable", "on_segment", "future")
+
+    def __init__(self, audio_path: str, kwargs: dict, request_id: str, batchable: bool,
+                 on_segment=None):
+        self.audio_path = audio_path
+        self.kwargs = kwargs
+        self.request_id = request_id
+        self.batchable = batchable
+        # Called on the inference thread with each segment dict as it is decoded.
+        self.on_segment = on_segment
+        self.future = Future()
+
+
+class BatchScheduler:
+    """Runs every transcription on one inference thread, batching requests.
+
+    The thread takes the oldest pending job, waits up to ``max_wait_ms`` for
+    more (at most ``max_batch_size`` jobs in total), then groups the jobs by
+    transcribe options. Batchable (default-sensitivity) groups go through
+    the batched pipeline in a single pass: each file is split at silences with
+    faster-whisper's VAD, the files are concatenated and the speech chunks
+    of all of them are decoded in shared GPU batches, then the segments are
+    mapped back to their file with file-relative timestamps. The relaxed
+    sensitivity tiers keep ``vad_filter=False`` semantics (VAD would drop
+    the quiet speech they exist to catch) and run one file at a time, as
+    does a batch of one (so a lone request gets exactly the unbatched
+    transcript) and everything when the batched pipeline is unavailable.
+
+    Admission is bounded: at most ``max_queue`` jobs may be queued, running
+    or still uploading. Endpoints :meth:`reserve` a slot before reading the
+    upload; :meth:`reserve` (and :meth:`submit` without a reservation)
+    raises :class:`QueueFullError` beyond that (or
+    :class:`SchedulerClosedError` after :meth:`stop`).
+    Decoding and VAD of batched files run on a small thread pool
+    (``prep_workers``) so several files are prepared at once.
+    """
+
+    def __init__(self, model, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_WAIT_MS, max_queue: int = MAX_QUEUE,
+                 prep_workers: int = PREP_WORKERS):
+        self.model = model
+        self.pipeline = _load_batched_pipeline(model)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max(1, max_queue)
+        self._jobs: queue.Queue = queue.Queue()
+        self._prep = ThreadPoolExecutor(max(1, prep_workers), thread_name_prefix="whisper-prep")
+        self._thread = threading.Thread(target=self._run, name="whisper-scheduler", daemon=True)
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._running = 0
+        self._reserved = 0
+        self._accepting = True
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._accepting = False
+        self._jobs.put(None)
+        self._thread.join()
+        self._prep.shutdown()
+
+    def stats(self) -> dict:
+        """Queue depth for ``/health``."""
+        with self._lock:
+            return {
+                "queued": self._outstanding - self._running - self._reserved,
+                "running": self._running,
+                "uploading": self._reserved,
+                "capacity": self.max_queue,
             }
+
+    def reserve(self) -> None:
+        """Claim a queue slot for an upload that has not been read yet.
+
+        Pass ``reserved=True`` to :meth:`submit` to use the slot, or call
+        :meth:`unreserve` if the upload fails (including when ``submit``
+        itself raises).
+        """
+        with self._lock:
+            if not self._accepting:
+                raise SchedulerClosedError("Server is shutting down")
+            if self._outstanding >= self.max_queue:
+                raise QueueFullError(f"{self._outstanding} transcriptions already queued")
+            self._outstanding += 1
+            self._reserved += 1
+
+    def unreserve(self) -> None:
+        with self._lock:
+            self._outstanding -= 1
+            self._reserved -= 1
+
+    def submit(self, audio_path: str, kwargs: dict, request_id: str,
+               batchable: bool = True, on_segment=None, reserved: bool = False) -> Future:
+        """Queue a transcription; the future resolves to the JSON payload.
+
+        ``on_segment`` (optional) is called from the inference thread with
+        every segment dict as soon as it is decoded. With ``reserved`` the
+        job takes the slot claimed earlier by :meth:`reserve`.
+        """
+        if not reserved:
+            self.reserve()
+        with self._lock:
+            if not self._accepting:
+                if not reserved:
+                    self._outstanding -= 1
+                    self._reserved -= 1
+                raise SchedulerClosedError("Server is shutting down")
+            self._reserved -= 1
+        job = _Job(audio_path, kwargs, request_id, batchable, on_segment)
+        job.future.add_done_callback(self._release)
+        self._jobs.put(job)
+        return job.future
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._outstanding -= 1
+            # A running future cannot be cancelled, so only queued ones are.
+            if not future.cancelled():
+                self._running -= 1
+
+    def _claim(self, job: _Job) -> bool:
+        """Mark ``job`` running unless its client already cancelled it."""
+        if not job.future.set_running_or_notify_cancel():
+            return False
+        with self._lock:
+            self._running += 1
+        return True
+
+    def _gather(self) -> Optional[list]:
+        """Block for the next job, then collect more for up to ``max_wait``."""
+        job = self._jobs.get()
+        if job is None:
+            return None
+        jobs = [job]
+        deadline = time.monotonic() + self.max_wait
+        while len(jobs) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._jobs.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                # Finish this round, then let the loop see the sentinel.
+                self._jobs.put(None)
+                break
+            jobs.append(job)
+        return jobs
+
+    def _run(self) -> None:
+        while True:
+            jobs = self._gather()
+            if jobs is None:
+                break
+            jobs = [job for job in jobs if self._claim(job)]
+            groups: dict = {}
+            for job in jobs:
+                key = (job.batchable, repr(sorted(job.kwargs.items())))
+                groups.setdefault(key, []).append(job)
+            for group in groups.values():
+                self._run_group(group)
+
+        # Fail whatever was queued after the stop request.
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None and self._claim(job):
+                job.future.set_exception(SchedulerClosedError("Server is shutting down"))
+
+    def _run_group(self, jobs: list) -> None:
+        kwargs = jobs[0].kwargs
+        if self.pipeline is not None and jobs[0].batchable and len(jobs) > 1:
+            try:
+                payloads = self._transcribe_batched(jobs, kwargs)
+            except Exception:
+                log.exception(
+                    "batched transcription of %s failed; retrying one by one",
+                    ",".join(job.request_id for job in jobs),
+                )
+            else:
+                for job, payload in zip(jobs, payloads):
+                    job.future.set_result(payload)
+                return
+
+        for job in jobs:
+            try:
+                segments_iter, info = self.model.transcribe(job.audio_path, **kwargs)
+                job.future.set_result(_segments_to_payload(segments_iter, info, job.on_segment))
+            except Exception as exc:
+                job.future.set_exception(exc)
+
+    def _transcribe_batched(self, jobs: list, kwargs: dict) -> list:
+        import numpy as np
+        from faster_whisper.audio import decode_audio
+        from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
+
+        vad_options = VadOptions(
+            max_speech_duration_s=kwargs.get("chunk_length") or 30,
+            min_silence_duration_ms=160,
         )
-        full_text_parts.append(segment.text)
+        def prepare(job):
+            audio = decode_audio(job.audio_path, sampling_rate=SAMPLE_RATE)
+            return audio, merge_segments(get_speech_timestamps(audio, vad_options), vad_options)
+
+        audios, offsets, clips = [], [], []
+        offset = 0
+        for audio, speech_clips in self._prep.map(prepare, jobs):
+            for clip in speech_clips:
+                clips.append({"start": clip["start"] + offset, "end": clip["end"] + offset})
+            audios.append(audio)
+            offsets.append(offset)
+            offset += len(audio)
+
+        per_job: list = [[] for _ in jobs]
+        if clips:
+            options = {key: value for key, value in kwargs.items() if key != "vad_filter"}
+            segments_iter, _ = self.pipeline.transcribe(
+                np.concatenate(audios),
+                clip_timestamps=_clip_timestamps(clips),
+                batch_size=self.max_batch_size,
+                **options,
+            )
+            for segment in segments_iter:
+                # Chunks never cross files, so a segment's midpoint names its file.
+                middle = (segment.start + segment.end) / 2 * SAMPLE_RATE
+                index = max(0, bisect.bisect_right(offsets, middle) - 1)
+                per_job[index].append(
+                    _segment_to_dict(segment, len(per_job[index]), offsets[index] / SAMPLE_RATE)
+                )
 
-    return {
-        "text": "".join(full_text_parts),
-        "language": info.language,
-        "segments": json_segments,
-    }
+        # Report segments only once the whole pass succeeded; a failure midway
+        # falls back to one-by-one decoding, which reports them again.
+        for job, json_segments in zip(jobs, per_job):
+            if job.on_segment is not None:
+                for json_segment in json_segments:
+                    job.on_segment(json_segment)
+
+        log.info(
+            "batched %d file(s), %d speech chunk(s): %s",
+            len(jobs), len(clips), ",".join(job.request_id for job in jobs),
+        )
+        language = kwargs.get("language") or DEFAULT_LANGUAGE
+        return [_build_payload(json_segments, language) for json_segments in per_job]
 
 
 # ---------------------------------------------------------------------------
@@ -203,7 +526,10 @@ def root():
 
 @app.get("/health")
 def health():
-    ready = _state.get("model") is not None
+    # Answered off the inference thread, so it stays responsive while the
+    # GPU is busy; a full queue is reported but does not fail the check.
+    scheduler = _state.get("scheduler")
+    ready = scheduler is not None
     return JSONResponse(
         status_code=200 if ready else 503,
         content={
@@ -211,10 +537,87 @@ def health():
             "model": MODEL_SIZE,
             "device": DEVICE,
             "compute_type": COMPUTE_TYPE,
+            "batching": bool(ready and scheduler.pipeline is not None),
+            "queue": scheduler.stats() if ready else None,
         },
     )
 
 
+def _queue_full(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Transcription queue is full ({detail}); retry later",
+        headers={"Retry-After": str(RETRY_AFTER_S)},
+    )
+
+
+def _admit(authorization: Optional[str]) -> BatchScheduler:
+    """Authenticate and reserve a queue slot before an upload is read.
+
+    The caller owns the reservation: :func:`_upload_and_submit` hands it to
+    the job or gives it back.
+    """
+    _check_auth(authorization)
+
+    scheduler = _state.get("scheduler")
+    if scheduler is None:
+        raise HTTPException(status_code=503, detail="Model is still loading")
+    # Refuse before reading a possibly huge upload; concurrent uploads each
+    # hold a slot, so a burst cannot all write to disk first.
+    try:
+        scheduler.reserve()
+    except QueueFullError as exc:
+        raise _queue_full(str(exc)) from exc
+    except SchedulerClosedError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    return scheduler
+
+
+async def _save_upload(file: UploadFile, tmp_path: str) -> int:
+    """Copy the upload to ``tmp_path``, enforcing the size limit."""
+    bytes_written = 0
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    with open(tmp_path, "wb") as out:
+        while True:
+            chunk = await file.read(1024 * 1024)
+            if not chunk:
+                break
+            bytes_written += len(chunk)
+            if bytes_written > limit:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Upload exceeds {MAX_UPLOAD_MB} MB limit",
+                )
+            out.write(chunk)
+    return bytes_written
+
+
+async def _upload_and_submit(scheduler: BatchScheduler, file: UploadFile, tmp_path: str,
+                             sensitivity: str, language: str, request_id: str,
+                             kind: str, on_segment=None) -> Future:
+    """Save the upload and queue it in the slot reserved by :func:`_admit`.
+
+    The slot is given back if the upload or the submission fails.
+    """
+    try:
+        bytes_written = await _save_upload(file, tmp_path)
+        log.info(
+            "[%s] %s start file=%s size=%.2fMB sensitivity=%s lang=%s",
+            request_id, kind, file.filename, bytes_written / (1024 * 1024),
+            sensitivity, language,
+        )
+        return scheduler.submit(
+            tmp_path, build_transcribe_kwargs(sensitivity, language), request_id,
+            batchable=sensitivity == "off", on_segment=on_segment, reserved=True,
+        )
+    except SchedulerClosedError as exc:
+        scheduler.unreserve()
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    except BaseException:
+        scheduler.unreserve()
+        raise
+
+
 @app.post("/transcribe")
 async def transcribe(
     file: UploadFile = File(...),
@@ -222,11 +625,7 @@ async def transcribe(
     language: str = Form(DEFAULT_LANGUAGE),
     authorization: Optional[str] = Header(default=None),
 ):
-    _check_auth(authorization)
-
-    model = _state.get("model")
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model is still loading")
+    scheduler = _admit(authorization)
 
     sensitivity = normalise_sensitivity(sensitivity)
     suffix = _safe_suffix(file.filename)
@@ -234,34 +633,15 @@ async def transcribe(
 
     tmp_dir = tempfile.mkdtemp(prefix=f"whisper-{request_id}-")
     tmp_path = os.path.join(tmp_dir, f"input{suffix}")
-    bytes_written = 0
-    limit = MAX_UPLOAD_MB * 1024 * 1024
 
     try:
-        with open(tmp_path, "wb") as out:
-            while True:
-                chunk = await file.read(1024 * 1024)
-                if not chunk:
-                    break
-                bytes_written += len(chunk)
-                if bytes_written > limit:
-                    raise HTTPException(
-                        status_code=413,
-                        detail=f"Upload exceeds {MAX_UPLOAD_MB} MB limit",
-                    )
-                out.write(chunk)
-
-        log.info(
-            "[%s] transcribe start file=%s size=%.2fMB sensitivity=%s lang=%s",
-            request_id, file.filename, bytes_written / (1024 * 1024),
-            sensitivity, language,
+        future = await _upload_and_submit(
+            scheduler, file, tmp_path, sensitivity, language, request_id, "transcribe"
         )
-
-        kwargs = build_transcribe_kwargs(sensitivity, language)
         started = time.time()
         try:
-            segments_iter, info = model.transcribe(tmp_path, **kwargs)
-            payload = _segments_to_payload(segments_iter, info)
+            # The scheduler thread runs the model, so the event loop stays free.
+            payload = await asyncio.wrap_future(future)
         except Exception as exc:
             log.exception("[%s] transcription failed", request_id)
             raise HTTPException(
@@ -277,3 +657,79 @@ async def transcribe(
         return payload
     finally:
         shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@app.post("/transcribe/stream")
+async def transcribe_stream(
+    file: UploadFile = File(...),
+    sensitivity: str = Form("off"),
+    language: str = Form(DEFAULT_LANGUAGE),
+    authorization: Optional[str] = Header(default=None),
+):
+    """Like ``/transcribe``, but streams NDJSON as segments are decoded.
+
+    Each line is one JSON object: ``{"type": "segment", "segment": {...}}``
+    per segment (same shape as in ``/transcribe``), then a final
+    ``{"type": "done", "text": ..., "language": ..., "segment_count": n}``
+    or, if transcription fails after the stream started,
+    ``{"type": "error", "detail": ...}``.
+    """
+    scheduler = _admit(authorization)
+
+    sensitivity = normalise_sensitivity(sensitivity)
+    suffix = _safe_suffix(file.filename)
+    request_id = uuid.uuid4().hex[:8]
+
+    tmp_dir = tempfile.mkdtemp(prefix=f"whisper-{request_id}-")
+    tmp_path = os.path.join(tmp_dir, f"input{suffix}")
+    try:
+        # Segments arrive on the inference thread; hop them onto the loop.
+        # ``None`` marks the end (the job's future is done).
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        future = await _upload_and_submit(
+            scheduler, file, tmp_path, sensitivity, language, request_id, "stream",
+            on_segment=lambda segment: loop.call_soon_threadsafe(events.put_nowait, segment),
+        )
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, None))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    def cleanup():
+        # Client went away: drop the job if it has not started yet.
+        future.cancel()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    async def lines():
+        started = time.time()
+        try:
+            while True:
+                segment = await events.get()
+                if segment is None:
+                    break
+                yield json.dumps({"type": "segment", "segment": segment}) + "\n"
+            try:
+                payload = future.result()
+            except Exception as exc:
+                log.exception("[%s] transcription failed", request_id)
+                yield json.dumps({"type": "error", "detail": f"Transcription failed: {exc}"}) + "\n"
+                return
+            log.info(
+                "[%s] stream done segments=%d language=%s elapsed=%.2fs",
+                request_id, len(payload["segments"]), payload["language"], time.time() - started,
+            )
+            yield json.dumps({
+                "type": "done",
+                "text": payload["text"],
+                "language": payload["language"],
+                "segment_count": len(payload["segments"]),
+            }) + "\n"
+        finally:
+            cleanup()
+
+    # The generator's ``finally`` never runs if the client disconnects
+    # before the body starts, so the response cleans up after itself too.
+    return StreamingResponse(
+        lines(), media_type="application/x-ndjson", background=BackgroundTask(cleanup)
+    )
@@ -1,69 +1,194 @@
+import collections
+import functools
+import io
+import itertools
 import os
 import re
 import json
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from audio_analyzer import AudioAnalyzer
+from caption_formats import FORMATS, Cue, append_span, format_time, vtt_text, write_cues
+
+
+def _env_float(name, default):
+    """Read a float environment variable, falling back to ``default``."""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return float(default)
 
 
 # Maximum duration (seconds) for a single subtitle cue. Whisper segments can
 # run ~10s which produces long, hard-to-read captions, so any segment longer
 # than this is split into smaller cues at word boundaries. Configurable via
 # the ``SUBTITLE_MAX_DURATION`` environment variable.
-try:
-    MAX_CUE_DURATION = float(os.environ.get("SUBTITLE_MAX_DURATION", "5.0"))
-except ValueError:
-    MAX_CUE_DURATION = 5.0
+MAX_CUE_DURATION = _env_float("SUBTITLE_MAX_DURATION", "5.0")
+
+# Stress rule: a word is stressed when its amplitude exceeds
+# ``STRESS_AMPLITUDE_RATIO`` x the sentence amplitude while reaching
+# ``STRESS_AMPLITUDE_PEAK_RATIO`` x the loudest word of the sentence, or when
+# its pitch exceeds ``STRESS_PITCH_RATIO`` x the sentence pitch.
+STRESS_AMPLITUDE_RATIO = _env_float("STRESS_AMPLITUDE_RATIO", "1.5")
+STRESS_AMPLITUDE_PEAK_RATIO = _env_float("STRESS_AMPLITUDE_PEAK_RATIO", "0.8")
+STRESS_PITCH_RATIO = _env_float("STRESS_PITCH_RATIO", "1.4")
+
+# Whisper segments processed together by the streaming caption pipeline: large
+# enough that the batched analyzer calls amortise, small enough that cues for
+# the start of a long file are written within moments.
+SEGMENT_BATCH_SIZE = int(_env_float("CAPTION_SEGMENT_BATCH", "64"))
+
+# Worker processes used to caption segment batches in parallel (1 = inline).
+CAPTION_WORKERS = int(_env_float("CAPTION_WORKERS", "1"))
+
+
+# Columnar per-word record used throughout the stress pipeline. The word text
+# lives in a parallel Python list (``SentenceRecognizer.word_text``) so long
+# transcripts cost one small record per word instead of several dicts.
+WORD_DTYPE = np.dtype([
+    ("start", np.float64),
+    ("end", np.float64),
+    ("amplitude", np.float64),
+    ("pitch", np.float64),
+    ("stress", np.int8),
+])
+
+
+def _is_word_char(char):
+    """True for characters the ``\\w`` regex class matches."""
+    return char.isalnum() or char == "_"
+
+
+@functools.lru_cache(maxsize=4096)
+def _word_pattern(word):
+    """Compiled boundary-aware search pattern for ``word`` (``None`` if invalid).
+
+    Transcripts repeat the same few thousand words, so compiled patterns are
+    memoized instead of being rebuilt for every token.
+    """
+    pattern_parts = []
+    if _is_word_char(word[:1]):
+        pattern_parts.append(r"\b")
+    pattern_parts.append(re.escape(word))
+    if _is_word_char(word[-1:]):
+        pattern_parts.append(r"\b")
+    try:
+        return re.compile("".join(pattern_parts))
+    except re.error:
+        return None
+
 
+# Per-process recognizer used by caption workers; set once by the pool
+# initializer so the analyzer is shipped to each worker only once. It never
+# sees the transcript: every batch arrives with its own segments.
+_worker_recognizer = None
 
-def format_time(seconds):
-    """Helper function to format time for VTT files"""
-    whole_seconds = int(seconds)
-    milliseconds = int((seconds - whole_seconds) * 1000)
-    minutes, seconds = divmod(whole_seconds, 60)
-    hours, minutes = divmod(minutes, 60)
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+def _init_caption_worker(audio_file, analyzer, settings):
+    global _worker_recognizer
+    _worker_recognizer = SentenceRecognizer(audio_file, None, analyzer=analyzer, **settings)
+
+
+def _caption_batch(segments):
+    return _worker_recognizer._cue_batch(segments)
 
 
 class SentenceRecognizer:
-    def __init__(self, audio_file, json_file):
+    """Stress-highlighted captions for one transcript.
+
+    ``json_file`` is the Whisper transcript: a path to the JSON file, the
+    already-parsed ``{"segments": [...]}`` object, or any iterable of
+    segment dicts (a one-shot iterator is consumed by the first pass).
+    """
+
+    def __init__(self, audio_file, json_file, analyzer=None,
+                 amplitude_ratio=STRESS_AMPLITUDE_RATIO,
+                 amplitude_peak_ratio=STRESS_AMPLITUDE_PEAK_RATIO,
+                 pitch_ratio=STRESS_PITCH_RATIO,
+                 max_cue_duration=MAX_CUE_DURATION):
         self.audio_file = audio_file
         self.json_file = json_file
-        # ``text_sentences`` holds the raw segment text. ``sentences`` holds the
-        # per-word data for segments that produced at least one usable word.
-        # ``sentence_indices`` records, for each entry in ``sentences``, the
-        # index of the matching entry in ``text_sentences`` so we can pair the
-        # two lists back together even when some segments are skipped.
+        self.max_cue_duration = max_cue_duration
+        self.amplitude_ratio = amplitude_ratio
+        self.amplitude_peak_ratio = amplitude_peak_ratio
+        self.pitch_ratio = pitch_ratio
+        # ``text_sentences`` holds the raw segment text. ``words`` is a
+        # ``WORD_DTYPE`` array of every usable word, with its original token
+        # at the same position in ``word_text``. Sentence ``k`` (a segment that
+        # produced at least one usable word) covers
+        # ``words[sentence_offsets[k]:sentence_offsets[k + 1]]``, and
+        # ``sentence_indices[k]`` is the index of its entry in
+        # ``text_sentences`` so the two can be paired back together even when
+        # some segments are skipped.
         self.text_sentences = []
-        self.sentences = []
+        self.words = np.zeros(0, dtype=WORD_DTYPE)
+        self.word_text = []
+        self.sentence_offsets = np.zeros(1, dtype=np.int64)
         self.sentence_indices = []
         # Share a single AudioAnalyzer across the whole pipeline so that the
-        # cached librosa/soundfile data is reused for every word/segment.
-        self._analyzer = AudioAnalyzer(audio_file)
-
-    def collect_data(self):
-        """Collect data from JSON file while preserving original text"""
-        with open(self.json_file, "r", encoding='utf-8') as f:
-            data = json.load(f)
-        for segment in data["segments"]:
+        # decoded audio and its indexes are reused for every word/segment.
+        # Callers may pass a pre-configured analyzer (e.g. memmap-backed).
+        self._analyzer = analyzer if analyzer is not None else AudioAnalyzer(audio_file)
+
+    def _load_segments(self):
+        transcript = self.json_file
+        if isinstance(transcript, (str, bytes, os.PathLike)):
+            with open(transcript, "r", encoding='utf-8') as f:
+                return json.load(f)["segments"]
+        if isinstance(transcript, dict):
+            return transcript["segments"]
+        return transcript
+
+    def _segment_batches(self, batch_size):
+        segments = iter(self._load_segments())
+        while True:
+            batch = list(itertools.islice(segments, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def collect_data(self, segments=None):
+        """Collect data from JSON file while preserving original text.
+
+        ``segments`` restricts collection to those Whisper segments (one
+        batch of :meth:`iter_cue_batches`); data from any previous call is
+        replaced.
+        """
+        if segments is None:
+            segments = self._load_segments()
+        self.text_sentences = []
+        self.words = np.zeros(0, dtype=WORD_DTYPE)
+        self.word_text = []
+        self.sentence_indices = []
+        records = []
+        lengths = []
+        for segment in segments:
             text_index = len(self.text_sentences)
             self.text_sentences.append(segment["text"])
 
-            words_data = self._extract_words(segment)
-            if words_data:
-                self.sentences.extend(words_data)
-                # Each call to ``_extract_words`` returns at most one list.
-                self.sentence_indices.extend([text_index] * len(words_data))
+            words, texts = self._extract_words(segment)
+            if len(words):
+                records.append(words)
+                lengths.append(len(words))
+                self.word_text.extend(texts)
+                self.sentence_indices.append(text_index)
+
+        if records:
+            self.words = np.concatenate(records)
+        self.sentence_offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
 
     def _extract_words(self, segment):
-        """Extract words while preserving original text and timing"""
+        """Extract words while preserving original text and timing.
+
+        Returns ``(words, texts)``: a ``WORD_DTYPE`` array of the usable words
+        and the list of their original tokens. The ``amplitude`` and ``pitch``
+        columns are left at zero for :meth:`_calculate_stress` to fill in.
+        """
         try:
-            words_in_sentence = []
-            all_words = []
+            rows = []
+            texts = []
 
             for word_info in segment.get("words", []):
-                original_word = word_info["word"]
-                analysis_word = self._clean_for_analysis(original_word)
-
                 start = word_info["start"]
                 end = word_info["end"]
 
@@ -72,76 +197,57 @@ class SentenceRecognizer:
                 if start == end:
                     end += 0.01
 
-                amp = self._analyzer._calculate_average_amplitude(start, end)
-                if amp is not None:
-                    words_in_sentence.append({
-                        'original': original_word,
-                        'analysis': analysis_word,
-                        'start': start,
-                        'end': end,
-                        'amplitude': amp,
-                    })
+                rows.append((start, end, 0.0, 0.0, 0))
+                texts.append(word_info["word"])
 
-            if words_in_sentence:
-                all_words.append(words_in_sentence)
-
-            return all_words
+            return np.array(rows, dtype=WORD_DTYPE), texts
 
         except Exception as e:
             print(f"Error in _extract_words: {str(e)}")
-            return []
+            return np.zeros(0, dtype=WORD_DTYPE), []
 
-    def _clean_for_analysis(self, word):
-        """Clean word for stress analysis only"""
-        analysis_word = re.sub(r'[^\w\s]', '', word)
-        return analysis_word.strip().lower()
+    def _sentences(self):
+        """Yield ``(lo, hi)`` word ranges, one per sentence."""
+        offsets = self.sentence_offsets
+        for k in range(len(offsets) - 1):
+            yield int(offsets[k]), int(offsets[k + 1])
 
     def _calculate_stress(self):
-        """Calculate stress values based purely on audio analysis"""
-        try:
-            stress_lists = []
-
-            for sentence in self.sentences:
-                if not sentence:
-                    stress_lists.append([])
-                    continue
-
-                sent_start = sentence[0]['start']
-                sent_end = sentence[-1]['end']
-                sent_amp = self._analyzer._calculate_average_amplitude(sent_start, sent_end)
-                sent_pitch = self._analyzer._get_pitch_avg(sent_start, sent_end)
-
-                all_amps = [word_data['amplitude'] for word_data in sentence]
-                max_amp = max(all_amps) if all_amps else 0
-
-                word_stress_list = []
-                for word_data in sentence:
-                    original_word = word_data['original']
-
-                    word_amp = word_data['amplitude']
-                    word_pitch = self._analyzer._get_pitch_avg(
-                        word_data['start'],
-                        word_data['end'],
-                    )
-
-                    stress = 0
-                    if word_amp > (sent_amp * 1.5) and word_amp >= (max_amp * 0.8):
-                        stress = 1
-                    elif word_pitch and sent_pitch and word_pitch > (sent_pitch * 1.4):
-                        stress = 1
-
-                    word_stress_list.append({
-                        'word': original_word.strip(),
-                        'stress': stress,
-                    })
+        """Calculate stress values based purely on audio analysis.
 
-                stress_lists.append(word_stress_list)
-
-            return stress_lists
+        Every word and every sentence window is analyzed in one batched
+        ``analyze_windows`` call each; per-sentence aggregates are broadcast
+        back to their words so all words are classified in one expression.
+        Fills the ``amplitude``, ``pitch`` and ``stress`` columns of
+        ``self.words`` and returns the ``stress`` column (empty on failure).
+        """
+        try:
+            words = self.words
+            if not len(words):
+                return words['stress']
+
+            firsts = self.sentence_offsets[:-1]
+            lasts = self.sentence_offsets[1:] - 1
+            lengths = np.diff(self.sentence_offsets)
+            sentences = self._analyzer.analyze_windows(words['start'][firsts], words['end'][lasts])
+            features = self._analyzer.analyze_windows(words['start'], words['end'])
+            words['amplitude'] = features['mean_amplitude']
+            words['pitch'] = features['mean_pitch']
+
+            sent_amp = np.repeat(sentences['mean_amplitude'], lengths)
+            sent_pitch = np.repeat(sentences['mean_pitch'], lengths)
+            max_amp = np.repeat(np.maximum.reduceat(words['amplitude'], firsts), lengths)
+
+            amp = words['amplitude']
+            pitch = words['pitch']
+            loud = (amp > sent_amp * self.amplitude_ratio) & (amp >= max_amp * self.amplitude_peak_ratio)
+            high = (pitch > 0) & (sent_pitch > 0) & (pitch > sent_pitch * self.pitch_ratio)
+            words['stress'] = loud | high
+            return words['stress']
 
         except Exception as e:
             print(f"Error in _calculate_stress: {str(e)}")
-            return []
+            return np.zeros(0, dtype=np.int8)
 
     @staticmethod
     def _find_word(text, word, current_pos):
@@ -153,22 +259,33 @@ class SentenceRecognizer:
         ``\\b`` for tokens that start/end with word characters; for tokens
         whose edges are already punctuation we fall back to a literal match
         because ``\\b`` does not anchor between two non-word characters.
+
+        Whisper tokens almost always start at the next non-space character,
+        so that position is checked directly first (the same boundary rules,
+        without a regex); only misses fall back to a search with the cached
+        pattern. Aligning a whole segment is then linear in its length.
         """
         if not word:
             return -1
 
-        pattern_parts = []
-        if word[:1].isalnum() or word[:1] == "_":
-            pattern_parts.append(r"\b")
-        pattern_parts.append(re.escape(word))
-        if word[-1:].isalnum() or word[-1:] == "_":
-            pattern_parts.append(r"\b")
-        pattern = "".join(pattern_parts)
-
-        try:
-            match = re.compile(pattern).search(text, current_pos)
-        except re.error:
+        pos = current_pos
+        if not word[0].isspace():
+            # No match can start on whitespace, so the first candidate is the
+            # next non-space character.
+            while pos < len(text) and text[pos].isspace():
+                pos += 1
+        end = pos + len(word)
+        if (
+            text.startswith(word, pos)
+            and not (_is_word_char(word[0]) and pos > 0 and _is_word_char(text[pos - 1]))
+            and not (_is_word_char(word[-1]) and end < len(text) and _is_word_char(text[end]))
+        ):
+            return pos
+
+        pattern = _word_pattern(word)
+        if pattern is None:
             return text.find(word, current_pos)
+        match = pattern.search(text, current_pos)
         if match:
             return match.start()
         # Fall back to a substring search so words containing characters that
@@ -176,19 +293,36 @@ class SentenceRecognizer:
         return text.find(word, current_pos)
 
     def _apply_stress_formatting(self, text, stress_list):
-        """Apply stress formatting while preserving whitespace and punctuation"""
+        """Apply stress formatting while preserving whitespace and punctuation.
+
+        ``stress_list`` is a list of ``{'word': str, 'stress': 0 | 1}`` dicts.
+        """
+        return self._format_words(
+            text,
+            [word_data['word'] for word_data in stress_list],
+            [word_data['stress'] for word_data in stress_list],
+        )
+
+    def _format_words(self, text, words, stresses):
+        """Underline the letters of each stressed word found in ``text``."""
+        return vtt_text(self._format_spans(text, words, stresses))
+
+    def _format_spans(self, text, words, stresses):
+        """Split ``text`` into ``(text, stressed)`` runs for a :class:`Cue`.
+
+        ``words`` (stripped tokens) and ``stresses`` (0/1 flags) are parallel
+        sequences, located in order so repeated words map correctly.
+        """
         try:
-            if not text or not stress_list:
-                return text
+            if not text:
+                return ()
+            if not len(words):
+                return ((text, False),)
 
             result = []
             current_pos = 0
 
-            def is_letter(char):
-                return char.isalpha()
-
-            for word_data in stress_list:
-                word = word_data['word']
+            for word, stress in zip(words, stresses):
                 if not word.strip():
                     continue
 
@@ -196,122 +330,194 @@ class SentenceRecognizer:
                 if word_pos == -1:
                     continue
 
-                result.append(text[current_pos:word_pos])
-
-                if word_data['stress'] == 1:
-                    parts = word.split()
-                    formatted_parts = []
-                    for part in parts:
-                        formatted_chars = []
-                        for char in part:
-                            if is_letter(char):
-                                formatted_chars.append(f"<u>{char}</u>")
-                            else:
-                                formatted_chars.append(char)
-                        formatted_parts.append(''.join(formatted_chars))
-                    result.append(" ".join(formatted_parts))
+                if stress == 1:
+                    append_span(result, text[current_pos:word_pos], False)
+                    append_span(result, " ".join(word.split()), True)
                 else:
-                    result.append(word)
+                    append_span(result, text[current_pos:word_pos + len(word)], False)
 
                 current_pos = word_pos + len(word)
 
-            result.append(text[current_pos:])
+            append_span(result, text[current_pos:], False)
 
-            return "".join(result)
+            return tuple(result)
 
         except Exception as e:
-            print(f"Error in _apply_stress_formatting: {str(e)}")
-            return text
+            print(f"Error in _format_spans: {str(e)}")
+            return ((text, False),)
 
     @staticmethod
-    def _split_into_chunks(words, stress_list, max_duration=MAX_CUE_DURATION):
-        """Split a segment's ``words`` (with aligned ``stress_list``) into
+    def _split_into_chunks(starts, ends, max_duration=MAX_CUE_DURATION):
+        """Split a segment's words (given by their ``starts``/``ends``) into
         consecutive chunks each no longer than ``max_duration`` seconds.
 
         Splits only happen at word boundaries: a word is never cut in half. A
         new chunk starts when adding the next word would push the chunk past
         ``max_duration`` from its own start time. Each returned chunk is a
-        ``(chunk_words, chunk_stress)`` tuple preserving original order.
+        ``(lo, hi)`` range of word positions, in original order.
         """
         chunks = []
-        cur_words = []
-        cur_stress = []
+        lo = 0
         chunk_start = None
 
-        for word_data, stress in zip(words, stress_list):
+        for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
             if chunk_start is None:
-                chunk_start = word_data['start']
+                chunk_start = start
             # Close the current chunk before adding this word if it would
             # exceed the limit (but only when the chunk already has content,
             # so a single over-long word still produces one cue).
-            if cur_words and (word_data['end'] - chunk_start) > max_duration:
-                chunks.append((cur_words, cur_stress))
-                cur_words = []
-                cur_stress = []
-                chunk_start = word_data['start']
-            cur_words.append(word_data)
-            cur_stress.append(stress)
+            if i > lo and (end - chunk_start) > max_duration:
+                chunks.append((lo, i))
+                lo = i
+                chunk_start = start
 
-        if cur_words:
-            chunks.append((cur_words, cur_stress))
+        if len(starts) > lo:
+            chunks.append((lo, len(starts)))
 
         return chunks
 
-    def generate_vtt(self, vtt_filename):
-        """Generate VTT file with stress formatting.
+    def _format_cues(self, stress):
+        """Yield a :class:`Cue` for each caption of the collected sentences."""
+        stress = stress.tolist()
+        starts = self.words['start']
+        ends = self.words['end']
+        tokens = [text.strip() for text in self.word_text]
 
-        Each Whisper segment is split into cues no longer than
-        ``MAX_CUE_DURATION`` seconds so captions stay short and readable.
-        """
-        self.collect_data()
-        stress_lists = self._calculate_stress()
-
-        formatted_segments = []
-        for i, sentence in enumerate(self.sentences):
-            if not sentence:
-                continue
-            if i >= len(stress_lists):
+        for (lo, hi), text_index in zip(self._sentences(), self.sentence_indices):
+            if hi > len(stress):
                 break
-            stress_list = stress_lists[i]
-            text_index = self.sentence_indices[i] if i < len(self.sentence_indices) else i
-            if text_index >= len(self.text_sentences):
-                continue
             segment_text = self.text_sentences[text_index]
 
-            chunks = self._split_into_chunks(sentence, stress_list)
+            chunks = self._split_into_chunks(starts[lo:hi], ends[lo:hi], self.max_cue_duration)
 
             if len(chunks) <= 1:
                 # Whole segment already fits within the limit: keep the
                 # original segment text + stress exactly as before.
-                formatted_text = self._apply_stress_formatting(segment_text, stress_list)
-                if not formatted_text:
+                spans = self._format_spans(segment_text, tokens[lo:hi], stress[lo:hi])
+                if not spans:
                     continue
-                formatted_segments.append(
-                    (sentence[0]['start'], sentence[-1]['end'], formatted_text)
-                )
+                yield Cue(float(starts[lo]), float(ends[hi - 1]), spans)
             else:
                 # Long segment: emit one cue per chunk. Reconstruct each
                 # chunk's text from its word tokens (faster-whisper word
                 # tokens carry their leading space) so spacing stays correct.
-                for chunk_words, chunk_stress in chunks:
-                    if not chunk_words:
-                        continue
-                    chunk_text = "".join(w['original'] for w in chunk_words).strip()
+                for chunk_lo, chunk_hi in chunks:
+                    first, last = lo + chunk_lo, lo + chunk_hi
+                    chunk_text = "".join(self.word_text[first:last]).strip()
                     if not chunk_text:
                         continue
-                    formatted_text = self._apply_stress_formatting(chunk_text, chunk_stress)
-                    if not formatted_text:
+                    spans = self._format_spans(chunk_text, tokens[first:last], stress[first:last])
+                    if not spans:
                         continue
-                    formatted_segments.append(
-                        (chunk_words[0]['start'], chunk_words[-1]['end'], formatted_text)
-                    )
+                    yield Cue(float(starts[first]), float(ends[last - 1]), spans)
+
+    def _cue_batch(self, segments):
+        """Run one batch of segments through extract -> stress -> format."""
+        self.collect_data(segments)
+        return list(self._format_cues(self._calculate_stress()))
+
+    def iter_cue_batches(self, batch_size=SEGMENT_BATCH_SIZE, workers=CAPTION_WORKERS):
+        """Yield lists of :class:`Cue` objects, one per segment batch.
+
+        Each batch of ``batch_size`` Whisper segments flows through
+        extract -> stress -> chunk -> format on its own, so only one batch of
+        word data is held at a time and early cues are available before the
+        rest of the transcript has been analyzed.
+
+        Batches are independent once the audio features exist, so with
+        ``workers > 1`` they are fanned out to a process pool. The features
+        are computed here first and only the analyzer and the stress settings
+        are sent to each worker, once (memmap-backed audio is re-opened, not
+        copied); each task then carries just its own segments. At most
+        ``2 * workers`` batches are in flight, so the transcript is still read
+        lazily, and results come back in batch order, i.e. the same timestamp
+        order as the serial path.
+        """
+        batches = self._segment_batches(max(1, batch_size))
+        if workers > 1:
+            # A pool only pays off with more than one batch.
+            head = list(itertools.islice(batches, 2))
+            batches = itertools.chain(head, batches)
+            if len(head) < 2:
+                workers = 1
+        if workers <= 1:
+            for batch in batches:
+                yield self._cue_batch(batch)
+            return
+
+        self._analyzer._pitch_data()
+        self._analyzer._amplitude_data()
+        settings = {
+            "amplitude_ratio": self.amplitude_ratio,
+            "amplitude_peak_ratio": self.amplitude_peak_ratio,
+            "pitch_ratio": self.pitch_ratio,
+            "max_cue_duration": self.max_cue_duration,
+        }
+        with ProcessPoolExecutor(
+            workers,
+            initializer=_init_caption_worker,
+            initargs=(self.audio_file, self._analyzer, settings),
+        ) as pool:
+            pending = collections.deque()
+            try:
+                for batch in batches:
+                    pending.append(pool.submit(_caption_batch, batch))
+                    if len(pending) >= 2 * workers:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # Consumer stopped early: drop batches that have not started.
+                for future in pending:
+                    future.cancel()
+
+    def iter_cues(self, batch_size=SEGMENT_BATCH_SIZE, workers=CAPTION_WORKERS):
+        """Yield :class:`Cue` objects in transcript order."""
+        for cues in self.iter_cue_batches(batch_size, workers):
+            yield from cues
+
+    def write_captions(self, stream, fmt="vtt", progress=None, batch_size=SEGMENT_BATCH_SIZE,
+                       workers=CAPTION_WORKERS):
+        """Write the stress-formatted captions as ``fmt`` to a text ``stream``.
+
+        ``fmt`` is any key of ``caption_formats.FORMATS`` (``vtt``, ``srt``,
+        ``ttml``, ``json``). Each Whisper segment is split into cues no
+        longer than ``max_cue_duration`` seconds so captions stay short and
+        readable. Cues are written and flushed batch by batch;
+        ``progress(cue_count, end_time)`` is called after every batch that
+        produced cues.
+        """
+        caption_format = FORMATS[fmt]
+        stream.write(caption_format.header)
+        index = 1
+        for cues in self.iter_cue_batches(batch_size, workers):
+            index = write_cues(stream, cues, fmt, index)
+            if cues:
+                stream.flush()
+                if progress is not None:
+                    progress(index - 1, cues[-1].end)
+        stream.write(caption_format.footer)
+
+    def write_vtt(self, stream, progress=None, batch_size=SEGMENT_BATCH_SIZE,
+                  workers=CAPTION_WORKERS):
+        """Write the stress-formatted VTT to a text ``stream``.
+
+        The stream always holds a valid prefix of the captions (see
+        :meth:`write_captions`).
+        """
+        self.write_captions(stream, "vtt", progress, batch_size, workers)
 
+    def generate_vtt(self, vtt_filename, progress=None, batch_size=SEGMENT_BATCH_SIZE,
+                     workers=CAPTION_WORKERS):
+        """Generate VTT file with stress formatting (see :meth:`write_vtt`)."""
         with open(vtt_filename, "w", encoding='utf-8') as f:
-            f.write("WEBVTT\n\n")
-            for i, (start, end, text) in enumerate(formatted_segments, 1):
-                f.write(f"{i}\n")
-                f.write(f"{format_time(start)} --> {format_time(end)}\n")
-                f.write(f"{text}\n\n")
+            self.write_vtt(f, progress, batch_size, workers)
+
+    def to_vtt(self, progress=None, batch_size=SEGMENT_BATCH_SIZE, workers=CAPTION_WORKERS):
+        """Return the stress-formatted VTT as a string (see :meth:`write_vtt`)."""
+        buffer = io.StringIO()
+        self.write_vtt(buffer, progress, batch_size, workers)
+        return buffer.getvalue()
 
 
 if __name__ == "__main__":
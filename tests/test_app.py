@@ -72,5 +72,95 @@ class TestFlaskApp(unittest.TestCase):
         self.assertEqual(response.location, 'https://ca-t.psu.ac.th/')
 
 
+    def test_recaption_media_replaces_vtt(self):
+        """Test recaptioning reruns only the caption stage and updates the stored VTT"""
+        import json
+        import tempfile
+        import numpy as np
+        import soundfile as sf
+
+        with tempfile.TemporaryDirectory() as tmp:
+            wav_path = os.path.join(tmp, "clip.wav")
+            sr = 8000
+            t = np.arange(sr * 2) / sr
+            loudness = np.where((t >= 0.5) & (t < 1.0), 0.8, 0.2)
+            sf.write(wav_path, (loudness * np.sin(2 * np.pi * 220 * t)).astype(np.float32), sr)
+            transcript = {"segments": [{"text": " quiet loud quiet", "words": [
+                {"word": " quiet", "start": 0.0, "end": 0.5},
+                {"word": " loud", "start": 0.5, "end": 1.0},
+                {"word": " quiet", "start": 1.0, "end": 1.5},
+            ]}]}
+
+            conn = sqlite3.connect(TEST_DB_PATH)
+            audio_id = conn.execute(
+                "INSERT INTO audiofiles (user_id, file_name) VALUES (1, 'clip.wav')"
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO vttfiles (audio_id, file_name, vtt_content) VALUES (?, 'renamed.vtt', 'WEBVTT')",
+                (audio_id,),
+            )
+            conn.commit()
+            conn.close()
+
+            with patch.object(flask_app, "feature_cache", None), \
+                    patch.object(flask_app, "run_transcription_subprocess") as transcribe:
+                content = flask_app.recaption_media(
+                    audio_id, wav_path, "audio", "clip.wav", transcript, {"max_cue_duration": 0.6}
+                )
+            transcribe.assert_not_called()
+
+        self.assertEqual(content.count(" --> "), 3)
+        self.assertIn("<u>l</u><u>o</u><u>u</u><u>d</u>", content)
+        conn = sqlite3.connect(TEST_DB_PATH)
+        rows = conn.execute("SELECT file_name, vtt_content FROM vttfiles WHERE audio_id = ?", (audio_id,)).fetchall()
+        conn.close()
+        self.assertEqual(rows, [("renamed.vtt", content)])
+
+    def test_recaption_job_rejects_invalid_options(self):
+        """Test the recaption endpoint rejects non-finite and non-positive overrides"""
+        with self.client.session_transaction() as session:
+            session["_user_id"] = "4242"
+
+        with patch.object(flask_app.login_manager, "_user_callback",
+                          lambda user_id: flask_app.User(int(user_id), "tester")), \
+                patch.object(flask_app, "recaption_media") as recaption:
+            for body in ({"max_cue_duration": float("nan")}, {"max_cue_duration": "inf"},
+                         {"pitch_ratio": 0}, {"amplitude_ratio": -1.5}, {"amplitude_peak_ratio": "loud"}):
+                response = self.client.post("/recaption_job/424242", json=body)
+                self.assertEqual(response.status_code, 400, body)
+            # Valid overrides get past validation (the media does not exist).
+            response = self.client.post("/recaption_job/424242", json={"max_cue_duration": 2.5})
+            self.assertEqual(response.status_code, 404)
+            recaption.assert_not_called()
+
+    def test_recaption_job_conflicts_with_active_work(self):
+        """Test recaptioning is refused while the same upload is being captioned"""
+        with self.client.session_transaction() as session:
+            session["_user_id"] = "4242"
+
+        with patch.object(flask_app.login_manager, "_user_callback",
+                          lambda user_id: flask_app.User(int(user_id), "tester")), \
+                patch.object(flask_app, "recaption_media") as recaption:
+            with flask_app._audio_lock(424242):
+                self.assertEqual(self.client.post("/recaption_job/424242").status_code, 409)
+            with patch.object(flask_app, "_has_active_job", return_value=True):
+                self.assertEqual(self.client.post("/recaption_job/424242").status_code, 409)
+            # Neither refusal leaves the upload locked.
+            self.assertEqual(self.client.post("/recaption_job/424242").status_code, 404)
+            recaption.assert_not_called()
+
+    def test_render_caption_download_cached_per_format(self):
+        """Test downloads render per format and are cached until the VTT changes"""
+        vtt = "WEBVTT\n\n1\n00:00:00.000 --> 00:00:01.800\nHello <u>w</u><u>o</u>\n"
+        srt = flask_app.render_caption_download(9001, vtt, "srt")
+        self.assertEqual(srt, "1\n00:00:00,000 --> 00:00:01,800\nHello <u>wo</u>\n\n")
+        with patch.object(flask_app, "parse_vtt") as parse:
+            self.assertIs(flask_app.render_caption_download(9001, vtt, "srt"), srt)
+            parse.assert_not_called()
+        edited = flask_app.render_caption_download(9001, vtt.replace("Hello", "Hi"), "srt")
+        self.assertIn("Hi <u>wo</u>", edited)
+        self.assertTrue(flask_app.render_caption_download(9001, vtt, "vtt").startswith("WEBVTT\n"))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import tempfile
 from unittest.mock import patch, MagicMock
 import numpy as np
 import sys
@@ -7,7 +8,7 @@ import os
 # Ensure the parent directory is in the python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from audio_analyzer import AudioAnalyzer
+from audio_analyzer import AudioAnalyzer, _AmplitudeIndex, _RangeExtrema
 
 class TestAudioAnalyzer(unittest.TestCase):
     def setUp(self):
@@ -58,6 +59,279 @@ class TestAudioAnalyzer(unittest.TestCase):
         self.assertAlmostEqual(min_amp, -0.4)
         self.assertAlmostEqual(max_amp, 0.3)
 
+    def test_pitch_track_matches_whole_file_piptrack(self):
+        """Test the blockwise pitch track reproduces a single piptrack call"""
+        import librosa
+
+        sr = 16000
+        t = np.arange(int(sr * 3.3)) / sr
+        y = (0.5 * np.sin(2 * np.pi * 220.0 * t)).astype(np.float32)
+        self.analyzer._audio = (y, sr)
+
+        track, hop_length, _ = self.analyzer._pitch_data()
+        pitches, magnitudes = librosa.core.piptrack(y=y, sr=sr, n_fft=2048, hop_length=hop_length)
+        expected = self.analyzer._frame_peak_pitches(pitches, magnitudes)
+        np.testing.assert_allclose(track, expected)
+
+    def test_pitch_window_queries(self):
+        """Test pitch avg/max answer windows from the shared track"""
+        sr = 16000
+        t = np.arange(sr * 2) / sr
+        y = (0.5 * np.sin(2 * np.pi * 220.0 * t)).astype(np.float32)
+        self.analyzer._audio = (y, sr)
+
+        self.assertAlmostEqual(self.analyzer._get_pitch_avg(0.5, 1.5), 220.0, delta=5.0)
+        self.assertGreaterEqual(self.analyzer._get_pitch_max(0.5, 1.5), self.analyzer._get_pitch_avg(0.5, 1.5))
+        self.assertEqual(self.analyzer._get_pitch_avg(1.0, 1.001), 0.0)
+
+    def test_pitch_top_k_average(self):
+        """Test the vectorized top-k chunk average matches a per-chunk loop"""
+        sr = 16000
+        t = np.arange(sr * 3) / sr
+        y = (0.4 * np.sin(2 * np.pi * (180 + 60 * np.sin(2 * t)) * t)).astype(np.float32)
+        self.analyzer._audio = (y, sr)
+
+        for start, end, k in ((0.2, 2.9, 10), (0.0, 1.0, 3), (1.0, 1.35, 10), (2.5, 3.4, 1)):
+            chunk_starts = start + np.arange((int(min(end, 3.0) * sr) - int(start * sr)) // 1600) * 0.1
+            averages = sorted((self.analyzer._get_pitch_avg(c, c + 0.1) for c in chunk_starts), reverse=True)
+            self.assertAlmostEqual(self.analyzer._get_pitch_top10_avg(start, end, k=k), np.mean(averages[:k]))
+        self.assertEqual(self.analyzer._get_pitch_top10_avg(1.0, 1.05), 0.0)
+        self.assertEqual(self.analyzer._get_pitch_top10_avg(0.0, 1.0, k=0), 0.0)
+
+    def test_amplitude_index_matches_direct_scan(self):
+        """Test block index window queries against a direct scan"""
+        rng = np.random.default_rng(0)
+        for shape in [(5003,), (5003, 2)]:
+            data = rng.standard_normal(shape).astype(np.float32)
+            index = _AmplitudeIndex.build(data, block_size=64)
+            for start, end in [(0, 5003), (10, 20), (63, 1000), (64, 128), (4000, 5003)]:
+                segment = data[start:end]
+                self.assertAlmostEqual(index.mean_abs(data, start, end), float(np.mean(np.abs(segment))), places=5)
+                self.assertEqual(index.min_max(data, start, end), (float(segment.min()), float(segment.max())))
+        self.assertEqual(index.mean_abs(data, 10, 10), 0.0)
+
+    def test_range_extrema_linear_memory(self):
+        """Test range min/max queries against a direct scan and their memory use"""
+        rng = np.random.default_rng(2)
+        values = rng.standard_normal(20000).astype(np.float32)
+        extrema = _RangeExtrema(values, np.maximum, -np.inf, fanout=16)
+        first = rng.integers(0, len(values), 500)
+        last = first + rng.integers(0, 6000, 500)
+        result = extrema.query_many(first, last)
+        for i, (lo, hi) in enumerate(zip(first, last)):
+            expected = values[lo:hi].max() if lo < min(hi, len(values)) else -np.inf
+            self.assertEqual(result[i], expected)
+        # At most one extra table entry per value.
+        self.assertLessEqual(sum(level.size for level in extrema._groups), len(values))
+
+    @patch('soundfile.read')
+    def test_single_decode_channel_layouts(self, mock_sf_read):
+        """Test one decode backs both APIs in the requested channel layout"""
+        stereo = np.array([[0.2, 0.4], [-0.2, -0.4], [0.6, 0.0]], dtype=np.float32)
+        mock_sf_read.return_value = (stereo, 1000)
+
+        mono = AudioAnalyzer("dummy_audio.wav")
+        self.assertAlmostEqual(mono._calculate_average_amplitude(0.0, 0.003), 0.3)
+        mono._get_pitch_avg(0.0, 0.003)
+        self.assertEqual(mono._audio[0].shape, (3,))
+
+        multi = AudioAnalyzer("dummy_audio.wav", channel_layout="multichannel")
+        self.assertAlmostEqual(multi._calculate_average_amplitude(0.0, 0.003), 0.3)
+        self.assertEqual(multi._audio[0].shape, (3, 2))
+        self.assertEqual(mock_sf_read.call_count, 2)
+
+        with self.assertRaises(ValueError):
+            AudioAnalyzer("dummy_audio.wav", channel_layout="surround")
+
+    @patch('soundfile.read')
+    def test_empty_multichannel_file(self, mock_sf_read):
+        """Test a zero-length multichannel file yields zeros instead of raising"""
+        mock_sf_read.return_value = (np.zeros((0, 2), dtype=np.float32), 1000)
+        multi = AudioAnalyzer("dummy_audio.wav", channel_layout="multichannel")
+        self.assertEqual(multi._calculate_average_amplitude(0.0, 1.0), 0.0)
+        result = multi.analyze_windows([0.0, 0.5], [1.0, 2.0], extrema=True)
+        for key in ("mean_amplitude", "min_amplitude", "max_amplitude"):
+            np.testing.assert_array_equal(result[key], [0.0, 0.0])
+
+    def test_memmap_mode(self):
+        """Test memmap mode serves zero-copy views backed by a raw float32 file"""
+        import soundfile as sf
+
+        with tempfile.TemporaryDirectory() as tmp:
+            wav_path = os.path.join(tmp, "tone.wav")
+            data = (0.25 * np.sin(np.linspace(0, 200, 8000))).astype(np.float32)
+            sf.write(wav_path, data, 8000, subtype="FLOAT")
+
+            in_memory = AudioAnalyzer(wav_path)
+            with AudioAnalyzer(wav_path, memmap=True, cache_dir=tmp) as mapped:
+                segment, sr = mapped._segment_samples(0.1, 0.5)
+                self.assertIsInstance(mapped._audio[0], np.memmap)
+                self.assertTrue(np.shares_memory(segment, mapped._audio[0]))
+                self.assertEqual(sr, 8000)
+                self.assertAlmostEqual(
+                    mapped._calculate_average_amplitude(0.1, 0.5),
+                    in_memory._calculate_average_amplitude(0.1, 0.5),
+                )
+                memmap_path = mapped._memmap_path
+                self.assertTrue(os.path.isfile(memmap_path))
+            self.assertFalse(os.path.exists(memmap_path))
+
+    def test_pickle_reopens_memmap(self):
+        """Test pickled analyzers re-open the spill file instead of copying it"""
+        import pickle
+        import soundfile as sf
+
+        with tempfile.TemporaryDirectory() as tmp:
+            wav_path = os.path.join(tmp, "tone.wav")
+            sf.write(wav_path, (0.25 * np.sin(np.linspace(0, 200, 8000))).astype(np.float32), 8000)
+
+            with AudioAnalyzer(wav_path, streaming=True, cache_dir=tmp) as original:
+                expected = original.analyze_windows([0.1, 0.4], [0.3, 0.9], extrema=True)
+                payload = pickle.dumps(original)
+                self.assertLess(len(payload), 8000 * 4)
+
+                clone = pickle.loads(payload)
+                self.assertIsInstance(clone._audio[0], np.memmap)
+                result = clone.analyze_windows([0.1, 0.4], [0.3, 0.9], extrema=True)
+                for key, values in expected.items():
+                    np.testing.assert_array_equal(result[key], values, err_msg=key)
+                clone.close()
+                self.assertTrue(os.path.isfile(original._memmap_path))
+
+    def test_analyze_windows_matches_scalar_apis(self):
+        """Test the vectorized batch API agrees with the per-window methods"""
+        sr = 16000
+        t = np.arange(sr * 3) / sr
+        y = (0.4 * np.sin(2 * np.pi * (180 + 40 * np.sin(3 * t)) * t)).astype(np.float32)
+        self.analyzer._audio = (y, sr)
+
+        rng = np.random.default_rng(1)
+        starts = rng.uniform(-0.1, 3.1, 200)
+        ends = starts + rng.uniform(-0.01, 1.0, 200)
+        result = self.analyzer.analyze_windows(starts, ends, extrema=True)
+        self.assertEqual(set(self.analyzer.analyze_windows(starts, ends)), {"mean_amplitude", "mean_pitch"})
+
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            min_amp, max_amp = self.analyzer._get_min_max_amplitudes("dummy_audio.wav", start, end)
+            self.assertAlmostEqual(result["mean_amplitude"][i], self.analyzer._calculate_average_amplitude(start, end))
+            self.assertAlmostEqual(result["min_amplitude"][i], min_amp)
+            self.assertAlmostEqual(result["max_amplitude"][i], max_amp)
+            self.assertAlmostEqual(result["mean_pitch"][i], self.analyzer._get_pitch_avg(start, end), places=4)
+            self.assertAlmostEqual(result["max_pitch"][i], self.analyzer._get_pitch_max(start, end), places=4)
+
+    def test_streaming_mode_matches_in_memory(self):
+        """Test the single-pass streaming mode yields the same features"""
+        import soundfile as sf
+
+        with tempfile.TemporaryDirectory() as tmp:
+            wav_path = os.path.join(tmp, "stereo.wav")
+            sr = 16000
+            t = np.arange(int(sr * 9.5)) / sr
+            tone = 0.3 * np.sin(2 * np.pi * (200 + 30 * np.sin(t)) * t)
+            sf.write(wav_path, np.stack([tone, 0.5 * tone], axis=1), sr)
+
+            starts = np.linspace(0.0, 9.0, 40)
+            ends = starts + 0.45
+            expected = AudioAnalyzer(wav_path).analyze_windows(starts, ends, extrema=True)
+            with AudioAnalyzer(wav_path, streaming=True, cache_dir=tmp) as streamed:
+                result = streamed.analyze_windows(starts, ends, extrema=True)
+                self.assertIsNotNone(streamed._amplitude_index)
+            for key, values in expected.items():
+                np.testing.assert_allclose(result[key], values, err_msg=key)
+
+    def test_analysis_sample_rate(self):
+        """Test analysis_sr downsamples once and matches across decode modes"""
+        import soundfile as sf
+
+        with tempfile.TemporaryDirectory() as tmp:
+            wav_path = os.path.join(tmp, "tone48k.wav")
+            sr = 48000
+            t = np.arange(sr * 3) / sr
+            sf.write(wav_path, (0.3 * np.sin(2 * np.pi * 180.0 * t)).astype(np.float32), sr)
+
+            starts = np.linspace(0.0, 2.5, 12)
+            ends = starts + 0.4
+            in_memory = AudioAnalyzer(wav_path, analysis_sr=16000)
+            data, rate = in_memory._audio_data()
+            self.assertEqual(rate, 16000)
+            self.assertEqual(len(data), 16000 * 3)
+            self.assertAlmostEqual(in_memory._get_pitch_avg(0.5, 2.5), 180.0, delta=10.0)
+            expected = in_memory.analyze_windows(starts, ends)
+            for mode in ({"memmap": True}, {"streaming": True}):
+                with AudioAnalyzer(wav_path, analysis_sr=16000, cache_dir=tmp, **mode) as other:
+                    result = other.analyze_windows(starts, ends)
+                    self.assertEqual(other._audio[1], 16000)
+                for key, values in expected.items():
+                    np.testing.assert_allclose(result[key], values, rtol=1e-5, atol=1e-6, err_msg=key)
+
+            # Never upsample: a target above the native rate is a no-op.
+            self.assertEqual(AudioAnalyzer(wav_path, analysis_sr=96000)._audio_data()[1], sr)
+
+    def test_feature_cache_round_trip(self):
+        """Test cached features skip DSP and evict least recently used entries"""
+        import soundfile as sf
+        from feature_cache import FeatureCache
+
+        with tempfile.TemporaryDirectory() as tmp:
+            wav_path = os.path.join(tmp, "tone.wav")
+            sr = 16000
+            t = np.arange(sr * 2) / sr
+            sf.write(wav_path, (0.3 * np.sin(2 * np.pi * 200.0 * t)).astype(np.float32), sr)
+            cache = FeatureCache(os.path.join(tmp, "features"))
+
+            starts = np.linspace(0.0, 1.5, 10)
+            expected = AudioAnalyzer(wav_path).analyze_windows(starts, starts + 0.4)
+            AudioAnalyzer(wav_path, feature_cache=cache).analyze_windows(starts, starts + 0.4)
+            self.assertEqual(len(os.listdir(cache.directory)), 1)
+
+            with patch.object(AudioAnalyzer, "_new_tracker") as tracker, \
+                    patch.object(_AmplitudeIndex, "build") as build:
+                for mode in ({}, {"streaming": True, "cache_dir": tmp}):
+                    with AudioAnalyzer(wav_path, feature_cache=cache, **mode) as cached:
+                        result = cached.analyze_windows(starts, starts + 0.4)
+                    for key, values in expected.items():
+                        np.testing.assert_allclose(result[key], values, err_msg=key)
+                tracker.assert_not_called()
+                build.assert_not_called()
+
+            # A different pitch setup is a different key; the older entry is evicted.
+            (old_entry,) = os.listdir(cache.directory)
+            cache.max_bytes = 1
+            AudioAnalyzer(wav_path, pitch_n_fft=1024, feature_cache=cache)._audio_data()
+            (new_entry,) = os.listdir(cache.directory)
+            self.assertNotEqual(new_entry, old_entry)
+
+    def test_parallel_pitch_track_matches_serial(self):
+        """Test pitch_workers stitches per-block tracks into the serial result"""
+        sr = 8000
+        t = np.arange(sr * 150) / sr
+        y = (0.3 * np.sin(2 * np.pi * (150 + 50 * np.sin(0.5 * t)) * t)).astype(np.float32)
+        serial = AudioAnalyzer("dummy_audio.wav")
+        serial._audio = (y, sr)
+        parallel = AudioAnalyzer("dummy_audio.wav", pitch_workers=2)
+        parallel._audio = (y, sr)
+
+        track, hop, _ = parallel._pitch_data()
+        self.assertGreater(len(track), 2 * 512)
+        np.testing.assert_array_equal(track, serial._pitch_data()[0])
+        self.assertEqual(hop, serial._pitch_data()[1])
+
+    def test_autocorr_pitch_backend(self):
+        """Test the NumPy autocorrelation backend tracks F0 and rejects noise"""
+        sr = 16000
+        t = np.arange(sr * 2) / sr
+        harmonic = sum(a * np.sin(2 * np.pi * 150.0 * h * t) for h, a in ((1, 1.0), (2, 0.6), (3, 0.3)))
+        analyzer = AudioAnalyzer("dummy_audio.wav", pitch_backend="autocorr")
+        analyzer._audio = ((0.3 * harmonic).astype(np.float32), sr)
+        self.assertAlmostEqual(analyzer._get_pitch_avg(0.5, 1.5), 150.0, delta=2.0)
+
+        noise = AudioAnalyzer("dummy_audio.wav", pitch_backend="autocorr")
+        noise._audio = (np.random.default_rng(0).standard_normal(sr).astype(np.float32) * 0.1, sr)
+        self.assertEqual(noise._get_pitch_avg(0.0, 1.0), 0.0)
+
+        with self.assertRaises(ValueError):
+            AudioAnalyzer("dummy_audio.wav", pitch_backend="crepe")
+
 
 if __name__ == '__main__':
     unittest.main()
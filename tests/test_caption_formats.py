@@ -0,0 +1,78 @@
+import json
+import os
+import sys
+import unittest
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from caption_formats import Cue, format_time, parse_vtt, plain_text, render
+
+CUES = [
+    Cue(0.0, 1.8, (("Hello ", False), ("world", True), (" & you", False))),
+    Cue(61.25, 3661.5, (("Second\nline", False),)),
+]
+
+VTT = """WEBVTT
+
+1
+00:00:00.000 --> 00:00:01.800
+Hello <u>w</u><u>o</u><u>r</u><u>l</u><u>d</u> &amp; you
+
+2
+00:01:01.250 --> 01:01:01.500
+Second
+line
+
+"""
+
+
+class TestCaptionFormats(unittest.TestCase):
+    def test_format_time_decimal_marker(self):
+        """Test SRT timestamps use a comma before the milliseconds"""
+        self.assertEqual(format_time(75.5, ","), "00:01:15,500")
+
+    def test_vtt_round_trip(self):
+        """Test cues render to the stress VTT and parse back to the same cues"""
+        self.assertEqual(render(CUES, "vtt"), VTT)
+        parsed = parse_vtt(VTT)
+        self.assertEqual([cue.spans for cue in parsed], [cue.spans for cue in CUES])
+        self.assertEqual(render(parsed, "vtt"), VTT)
+
+    def test_parse_vtt_tags_and_timestamps(self):
+        """Test class/bold tags are dropped and short timestamps are accepted"""
+        cues = parse_vtt("WEBVTT\n\nNOTE hi\n\n00:01.000 --> 00:02.345 line:90%\n<c.red><b>A</b></c> <u>bc</u>\n")
+        self.assertEqual(len(cues), 1)
+        self.assertEqual(cues[0].spans, (("A ", False), ("bc", True)))
+        self.assertEqual(format_time(cues[0].end), "00:00:02.345")
+
+    def test_markup_is_escaped(self):
+        """Test text that looks like markup is escaped in VTT, SRT and TTML alike"""
+        cues = [Cue(0.0, 1.0, (("a<b ", False), ("x&y", True), (" <3", False)))]
+        self.assertIn("\na&lt;b <u>x</u>&amp;<u>y</u> &lt;3\n", render(cues, "vtt"))
+        self.assertIn("\na&lt;b <u>x&amp;y</u> &lt;3\n", render(cues, "srt"))
+        self.assertIn(">a&lt;b <span", render(cues, "ttml"))
+        self.assertEqual(plain_text(parse_vtt(render(cues, "vtt"))[0].spans), "a<b x&y <3")
+
+    def test_srt_ttml_json(self):
+        """Test stress maps to <u> in SRT, an underline span in TTML and a flag in JSON"""
+        srt = render(CUES, "srt")
+        self.assertTrue(srt.startswith("1\n00:00:00,000 --> 00:00:01,800\nHello <u>world</u> &amp; you\n\n2\n"))
+
+        root = ET.fromstring(render(CUES, "ttml"))
+        ns = {"tt": "http://www.w3.org/ns/ttml"}
+        paragraphs = root.findall(".//tt:p", ns)
+        self.assertEqual([p.get("begin") for p in paragraphs], ["00:00:00.000", "00:01:01.250"])
+        span = paragraphs[0].find("tt:span", ns)
+        self.assertEqual(span.text, "world")
+        self.assertEqual(span.get("{http://www.w3.org/ns/ttml#styling}textDecoration"), "underline")
+
+        entries = json.loads(render(CUES, "json"))
+        self.assertEqual(entries[0]["text"], "Hello world & you")
+        self.assertEqual([s["stress"] for s in entries[0]["spans"]], [False, True, False])
+        self.assertEqual((entries[1]["start"], entries[1]["end"]), (61.25, 3661.5))
+        self.assertEqual(json.loads(render([], "json")), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chunked_transcription import find_pauses, frame_energies, plan_chunks, split_media, stitch
+from sentence_recognition import SentenceRecognition
+
+SR = 16000
+
+
+def speech_with_pauses(seconds, pause_every, pause_seconds=0.5):
+    """Tone bursts separated by near-silent pauses every ``pause_every`` s."""
+    t = np.arange(int(seconds * SR)) / SR
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t)
+    signal[(t % pause_every) >= pause_every - pause_seconds] = 0.0
+    return (signal + 0.001 * np.random.default_rng(0).standard_normal(len(t))).astype(np.float32)
+
+
+class TestChunkedTranscription(unittest.TestCase):
+    def test_find_pauses(self):
+        """Test pauses are found in the middle of each silent stretch"""
+        pauses = find_pauses(frame_energies(speech_with_pauses(20, 5), SR))
+        np.testing.assert_allclose(pauses, [4.75, 9.75, 14.75, 19.75], atol=0.05)
+
+    def test_plan_chunks(self):
+        """Test cuts prefer the pause nearest the target and stay bounded"""
+        pauses = np.array([4.0, 11.0, 19.0, 31.0])
+        self.assertEqual(
+            plan_chunks(40.0, pauses, 10.0),
+            [(0.0, 11.0), (11.0, 19.0), (19.0, 31.0), (31.0, 40.0)],
+        )
+        # No pause in the window: cut at 1.5x the target.
+        self.assertEqual(plan_chunks(40.0, np.zeros(0), 10.0), [(0.0, 15.0), (15.0, 30.0), (30.0, 40.0)])
+        self.assertEqual(plan_chunks(12.0, pauses, 10.0), [(0.0, 12.0)])
+
+    def test_split_media(self):
+        """Test long media is written as chunks cut inside pauses"""
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "talk.wav")
+            sf.write(audio_path, speech_with_pauses(30, 5), SR)
+            chunks = split_media(audio_path, tmp, 10)
+            offsets = [offset for offset, _ in chunks]
+            np.testing.assert_allclose(offsets, [0.0, 9.75, 19.75], atol=0.05)
+            total = sum(sf.info(path).frames for _, path in chunks)
+            self.assertAlmostEqual(total / SR, 30.0, delta=0.01)
+            self.assertEqual(split_media(audio_path, tmp, 60), [(0.0, audio_path)])
+
+    def test_stitch(self):
+        """Test chunk transcripts are shifted by their offsets and renumbered"""
+        first = {"language": "en", "segments": [
+            {"id": 0, "start": 0.0, "end": 1.0, "text": " Hello", "words": [
+                {"word": " Hello", "start": 0.2, "end": 0.8, "probability": 0.9}]},
+        ]}
+        second = {"language": "th", "segments": [
+            {"id": 0, "start": 0.5, "end": 2.0, "text": " world", "words": [
+                {"word": " world", "start": 0.5, "end": 1.5, "probability": 0.8}]},
+        ]}
+        output = stitch([(0.0, first), (10.0, second)])
+        self.assertEqual(output["language"], "en")
+        self.assertEqual(output["text"], " Hello world")
+        self.assertEqual([segment["id"] for segment in output["segments"]], [0, 1])
+        self.assertEqual(output["segments"][1]["start"], 10.5)
+        self.assertEqual(output["segments"][1]["words"][0]["end"], 11.5)
+        self.assertEqual(second["segments"][0]["start"], 0.5)
+
+    def test_recognize_in_chunks(self):
+        """Test recognize transcribes every chunk and writes one stitched JSON"""
+        def transcribe(file_path, sensitivity, on_segment=None):
+            duration = sf.info(file_path).duration
+            return {"text": " chunk", "language": "en", "segments": [
+                {"id": 0, "start": 0.0, "end": duration, "text": " chunk", "words": []}]}
+
+        env = {"WHISPER_BACKEND": "remote", "WHISPER_CHUNK_SECONDS": "10",
+               "WHISPER_CHUNK_WORKERS": "2"}
+        segments = []
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "talk.wav")
+            sf.write(audio_path, speech_with_pauses(30, 5), SR)
+            with patch.dict(os.environ, env), \
+                    patch.object(SentenceRecognition, "_transcribe_remote", side_effect=transcribe):
+                json_path = SentenceRecognition().recognize(audio_path, on_segment=segments.append)
+            with open(json_path, encoding="utf-8") as f:
+                output = json.load(f)
+            self.assertEqual(sorted(os.listdir(tmp)), ["talk.json", "talk.wav"])
+        self.assertEqual(len(output["segments"]), 3)
+        self.assertEqual([segment["id"] for segment in output["segments"]], [0, 1, 2])
+        self.assertAlmostEqual(output["segments"][-1]["end"], 30.0, delta=0.01)
+        self.assertEqual([segment["start"] for segment in segments],
+                         [segment["start"] for segment in output["segments"]])
+
+    def test_failed_chunk_cancels_the_rest(self):
+        """Test a failing chunk stops the chunks still queued behind it"""
+        calls = []
+
+        def transcribe(file_path, sensitivity, on_segment=None):
+            calls.append(file_path)
+            raise RuntimeError("service unavailable")
+
+        env = {"WHISPER_BACKEND": "remote", "WHISPER_CHUNK_SECONDS": "10",
+               "WHISPER_CHUNK_WORKERS": "1"}
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "talk.wav")
+            sf.write(audio_path, speech_with_pauses(30, 5), SR)
+            with patch.dict(os.environ, env), \
+                    patch.object(SentenceRecognition, "_transcribe_remote", side_effect=transcribe):
+                with self.assertRaisesRegex(RuntimeError, "service unavailable"):
+                    SentenceRecognition().recognize(audio_path)
+            self.assertEqual(os.listdir(tmp), ["talk.wav"])
+        # The single worker may already have picked up the second chunk.
+        self.assertLess(len(calls), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
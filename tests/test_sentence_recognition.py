@@ -1,10 +1,16 @@
 import unittest
 import sys
 import os
+import json
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import requests
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from sentence_recognition import (
+    SentenceRecognition,
     _minimum_available_memory_gb,
     _build_transcribe_kwargs,
     _normalise_sensitivity
@@ -40,6 +46,65 @@ class TestSentenceRecognition(unittest.TestCase):
         self.assertEqual(ultra_kwargs["no_speech_threshold"], 0.05)
         self.assertEqual(ultra_kwargs["beam_size"], 10)
 
+    def test_remote_retries_when_busy(self):
+        """Test the remote backend waits out 429 responses using Retry-After"""
+        busy = MagicMock(status_code=429, headers={"Retry-After": "2"})
+        done = MagicMock(status_code=200, headers={"Content-Type": "application/json"})
+        done.json.return_value = {"text": "", "language": "en", "segments": []}
+        env = {"WHISPER_BACKEND": "remote", "WHISPER_API_URL": "http://whisper",
+               "WHISPER_API_RETRIES": "2", "WHISPER_CHUNK_SECONDS": "0"}
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "clip.wav")
+            open(audio_path, "wb").close()
+            with patch.dict(os.environ, env), \
+                    patch("requests.post", side_effect=[busy, done]) as post, \
+                    patch("sentence_recognition.time.sleep") as sleep:
+                json_path = SentenceRecognition().recognize(audio_path)
+            self.assertEqual(post.call_count, 2)
+            sleep.assert_called_once_with(2.0)
+            with open(json_path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f)["segments"], [])
+
+    def test_remote_reads_segment_stream(self):
+        """Test streamed NDJSON segments are reported as they arrive and saved"""
+        segment = {"id": 0, "start": 0.0, "end": 1.0, "text": " Hi", "words": []}
+        lines = [
+            json.dumps({"type": "segment", "segment": segment}),
+            "",
+            json.dumps({"type": "done", "text": " Hi", "language": "en", "segment_count": 1}),
+        ]
+        response = MagicMock(status_code=200, headers={"Content-Type": "application/x-ndjson"})
+        response.iter_lines.return_value = iter(lines)
+        received = []
+        env = {"WHISPER_BACKEND": "remote", "WHISPER_API_URL": "http://whisper", "WHISPER_CHUNK_SECONDS": "0"}
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "clip.wav")
+            open(audio_path, "wb").close()
+            with patch.dict(os.environ, env), \
+                    patch("requests.post", return_value=response) as post:
+                json_path = SentenceRecognition().recognize(audio_path, on_segment=received.append)
+            self.assertEqual(post.call_args[0][0], "http://whisper/transcribe/stream")
+            self.assertEqual(received, [segment])
+            with open(json_path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f), {"text": " Hi", "language": "en", "segments": [segment]})
+
+        response.iter_lines.return_value = iter(lines[:1])
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "clip.wav")
+            open(audio_path, "wb").close()
+            with patch.dict(os.environ, env), \
+                    patch("requests.post", return_value=response):
+                with self.assertRaisesRegex(RuntimeError, "without completing"):
+                    SentenceRecognition().recognize(audio_path)
+
+        response.iter_lines.side_effect = requests.exceptions.ConnectionError("Read timed out.")
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "clip.wav")
+            open(audio_path, "wb").close()
+            with patch.dict(os.environ, env), \
+                    patch("requests.post", return_value=response):
+                with self.assertRaisesRegex(RuntimeError, "interrupted: Read timed out"):
+                    SentenceRecognition().recognize(audio_path)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,332 @@
+import unittest
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import types
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+SERVER_APP = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server', 'app.py'))
+SR = 16000
+
+
+# ---------------------------------------------------------------------------
+# Stand-ins for fastapi and faster_whisper (neither is needed by the Flask app,
+# so they are not installed alongside it). Fake audio files hold their
+# duration in seconds as text.
+# ---------------------------------------------------------------------------
+
+class _HTTPException(Exception):
+    def __init__(self, status_code, detail=None, headers=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+class _FastAPI:
+    def __init__(self, **kwargs):
+        pass
+
+    def get(self, *args, **kwargs):
+        return lambda endpoint: endpoint
+
+    post = get
+
+
+class _JSONResponse:
+    def __init__(self, status_code=200, content=None):
+        self.status_code = status_code
+        self.content = content
+
+
+class _StreamingResponse:
+    def __init__(self, content, media_type=None, background=None):
+        self.body_iterator = content
+        self.media_type = media_type
+        self.background = background
+
+
+class _BackgroundTask:
+    def __init__(self, func, *args, **kwargs):
+        self.func, self.args, self.kwargs = func, args, kwargs
+
+    async def __call__(self):
+        self.func(*self.args, **self.kwargs)
+
+
+class FakeUpload:
+    """Minimal ``UploadFile``: an in-memory body read in chunks."""
+
+    def __init__(self, body, filename="clip.wav"):
+        self.filename = filename
+        self._body = body
+        self.reads = 0
+
+    async def read(self, size=-1):
+        self.reads += 1
+        chunk, self._body = self._body[:size], self._body[size:]
+        return chunk
+
+
+def _segment(start, end, text):
+    word = SimpleNamespace(word=text, start=start, end=end, probability=0.9)
+    return SimpleNamespace(start=start, end=end, text=text, words=[word])
+
+
+def _duration(path):
+    with open(path) as f:
+        return float(f.read())
+
+
+class FakeModel:
+    """``WhisperModel``: one segment spanning the whole file."""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio_path, **kwargs):
+        self.calls.append(audio_path)
+        return iter([_segment(0.0, _duration(audio_path), " plain")]), SimpleNamespace(language="en")
+
+
+class FakePipeline:
+    """``BatchedInferencePipeline``: one segment per speech clip.
+
+    With ``fail_after`` set, decoding raises after that many segments.
+    """
+
+    def __init__(self, model):
+        self.calls = []
+        self.fail_after = None
+
+    def transcribe(self, audio, clip_timestamps, batch_size, **kwargs):
+        self.calls.append((len(audio), clip_timestamps))
+
+        def segments():
+            for count, clip in enumerate(clip_timestamps):
+                if count == self.fail_after:
+                    raise RuntimeError("GPU out of memory")
+                yield _segment(clip["start"], clip["end"], " batched")
+
+        return segments(), SimpleNamespace(language="en")
+
+
+def _stub_modules():
+    fastapi = types.ModuleType("fastapi")
+    fastapi.FastAPI = _FastAPI
+    fastapi.HTTPException = _HTTPException
+    fastapi.UploadFile = FakeUpload
+    fastapi.File = fastapi.Form = fastapi.Header = lambda *args, **kwargs: None
+    responses = types.ModuleType("fastapi.responses")
+    responses.JSONResponse = _JSONResponse
+    responses.StreamingResponse = _StreamingResponse
+    fastapi.responses = responses
+    starlette = types.ModuleType("starlette")
+    background = types.ModuleType("starlette.background")
+    background.BackgroundTask = _BackgroundTask
+    starlette.background = background
+
+    faster_whisper = types.ModuleType("faster_whisper")
+    faster_whisper.__version__ = "1.1.1"
+    faster_whisper.WhisperModel = lambda *args, **kwargs: FakeModel()
+    faster_whisper.BatchedInferencePipeline = FakePipeline
+    audio = types.ModuleType("faster_whisper.audio")
+    audio.decode_audio = lambda path, sampling_rate: np.zeros(int(_duration(path) * sampling_rate), np.float32)
+    vad = types.ModuleType("faster_whisper.vad")
+    vad.VadOptions = lambda **kwargs: None
+    # Speech from 0.5 s to 0.5 s before the end of every file.
+    vad.get_speech_timestamps = lambda samples, options: [{"start": SR // 2, "end": len(samples) - SR // 2}]
+    vad.merge_segments = lambda clips, options: clips
+    faster_whisper.audio, faster_whisper.vad = audio, vad
+    return {
+        "fastapi": fastapi, "fastapi.responses": responses,
+        "starlette": starlette, "starlette.background": background,
+        "faster_whisper": faster_whisper, "faster_whisper.audio": audio, "faster_whisper.vad": vad,
+    }
+
+
+STUBS = _stub_modules()
+with patch.dict(sys.modules, STUBS):
+    _spec = importlib.util.spec_from_file_location("whisper_server_app", SERVER_APP)
+    server = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(server)
+
+
+class _ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.dict(sys.modules, STUBS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.model = FakeModel()
+
+    def audio(self, name, seconds):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as f:
+            f.write(str(seconds))
+        return path
+
+    def scheduler(self, **kwargs):
+        kwargs.setdefault("max_wait_ms", 20)
+        scheduler = server.BatchScheduler(self.model, **kwargs)
+
+        def cleanup():
+            if scheduler._thread.is_alive():
+                scheduler.stop()
+            else:
+                scheduler._prep.shutdown()
+
+        self.addCleanup(cleanup)
+        return scheduler
+
+    def submit(self, scheduler, path, sensitivity="off", on_segment=None):
+        kwargs = server.build_transcribe_kwargs(sensitivity, "en")
+        return scheduler.submit(path, kwargs, os.path.basename(path),
+                                batchable=sensitivity == "off", on_segment=on_segment)
+
+
+class TestBatchScheduler(_ServerTestCase):
+    def test_groups_jobs_and_maps_clips_back_to_files(self):
+        """Test concurrent default jobs share one batched pass with file-relative times"""
+        scheduler = self.scheduler()
+        first = self.submit(scheduler, self.audio("a.wav", 2.0))
+        second = self.submit(scheduler, self.audio("b.wav", 3.0))
+        quiet = self.submit(scheduler, self.audio("c.wav", 1.0), sensitivity="sensitive")
+        scheduler.start()
+
+        results = [future.result(timeout=5) for future in (first, second, quiet)]
+        (pipeline_call,) = scheduler.pipeline.calls
+        self.assertEqual(pipeline_call[0], 5 * SR)
+        # Clips are offset into the concatenated audio and passed in seconds.
+        self.assertEqual(pipeline_call[1], [{"start": 0.5, "end": 1.5}, {"start": 2.5, "end": 4.5}])
+        self.assertEqual([(s["start"], s["end"]) for s in results[0]["segments"]], [(0.5, 1.5)])
+        self.assertEqual([(s["start"], s["end"]) for s in results[1]["segments"]], [(0.5, 2.5)])
+        self.assertEqual(results[1]["segments"][0]["words"][0]["start"], 0.5)
+        # The relaxed tier never goes through VAD batching.
+        self.assertEqual(results[2]["text"], " plain")
+        self.assertEqual(self.model.calls, [os.path.join(self.tmp.name, "c.wav")])
+
+    def test_single_job_uses_plain_model(self):
+        """Test a batch of one keeps the unbatched transcript"""
+        scheduler = self.scheduler()
+        scheduler.start()
+        payload = self.submit(scheduler, self.audio("a.wav", 2.0)).result(timeout=5)
+        self.assertEqual(payload["segments"][0]["end"], 2.0)
+        self.assertEqual(scheduler.pipeline.calls, [])
+
+    def test_falls_back_to_one_by_one(self):
+        """Test a failed batched pass retries every job with the plain model"""
+        scheduler = self.scheduler()
+        scheduler.pipeline.fail_after = 0
+        futures = [self.submit(scheduler, self.audio(name, 2.0)) for name in ("a.wav", "b.wav")]
+        scheduler.start()
+        payloads = [future.result(timeout=5) for future in futures]
+        self.assertEqual([payload["text"] for payload in payloads], [" plain", " plain"])
+        self.assertEqual(len(self.model.calls), 2)
+
+    def test_failed_batch_reports_each_segment_once(self):
+        """Test segments decoded before a batched pass fails are not reported twice"""
+        scheduler = self.scheduler()
+        scheduler.pipeline.fail_after = 1
+        received = {"a.wav": [], "b.wav": []}
+        futures = [self.submit(scheduler, self.audio(name, 2.0), on_segment=received[name].append)
+                   for name in received]
+        scheduler.start()
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual({name: [s["text"] for s in segments] for name, segments in received.items()},
+                         {"a.wav": [" plain"], "b.wav": [" plain"]})
+
+    def test_stats_follow_each_job(self):
+        """Test a job leaves the running count as soon as it finishes, not at the end of the round"""
+        scheduler = self.scheduler()
+        seen = []
+        first = self.submit(scheduler, self.audio("a.wav", 1.0), sensitivity="sensitive",
+                            on_segment=lambda segment: seen.append(scheduler.stats()))
+        second = self.submit(scheduler, self.audio("b.wav", 1.0), sensitivity="sensitive",
+                             on_segment=lambda segment: seen.append(scheduler.stats()))
+        scheduler.start()
+        first.result(timeout=5)
+        second.result(timeout=5)
+        # Both jobs were taken in one round; the first leaves it when done.
+        self.assertEqual(seen, [
+            {"queued": 0, "running": 2, "uploading": 0, "capacity": scheduler.max_queue},
+            {"queued": 0, "running": 1, "uploading": 0, "capacity": scheduler.max_queue},
+        ])
+        self.assertEqual(scheduler.stats()["running"], 0)
+
+    def test_full_queue(self):
+        """Test submissions beyond max_queue are refused and /transcribe answers 429"""
+        scheduler = self.scheduler(max_queue=1)
+        self.submit(scheduler, self.audio("a.wav", 1.0))
+        with self.assertRaises(server.QueueFullError):
+            self.submit(scheduler, self.audio("b.wav", 1.0))
+        self.assertEqual(scheduler.stats(), {"queued": 1, "running": 0, "uploading": 0, "capacity": 1})
+
+        with patch.dict(server._state, scheduler=scheduler):
+            with self.assertRaises(_HTTPException) as raised:
+                asyncio.run(server.transcribe(FakeUpload(b"1.0"), "off", "en", None))
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertEqual(raised.exception.headers, {"Retry-After": str(server.RETRY_AFTER_S)})
+
+    def test_uploads_hold_a_queue_slot(self):
+        """Test an upload in progress counts against capacity and failed uploads free it"""
+        scheduler = self.scheduler(max_queue=1)
+        with patch.dict(server._state, scheduler=scheduler):
+            server._admit(None)
+            self.assertEqual(scheduler.stats()["uploading"], 1)
+            upload = FakeUpload(b"1.0")
+            with self.assertRaises(_HTTPException) as raised:
+                asyncio.run(server.transcribe(upload, "off", "en", None))
+            self.assertEqual(raised.exception.status_code, 429)
+            self.assertEqual(upload.reads, 0)
+            scheduler.unreserve()
+
+            with patch.object(server, "MAX_UPLOAD_MB", 0), self.assertRaises(_HTTPException) as raised:
+                asyncio.run(server.transcribe(FakeUpload(b"1.0"), "off", "en", None))
+            self.assertEqual(raised.exception.status_code, 413)
+        self.assertEqual(scheduler.stats(), {"queued": 0, "running": 0, "uploading": 0, "capacity": 1})
+
+
+class TestStreamEndpoint(_ServerTestCase):
+    def stream(self, scheduler, upload):
+        async def consume():
+            response = await server.transcribe_stream(upload, "off", "en", None)
+            lines = [json.loads(line) async for line in response.body_iterator]
+            return response, lines
+
+        with patch.dict(server._state, scheduler=scheduler):
+            return asyncio.run(consume())
+
+    def test_streams_segments_then_done(self):
+        """Test /transcribe/stream sends one NDJSON line per segment then a summary"""
+        scheduler = self.scheduler()
+        scheduler.start()
+        response, lines = self.stream(scheduler, FakeUpload(b"2.0"))
+        self.assertEqual(response.media_type, "application/x-ndjson")
+        self.assertEqual([line["type"] for line in lines], ["segment", "done"])
+        self.assertEqual(lines[0]["segment"]["end"], 2.0)
+        self.assertEqual(lines[1], {"type": "done", "text": " plain", "language": "en", "segment_count": 1})
+
+    def test_unread_stream_still_cleans_up(self):
+        """Test the response's background task removes the upload when the body is never read"""
+        scheduler = self.scheduler()
+        scheduler.start()
+        mkdtemp = tempfile.mkdtemp
+        with patch.object(server.tempfile, "mkdtemp", side_effect=lambda **kwargs: mkdtemp(dir=self.tmp.name)), \
+                patch.dict(server._state, scheduler=scheduler):
+            response = asyncio.run(server.transcribe_stream(FakeUpload(b"2.0"), "off", "en", None))
+            (tmp_dir,) = os.listdir(self.tmp.name)
+            asyncio.run(response.background())
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
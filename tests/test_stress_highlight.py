@@ -1,13 +1,66 @@
 import unittest
 from unittest.mock import patch, MagicMock
+import json
 import sys
 import os
+import tempfile
+
+import numpy as np
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from stress_highlight import format_time, SentenceRecognizer
+from audio_analyzer import AudioAnalyzer
+from stress_highlight import WORD_DTYPE, format_time, SentenceRecognizer
+
+
+def _synthetic_analyzer():
+    """Analyzer over 10 s of tone: loud at 0.4-0.9/3.0-3.6 s, high at 1.2-1.8/7.0-7.8 s."""
+    sr = 8000
+    t = np.arange(sr * 10) / sr
+    f0 = np.where(((t >= 1.2) & (t < 1.8)) | ((t >= 7.0) & (t < 7.8)), 400.0, 200.0)
+    amp = np.where(((t >= 0.4) & (t < 0.9)) | ((t >= 3.0) & (t < 3.6)), 0.6, 0.1)
+    analyzer = AudioAnalyzer("dummy.wav")
+    analyzer._audio = ((amp * np.sin(2 * np.pi * np.cumsum(f0) / sr)).astype(np.float32), sr)
+    return analyzer
+
+
+def _word(word, start, end):
+    return {"word": word, "start": start, "end": end}
+
+
+TRANSCRIPT = {"segments": [
+    {"text": " Hello world from Thailand", "words": [
+        _word(" Hello", 0.0, 0.4), _word(" world", 0.4, 0.9),
+        _word(" from", 0.9, 1.2), _word(" Thailand", 1.2, 1.8)]},
+    {"text": " Well, this is an interesting test of the splitting logic.", "words": [
+        _word(" Well,", 2.0, 2.5), _word(" this", 2.5, 3.0), _word(" is", 3.0, 3.6),
+        _word(" an", 3.6, 4.5), _word(" interesting", 4.5, 6.0), _word(" test", 6.0, 7.0),
+        _word(" of", 7.0, 7.8), _word(" the", 7.8, 8.2), _word(" splitting", 8.2, 8.7),
+        _word(" logic.", 8.7, 9.0)]},
+    {"text": " No words here", "words": []},
+    {"text": " Odd one in", "words": [
+        _word(" Odd", 9.2, 9.2), _word(" missing", 9.3, 9.5), _word(" in", 9.5, 9.9)]},
+]}
+
+EXPECTED_VTT = (
+    "WEBVTT\n\n"
+    "1\n00:00:00.000 --> 00:00:01.800\n"
+    " Hello <u>w</u><u>o</u><u>r</u><u>l</u><u>d</u> from "
+    "<u>T</u><u>h</u><u>a</u><u>i</u><u>l</u><u>a</u><u>n</u><u>d</u>\n\n"
+    "2\n00:00:02.000 --> 00:00:07.000\nWell, this <u>i</u><u>s</u> an interesting test\n\n"
+    "3\n00:00:07.000 --> 00:00:09.000\n<u>o</u><u>f</u> the splitting logic.\n\n"
+    "4\n00:00:09.199 --> 00:00:09.900\n Odd one in\n\n"
+)
 
 class TestStressHighlight(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.json_path = os.path.join(self.tmp.name, "transcript.json")
+        self.vtt_path = os.path.join(self.tmp.name, "captions.vtt")
+        with open(self.json_path, "w", encoding="utf-8") as f:
+            json.dump(TRANSCRIPT, f)
+
     def test_format_time(self):
         """Test formatting of time in seconds to WEBVTT style"""
         self.assertEqual(format_time(0.0), "00:00:00.000")
@@ -17,13 +70,6 @@ class TestStressHighlight(unittest.TestCase):
         self.assertEqual(format_time(3661.002), "01:01:01.001")
         self.assertEqual(format_time(3661.25), "01:01:01.250")
 
-    def test_clean_for_analysis(self):
-        """Test cleaning of words for stress analysis"""
-        recognizer = SentenceRecognizer("dummy.wav", "dummy.json")
-        self.assertEqual(recognizer._clean_for_analysis("Hello!"), "hello")
-        self.assertEqual(recognizer._clean_for_analysis("don't"), "dont")
-        self.assertEqual(recognizer._clean_for_analysis("  Apple,  "), "apple")
-
     def test_find_word(self):
         """Test locating a word with word boundaries in text"""
         text = "This is an interesting test."
@@ -34,6 +80,16 @@ class TestStressHighlight(unittest.TestCase):
         pos_in = SentenceRecognizer._find_word(text, "in", 0)
         self.assertNotEqual(pos_in, -1)
 
+    def test_find_word_fast_path_boundaries(self):
+        """Test the direct next-token check keeps regex word-boundary semantics"""
+        text = "interesting in an in-depth test, test_case test"
+        self.assertEqual(SentenceRecognizer._find_word(text, "in", 0), 12)
+        self.assertEqual(SentenceRecognizer._find_word(text, "in", 13), 18)
+        self.assertEqual(SentenceRecognizer._find_word(text, "test,", 27), 27)
+        self.assertEqual(SentenceRecognizer._find_word(text, "test", 33), 43)
+        self.assertEqual(SentenceRecognizer._find_word(text, "missing", 0), -1)
+        self.assertEqual(SentenceRecognizer._find_word(" ไทย ไทย", "ไทย", 4), 5)
+
     def test_apply_stress_formatting(self):
         """Test applying stress formatting (<u> tags) to stressed words"""
         recognizer = SentenceRecognizer("dummy.wav", "dummy.json")
@@ -51,5 +107,94 @@ class TestStressHighlight(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+    def test_generate_vtt_end_to_end(self):
+        """Test stress detection, cue splitting and formatting on a real analyzer"""
+        recognizer = SentenceRecognizer("dummy.wav", self.json_path, analyzer=_synthetic_analyzer())
+        recognizer.generate_vtt(self.vtt_path)
+        with open(self.vtt_path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), EXPECTED_VTT)
+
+
+    def test_collect_data_columnar_words(self):
+        """Test words are stored as one structured array plus parallel tokens"""
+        recognizer = SentenceRecognizer("dummy.wav", self.json_path, analyzer=_synthetic_analyzer())
+        recognizer.collect_data()
+
+        self.assertEqual(recognizer.words.dtype, WORD_DTYPE)
+        self.assertEqual(len(recognizer.words), len(recognizer.word_text))
+        self.assertEqual(recognizer.sentence_offsets.tolist(), [0, 4, 14, 17])
+        self.assertEqual(recognizer.sentence_indices, [0, 1, 3])
+        self.assertEqual(recognizer.word_text[4], " Well,")
+        self.assertAlmostEqual(recognizer.words["end"][14], 9.21)
+
+
+    def test_calculate_stress_thresholds(self):
+        """Test the vectorized stress rule honours configurable thresholds"""
+        stressed = {}
+        for name, kwargs in (("default", {}), ("no_pitch", {"pitch_ratio": 10.0}),
+                             ("no_amplitude", {"amplitude_ratio": 100.0})):
+            recognizer = SentenceRecognizer("dummy.wav", self.json_path, analyzer=_synthetic_analyzer(), **kwargs)
+            recognizer.collect_data()
+            flags = recognizer._calculate_stress()
+            stressed[name] = [recognizer.word_text[i].strip() for i in np.flatnonzero(flags)]
+
+        self.assertEqual(stressed["default"], ["world", "Thailand", "is", "of"])
+        self.assertEqual(stressed["no_pitch"], ["world", "is"])
+        self.assertEqual(stressed["no_amplitude"], ["Thailand", "of"])
+
+
+    def test_generate_vtt_streams_batches(self):
+        """Test per-batch cue streaming writes the same VTT and reports progress"""
+        recognizer = SentenceRecognizer("dummy.wav", self.json_path, analyzer=_synthetic_analyzer())
+        batches = list(recognizer.iter_cue_batches(batch_size=1))
+        self.assertEqual([len(cues) for cues in batches], [1, 2, 0, 1])
+        self.assertEqual(list(recognizer.iter_cues()), [cue for cues in batches for cue in cues])
+
+        partial = []
+
+        def progress(count, end_time):
+            with open(self.vtt_path, encoding="utf-8") as f:
+                partial.append((count, end_time, f.read().count(" --> ")))
+
+        recognizer.generate_vtt(self.vtt_path, progress=progress, batch_size=1)
+        with open(self.vtt_path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), EXPECTED_VTT)
+        self.assertEqual(partial, [(1, 1.8, 1), (3, 9.0, 3), (4, 9.9, 4)])
+
+
+    def test_generate_vtt_worker_pool(self):
+        """Test captioning segment batches in worker processes keeps cue order"""
+        recognizer = SentenceRecognizer("dummy.wav", self.json_path, analyzer=_synthetic_analyzer())
+        recognizer.generate_vtt(self.vtt_path, batch_size=1, workers=2)
+        with open(self.vtt_path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), EXPECTED_VTT)
+
+    def test_worker_pool_reads_transcript_lazily(self):
+        """Test the worker pool keeps a bounded window of segment batches in flight"""
+        consumed = []
+
+        def segments():
+            for segment in TRANSCRIPT["segments"] * 4:
+                consumed.append(segment)
+                yield segment
+
+        recognizer = SentenceRecognizer("dummy.wav", segments(), analyzer=_synthetic_analyzer())
+        batches = recognizer.iter_cue_batches(batch_size=1, workers=2)
+        self.assertEqual(len(next(batches)), 1)
+        self.assertLessEqual(len(consumed), 5)
+        self.assertEqual(sum(len(cues) for cues in batches), 4 * 4 - 1)
+        self.assertEqual(len(consumed), 16)
+
+
+    def test_in_memory_transcript_to_vtt_string(self):
+        """Test parsed transcripts and segment iterators render the VTT in memory"""
+        from_dict = SentenceRecognizer("dummy.wav", TRANSCRIPT, analyzer=_synthetic_analyzer())
+        self.assertEqual(from_dict.to_vtt(), EXPECTED_VTT)
+
+        segments = (segment for segment in TRANSCRIPT["segments"])
+        from_iterator = SentenceRecognizer("dummy.wav", segments, analyzer=_synthetic_analyzer())
+        self.assertEqual(from_iterator.to_vtt(batch_size=1), EXPECTED_VTT)
+
+
 if __name__ == '__main__':
     unittest.main()
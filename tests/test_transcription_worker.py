@@ -0,0 +1,106 @@
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from transcription_worker import TranscriptionWorker
+
+PAYLOAD = {
+    "text": " Hello world.",
+    "language": "en",
+    "segments": [{"id": 0, "start": 0.0, "end": 1.0, "text": " Hello world.", "words": []}],
+}
+
+
+class _FakeWhisperAPI(BaseHTTPRequestHandler):
+    # Uploads named hang.wav get no answer until this is set.
+    release = threading.Event()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if b'filename="hang.wav"' in body:
+            self.release.wait(30)
+            return
+        body = json.dumps(PAYLOAD).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTranscriptionWorker(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeWhisperAPI)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        _FakeWhisperAPI.release.set()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        env = dict(os.environ)
+        env["WHISPER_BACKEND"] = "remote"
+        env["WHISPER_API_URL"] = f"http://127.0.0.1:{self.server.server_port}"
+        self.worker = TranscriptionWorker(env=env, start_timeout=30, ping_timeout=5)
+        self.addCleanup(self.worker.close)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.audio_path = os.path.join(self.tmp.name, "clip.wav")
+        with open(self.audio_path, "wb") as f:
+            f.write(b"RIFF")
+
+    def test_worker_is_reused_across_jobs(self):
+        """Test jobs run in one persistent worker process"""
+        progress = []
+        json_path = self.worker.transcribe(self.audio_path, progress=lambda *args: progress.append(args))
+        pid = self.worker.pid
+        self.assertEqual(progress, [(1, 1.0)])
+        with open(json_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["segments"], PAYLOAD["segments"])
+        self.assertEqual(self.worker.transcribe(self.audio_path), json_path)
+        self.assertEqual(self.worker.pid, pid)
+        self.assertTrue(self.worker.ping())
+
+    def test_errors_and_restart_after_crash(self):
+        """Test job errors are raised and a killed worker is restarted"""
+        with self.assertRaisesRegex(RuntimeError, "not found"):
+            self.worker.transcribe(os.path.join(self.tmp.name, "missing.wav"))
+        pid = self.worker.pid
+        os.kill(pid, signal.SIGKILL)
+        self.worker._process.wait()
+        self.assertFalse(self.worker.ping())
+
+        self.assertTrue(self.worker.transcribe(self.audio_path).endswith("clip.json"))
+        self.assertNotEqual(self.worker.pid, pid)
+
+    def test_hung_job_kills_worker(self):
+        """Test a job that stops answering is abandoned and the worker replaced"""
+        self.worker.transcribe(self.audio_path)
+        process = self.worker._process
+        self.worker.job_timeout = 1
+        hang_path = os.path.join(self.tmp.name, "hang.wav")
+        with open(hang_path, "wb") as f:
+            f.write(b"RIFF")
+        with self.assertRaisesRegex(RuntimeError, "stopped responding"):
+            self.worker.transcribe(hang_path)
+        self.assertIsNotNone(process.poll())
+
+        self.assertTrue(self.worker.transcribe(self.audio_path).endswith("clip.json"))
+        self.assertNotEqual(self.worker._process, process)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,271 @@
+"""
+Long-lived transcription worker.
+
+Running ``sentence_recognition.py`` as a fresh Python process per job means
+the local faster-whisper model is loaded from disk for every upload. This
+module keeps one worker process alive instead: it imports
+``sentence_recognition`` and loads the model once, then serves jobs over its
+stdin/stdout pipes.
+
+Protocol: one JSON object per line in each direction, matched by ``id``.
+
+    -> {"id": 1, "op": "ping"}
+    <- {"id": 1, "ok": true}
+    -> {"id": 2, "op": "transcribe", "audio_path": "...", "sensitivity": "off"}
+    <- {"id": 2, "event": "segment", "count": 1, "end": 4.2}      (per segment)
+    <- {"id": 2, "ok": true, "json_path": "..."}
+    <- {"id": 2, "ok": false, "error": "..."}
+    -> {"id": 3, "op": "shutdown"}
+
+The worker's own stdout is reserved for the protocol; everything the
+recognizer prints goes to stderr, which is shared with the parent so it
+shows up in the app log as before.
+
+:class:`TranscriptionWorker` is the parent side: it starts the process on
+first use, pings it before each job (restarting it if it died or stopped
+answering), kills it if a job goes ``job_timeout`` seconds without any
+reply (it is restarted by the next job) and turns worker errors, crashes
+or hangs into ``RuntimeError``.
+"""
+
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import traceback
+
+# Seconds to wait for the first answer from a new worker (model load), for
+# a ping to an idle one and, during a job, for the next segment or the
+# result (long enough for a whole non-streamed remote request).
+START_TIMEOUT = float(os.environ.get("TRANSCRIPTION_WORKER_START_TIMEOUT", "600"))
+PING_TIMEOUT = float(os.environ.get("TRANSCRIPTION_WORKER_PING_TIMEOUT", "10"))
+JOB_TIMEOUT = float(os.environ.get("TRANSCRIPTION_WORKER_JOB_TIMEOUT", "1800"))
+
+
+class TranscriptionWorker:
+    """Parent-side handle on one persistent worker process."""
+
+    def __init__(self, cwd=None, env=None, start_timeout=START_TIMEOUT,
+                 ping_timeout=PING_TIMEOUT, job_timeout=JOB_TIMEOUT):
+        self.cwd = cwd or os.path.abspath(os.path.dirname(__file__))
+        self.env = env
+        self.start_timeout = start_timeout
+        self.ping_timeout = ping_timeout
+        self.job_timeout = job_timeout
+        self._process = None
+        self._responses = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pid(self):
+        return self._process.pid if self._process is not None else None
+
+    def _alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def _start(self):
+        env = dict(self.env if self.env is not None else os.environ)
+        env["PYTHONIOENCODING"] = "utf-8"
+        self._process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            cwd=self.cwd,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        # A reader thread turns the blocking stdout pipe into a queue so
+        # requests can time out; ``None`` marks EOF (the worker exited).
+        self._responses = queue.Queue()
+        threading.Thread(
+            target=self._read_responses,
+            args=(self._process.stdout, self._responses),
+            name="transcription-worker-reader",
+            daemon=True,
+        ).start()
+        print(f"[transcription_worker] Started worker pid={self._process.pid}")
+
+    @staticmethod
+    def _read_responses(stream, responses):
+        for line in stream:
+            try:
+                responses.put(json.loads(line))
+            except ValueError:
+                print(f"[transcription_worker] Ignoring malformed reply: {line.rstrip()}")
+        responses.put(None)
+
+    def _stop(self, kill=False):
+        """Stop (or with ``kill``, kill) the worker process and return its exit code."""
+        process, self._process = self._process, None
+        if process is None:
+            return None
+        if kill and process.poll() is None:
+            process.kill()
+            process.wait()
+        elif process.poll() is None:
+            try:
+                process.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+                process.stdin.flush()
+                process.wait(timeout=5)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                process.kill()
+                process.wait()
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        return process.returncode
+
+    def _request(self, op, timeout=None, on_event=None, **fields):
+        """Send one request and return its reply, or ``None`` on timeout/exit.
+
+        Progress events for the request are passed to ``on_event``.
+        """
+        self._next_id += 1
+        message = dict(fields, id=self._next_id, op=op)
+        try:
+            self._process.stdin.write(json.dumps(message) + "\n")
+            self._process.stdin.flush()
+        except (OSError, ValueError):
+            return None
+        while True:
+            try:
+                reply = self._responses.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            # Skip late replies to requests that already timed out.
+            if reply is not None and reply.get("id") != message["id"]:
+                continue
+            if reply is not None and "event" in reply:
+                if on_event is not None:
+                    on_event(reply)
+                continue
+            return reply
+
+    def _ensure_ready(self):
+        """Make sure a worker is running and answering pings."""
+        if self._alive() and self._request("ping", self.ping_timeout) is not None:
+            return
+        if self._process is not None:
+            print(
+                f"[transcription_worker] Worker pid={self._process.pid} is not responding "
+                f"(exit code {self._process.poll()}); restarting"
+            )
+            self._stop()
+        self._start()
+        if self._request("ping", self.start_timeout) is None:
+            code = self._stop()
+            raise RuntimeError(f"Transcription worker failed to start (exit code {code}).")
+
+    def ping(self):
+        """Return ``True`` if the worker is running and answers a ping."""
+        with self._lock:
+            return self._alive() and self._request("ping", self.ping_timeout) is not None
+
+    def transcribe(self, audio_path, sensitivity="off", progress=None):
+        """Transcribe ``audio_path`` in the worker and return the JSON path.
+
+        ``progress(segment_count, end_time)`` is called as segments are decoded.
+        """
+        def on_event(event):
+            if progress is not None and event.get("event") == "segment":
+                progress(event["count"], event["end"])
+
+        with self._lock:
+            self._ensure_ready()
+            reply = self._request(
+                "transcribe", self.job_timeout, on_event=on_event,
+                audio_path=audio_path, sensitivity=sensitivity,
+            )
+            if reply is None and self._alive():
+                print(
+                    f"[transcription_worker] Worker pid={self._process.pid} sent nothing for "
+                    f"{self.job_timeout:g}s; killing it"
+                )
+                self._stop(kill=True)
+                raise RuntimeError(
+                    f"Transcription worker stopped responding while processing {audio_path}."
+                )
+            if reply is None:
+                code = self._stop()
+                raise RuntimeError(
+                    f"Transcription worker exited with code {code} while processing {audio_path}."
+                )
+            if not reply.get("ok"):
+                raise RuntimeError(reply.get("error") or "Transcription failed.")
+            return reply["json_path"]
+
+    def close(self):
+        """Shut the worker down (it is restarted by the next job)."""
+        with self._lock:
+            self._stop()
+
+
+def _handle(request, emit):
+    from sentence_recognition import SentenceRecognition
+
+    if request.get("op") == "ping":
+        return {"ok": True}
+    if request.get("op") == "transcribe":
+        audio_path = request["audio_path"]
+        count = 0
+
+        def on_segment(segment):
+            nonlocal count
+            count += 1
+            emit({"event": "segment", "count": count, "end": segment.get("end", 0.0)})
+
+        json_path = SentenceRecognition().recognize(
+            audio_path, sensitivity=request.get("sensitivity", "off"), on_segment=on_segment
+        )
+        if not json_path:
+            return {"ok": False, "error": f"File '{audio_path}' not found."}
+        return {"ok": True, "json_path": json_path}
+    return {"ok": False, "error": f"Unknown op {request.get('op')!r}"}
+
+
+def serve():
+    """Worker main loop: answer protocol requests from stdin until EOF."""
+    # Keep the real stdout for protocol replies and send everything else
+    # (including output of native code) to stderr.
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    if os.environ.get("WHISPER_BACKEND", "local").strip().lower() == "local":
+        try:
+            from sentence_recognition import _get_model
+
+            _get_model()
+        except Exception as e:
+            # Reported again (and retried) by the first transcription.
+            print(f"[transcription_worker] Model preload failed: {e}")
+
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            print(f"[transcription_worker] Ignoring malformed request: {line.rstrip()}")
+            continue
+        if request.get("op") == "shutdown":
+            break
+        def emit(event):
+            replies.write(json.dumps(dict(event, id=request.get("id"))) + "\n")
+
+        try:
+            reply = _handle(request, emit)
+        except Exception as e:
+            traceback.print_exc()
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        reply["id"] = request.get("id")
+        replies.write(json.dumps(reply) + "\n")
+
+
+if __name__ == "__main__":
+    serve()